@@ -0,0 +1,18 @@
+import numpy as np
+import xarray as xr
+
+
+def make_datasets(nkeys: int, size: int = 10) -> dict:
+    """Return a dictionary of ``nkeys`` small synthetic datasets."""
+    rng = np.random.default_rng(0)
+    return {
+        f'member_{i}': xr.Dataset(
+            {
+                'tas': (('time', 'x'), rng.random((size, size))),
+                'pr': (('time', 'x'), rng.random((size, size))),
+            },
+            coords={'time': np.arange(size), 'x': np.arange(size)},
+            attrs={'member': i},
+        )
+        for i in range(nkeys)
+    }
@@ -0,0 +1,34 @@
+import xcollection as xc
+
+from . import make_datasets
+
+
+class Construction:
+    params = ([10, 1_000, 10_000], ['full', 'shallow', 'off'])
+    param_names = ['nkeys', 'validation']
+
+    def setup(self, nkeys, validation):
+        self.datasets = make_datasets(nkeys)
+
+    def time_init(self, nkeys, validation):
+        with xc.set_options(validation=validation):
+            xc.Collection(self.datasets)
+
+    def peakmem_init(self, nkeys, validation):
+        with xc.set_options(validation=validation):
+            xc.Collection(self.datasets)
+
+
+class Derived:
+    # collections derived from another one are not validated again
+    params = [10, 1_000, 10_000]
+    param_names = ['nkeys']
+
+    def setup(self, nkeys):
+        self.collection = xc.Collection(make_datasets(nkeys))
+
+    def time_filter(self, nkeys):
+        self.collection.filter(by='key', func=lambda key: True)
+
+    def time_keymap(self, nkeys):
+        self.collection.keymap(str.upper)
@@ -0,0 +1,48 @@
+import xarray as xr
+
+import xcollection as xc
+
+from . import make_datasets
+
+
+class Operations:
+    params = [10, 1_000, 10_000]
+    param_names = ['nkeys']
+
+    def setup(self, nkeys):
+        self.collection = xc.Collection(make_datasets(nkeys))
+        self.other = xc.Collection(make_datasets(nkeys))
+        self.weights = xr.DataArray(range(1, 11), dims='x')
+
+    def time_choose_any(self, nkeys):
+        self.collection.choose('tas', mode='any')
+
+    def time_choose_all(self, nkeys):
+        self.collection.choose('tas', mode='all')
+
+    def time_filter_key(self, nkeys):
+        self.collection.filter(by='key', func=lambda key: key.endswith('1'))
+
+    def time_filter_value(self, nkeys):
+        self.collection.filter(by='value', func=lambda ds: ds.attrs['member'] % 2 == 0)
+
+    def time_keymap(self, nkeys):
+        self.collection.keymap(str.upper)
+
+    def time_map(self, nkeys):
+        self.collection.map(lambda ds: ds * 2)
+
+    def time_weighted_mean(self, nkeys):
+        self.collection.weighted(self.weights).mean(dim='x')
+
+    def time_eq(self, nkeys):
+        self.collection == self.other
+
+    def time_equals_hash(self, nkeys):
+        self.collection.equals(self.other, method='hash')
+
+    def peakmem_map(self, nkeys):
+        self.collection.map(lambda ds: ds * 2)
+
+    def peakmem_weighted_mean(self, nkeys):
+        self.collection.weighted(self.weights).mean(dim='x')
@@ -0,0 +1,28 @@
+import numpy as np
+
+import xcollection as xc
+
+from . import make_datasets
+
+
+def _transform(dataset):
+    # a CPU-bound function holding the GIL for part of its run time
+    return dataset.map(np.sin).cumsum('time')
+
+
+class SharedMemoryMap:
+    # 8 members of 16 MiB and 256 MiB, i.e. up to 2 GiB in total
+    params = ([None, 'processes', 'shared_memory'], [1024, 4096])
+    param_names = ['executor', 'size']
+    timeout = 600
+    number = 1
+    repeat = 3
+
+    def setup(self, executor, size):
+        self.collection = xc.Collection(make_datasets(8, size=size))
+
+    def time_map(self, executor, size):
+        self.collection.map(_transform, executor=executor)
+
+    def peakmem_map(self, executor, size):
+        self.collection.map(_transform, executor=executor)
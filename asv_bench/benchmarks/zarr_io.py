@@ -0,0 +1,54 @@
+import shutil
+import tempfile
+
+import xcollection as xc
+
+from . import make_datasets
+
+
+class ZarrIO:
+    params = ([10, 1_000, 10_000], [False, True])
+    param_names = ['nkeys', 'parallel']
+    # writing and reading thousands of groups takes a while
+    timeout = 600
+    number = 1
+    repeat = 3
+
+    def setup(self, nkeys, parallel):
+        self.directory = tempfile.mkdtemp()
+        self.collection = xc.Collection(make_datasets(nkeys))
+        self.store = f'{self.directory}/written.zarr'
+        self.existing = f'{self.directory}/existing.zarr'
+        self.collection.to_zarr(self.existing, parallel=True)
+
+    def teardown(self, nkeys, parallel):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_to_zarr(self, nkeys, parallel):
+        self.collection.to_zarr(self.store, parallel=parallel)
+
+    def time_open_collection(self, nkeys, parallel):
+        xc.open_collection(self.existing, parallel=parallel)
+
+    def peakmem_open_collection(self, nkeys, parallel):
+        xc.open_collection(self.existing, parallel=parallel)
+
+
+class LazyOpen:
+    # opening lazily reads the consolidated metadata only, whatever `parallel` is
+    params = [10, 1_000, 10_000]
+    param_names = ['nkeys']
+    timeout = 600
+    number = 1
+    repeat = 3
+
+    def setup(self, nkeys):
+        self.directory = tempfile.mkdtemp()
+        self.existing = f'{self.directory}/existing.zarr'
+        xc.Collection(make_datasets(nkeys)).to_zarr(self.existing, parallel=True)
+
+    def teardown(self, nkeys):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_open_collection_lazy(self, nkeys):
+        xc.open_collection(self.existing, lazy=True)
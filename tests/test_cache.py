@@ -0,0 +1,154 @@
+import functools
+
+import pytest
+import xarray as xr
+
+import xcollection
+from xcollection.cache import MapCache
+
+ds = xr.tutorial.open_dataset('rasm').isel(time=slice(0, 4), y=slice(0, 10), x=slice(0, 10))
+dsa = xr.tutorial.open_dataset('air_temperature').isel(time=slice(0, 4))
+
+calls = []
+
+
+def anomaly(dataset, scale=1):
+    calls.append(dataset)
+    return (dataset - dataset.mean('time')) * scale
+
+
+@pytest.fixture
+def collection():
+    calls.clear()
+    return xcollection.Collection({'foo': ds, 'bar': ds + 1, 'baz': dsa})
+
+
+def test_map_cache(tmp_path, collection):
+    cache = MapCache(tmp_path / 'cache')
+    expected = collection.map(anomaly, scale=2)
+    calls.clear()
+
+    first = collection.map(anomaly, cache=cache, scale=2)
+    assert first == expected
+    assert len(calls) == 3
+    assert len(cache) == 3
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    second = collection.map(anomaly, cache=cache, scale=2)
+    assert second == expected
+    assert len(calls) == 3
+    assert (cache.hits, cache.misses) == (3, 3)
+
+    # only the changed member and the new arguments are recomputed
+    collection['bar'] = ds + 2
+    third = collection.map(anomaly, cache=cache, scale=2)
+    assert len(calls) == 4
+    assert third == collection.map(anomaly, scale=2)
+    calls.clear()
+    collection.map(anomaly, cache=cache, scale=3)
+    assert len(calls) == 3
+
+    # a new cache on the same directory serves the stored results
+    calls.clear()
+    again = collection.map(anomaly, cache=MapCache(tmp_path / 'cache'), executor='threads', scale=3)
+    assert not calls
+    assert list(again.keys()) == ['foo', 'bar', 'baz']
+
+    # values modified in place are fingerprinted again
+    collection['foo'] = ds.copy(deep=True).load()
+    collection.map(anomaly, cache=cache, scale=3)
+    collection['foo']['Tair'][0, 0, 0] = -999
+    calls.clear()
+    result = collection.map(anomaly, cache=cache, scale=3)
+    assert len(calls) == 1
+    xr.testing.assert_identical(result['foo'], anomaly(collection['foo'], scale=3))
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_entry_key(tmp_path):
+    cache = MapCache(tmp_path)
+    key = cache.entry_key(anomaly, 'abc', (), {'scale': 2})
+    assert key == cache.entry_key(anomaly, 'abc', [], {'scale': 2})
+    assert key != cache.entry_key(anomaly, 'abd', (), {'scale': 2})
+    assert key != cache.entry_key(anomaly, 'abc', (), {'scale': 3})
+    assert key != cache.entry_key(lambda dataset, scale: dataset, 'abc', (), {'scale': 2})
+    assert key != cache.entry_key(functools.partial(anomaly, scale=2), 'abc')
+
+    def versioned(dataset):
+        return dataset
+
+    before = cache.entry_key(versioned, 'abc')
+    versioned.__version__ = '2'
+    assert cache.entry_key(versioned, 'abc') != before
+
+
+SCALE = 2
+
+
+def scaled(dataset):
+    return dataset * SCALE
+
+
+def test_entry_key_closure_and_defaults(tmp_path, collection):
+    cache = MapCache(tmp_path)
+
+    def make(factor):
+        return lambda dataset: dataset * factor
+
+    assert cache.entry_key(make(2), 'abc') == cache.entry_key(make(2), 'abc')
+    assert cache.entry_key(make(2), 'abc') != cache.entry_key(make(3), 'abc')
+    doubled = collection.map(make(2), cache=cache)
+    tripled = collection.map(make(3), cache=cache)
+    assert tripled == collection.map(make(3))
+    assert tripled != doubled
+
+    def shifted(dataset, offset=1):
+        return dataset + offset
+
+    before = cache.entry_key(shifted, 'abc')
+    shifted.__defaults__ = (2,)
+    assert cache.entry_key(shifted, 'abc') != before
+
+    global SCALE
+    before = cache.entry_key(scaled, 'abc')
+    SCALE = 3
+    try:
+        assert cache.entry_key(scaled, 'abc') != before
+    finally:
+        SCALE = 2
+
+    def recursive(dataset, depth=1):
+        return dataset if not depth else recursive(dataset, depth - 1)
+
+    assert cache.entry_key(recursive, 'abc') == cache.entry_key(recursive, 'abc')
+
+    # objects described by their address cannot identify the function
+    marker = object()
+    with pytest.raises(TypeError, match='Cannot cache'):
+        collection.map(lambda dataset: dataset if marker else None, cache=cache)
+
+
+def test_eviction(tmp_path):
+    collection = xcollection.Collection({'foo': ds, 'bar': ds + 1, 'baz': ds + 2})
+    cache = MapCache(tmp_path)
+    collection.map(anomaly, cache=cache)
+    sizes = cache.size
+    assert sizes > 0
+
+    cache.max_size = sizes // 2
+    assert cache.evict()
+    assert cache.size <= cache.max_size
+    assert 0 < len(cache) < 3
+
+    # 'baz' is served from the cache before 'foo' and 'bar' are stored, so the least
+    # recently used result is now 'baz', and the most recently used one 'bar'
+    collection.map(anomaly, cache=cache)
+    assert 0 < len(cache) < 3
+    assert cache.size <= cache.max_size
+    last = xcollection.fingerprint.dataset_fingerprint(collection['bar'])
+    assert cache.entry_key(anomaly, last) in cache
+
+    with pytest.raises(ValueError):
+        MapCache(tmp_path, max_size=-1)
@@ -0,0 +1,58 @@
+import dask
+import pytest
+import xarray as xr
+
+import xcollection
+from xcollection.chunking import plan_chunks
+
+ds = xr.tutorial.open_dataset('rasm')
+dsa = xr.tutorial.open_dataset('air_temperature')
+
+
+def test_plan_chunks():
+    plan = plan_chunks(dsa.chunk({'time': 7, 'lat': 5}), max_mem='1MiB')
+    assert plan['previous'] == {'time': 7, 'lat': 5, 'lon': 53}
+    # the automatic sizes are multiples of the previous chunks
+    assert plan['chunks']['time'] % 7 == 0
+    assert plan['chunk_nbytes'] <= 2**20
+    assert plan['previous_chunk_nbytes'] == 7 * 5 * 53 * 4
+
+    plan = plan_chunks(dsa, {'time': 100, 'lat': -1})
+    assert plan['chunks'] == {'time': 100, 'lat': 25, 'lon': 53}
+    assert plan['nchunks'] == 4
+    assert plan['chunk_nbytes'] == 100 * 25 * 53 * 4
+
+    with pytest.raises(ValueError):
+        plan_chunks(dsa, 'foo')
+
+
+def test_rechunk(tmp_path):
+    c = xcollection.Collection({'foo': ds, 'bar': dsa.chunk({'time': 7, 'lat': 5})})
+    plans = c.chunk_plan(max_mem='1MiB')
+    assert list(plans) == ['foo', 'bar']
+
+    rechunked = c.rechunk(max_mem='1MiB')
+    assert isinstance(rechunked, xcollection.Collection)
+    for key, dataset in rechunked.items():
+        assert dask.is_dask_collection(dataset)
+        for name, variable in dataset.data_vars.items():
+            assert variable.data.chunksize == tuple(
+                min(plans[key]['chunks'][dim], size)
+                for dim, size in zip(variable.dims, variable.shape)
+            )
+    assert rechunked == c
+
+    store = str(tmp_path / 'testing.zarr')
+    c.rechunk({'time': 8}).to_zarr(store)
+    opened = xcollection.open_collection(store, chunks={})
+    assert opened['bar'].air.encoding['chunks'] == (8, 5, 53)
+
+    # automatic chunks are aligned with the Zarr chunks, which are kept
+    auto = opened.rechunk(max_mem='1MiB')
+    assert auto['bar'].air.encoding['chunks'] == (8, 5, 53)
+    assert auto['bar'].air.data.chunksize[0] % 8 == 0
+    # unaligned chunks are removed from the encoding so that the result can be written
+    unaligned = opened.rechunk({'time': 12})
+    assert 'chunks' not in unaligned['bar'].air.encoding
+    assert opened['bar'].air.encoding['chunks'] == (8, 5, 53)
+    unaligned.to_zarr(str(tmp_path / 'unaligned.zarr'))
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import xarray as xr
+import zarr
+
+import xcollection
+from xcollection.coords import (
+    SHARED_COORDS_KEY,
+    SHARED_GROUP,
+    coord_fingerprint,
+    find_shared_coords,
+)
+
+ds = xr.tutorial.open_dataset('rasm').isel(time=slice(0, 4), y=slice(0, 10), x=slice(0, 10))
+dsa = xr.tutorial.open_dataset('air_temperature').isel(time=slice(0, 4))
+
+
+@pytest.fixture
+def collection():
+    xc = ds.xc.copy(deep=True)
+    xc.attrs = {'units': 'degrees_east', 'valid_range': np.array([0.0, 360.0])}
+    return xcollection.Collection(
+        {
+            'foo': ds.isel(time=0),
+            'bar': ds.isel(time=1).assign_coords(xc=xc),
+            'baz': dsa,
+            'qux': ds.isel(y=0),
+        }
+    )
+
+
+def test_find_shared_coords(collection):
+    shared, references = find_shared_coords(collection.datasets)
+    assert set(references) == {'foo', 'bar'}
+    assert references['foo'] == references['bar']
+    assert set(references['foo']) == {'xc', 'yc'}
+    assert set(shared) == set(references['foo'].values())
+    # the attributes are not part of the fingerprint, the values are
+    assert coord_fingerprint(ds.xc.variable) == coord_fingerprint(collection['bar'].xc.variable)
+    assert coord_fingerprint(ds.xc.variable) != coord_fingerprint((ds.xc + 1).variable)
+
+
+def test_share_coords(collection):
+    result = collection.share_coords()
+    assert result == collection
+    assert result['foo'].xc.data is result['bar'].xc.data
+    assert result['foo'].yc.data is result['bar'].yc.data
+    assert result['bar'].xc.attrs['units'] == 'degrees_east'
+    assert not result['foo'].xc.data.flags.writeable
+    with pytest.raises(ValueError):
+        result['foo'].xc.data[0, 0] = 0
+    # index coordinates and coordinates of a single dataset are left as they are
+    assert result['qux'].xc.data.flags.writeable
+    assert result['baz'].lat.data is not result['foo'].xc.data
+
+
+@pytest.mark.parametrize('consolidated', [False, True])
+def test_to_zarr_share_coords(tmp_path, collection, consolidated):
+    shared_store = str(tmp_path / 'shared.zarr')
+    plain_store = str(tmp_path / 'plain.zarr')
+    collection.to_zarr(shared_store, share_coords=True)
+    collection.to_zarr(plain_store)
+    if not consolidated:
+        zarr.storage.DirectoryStore(shared_store).pop('.zmetadata')
+
+    root = zarr.open_group(shared_store, mode='r')
+    assert len(root[SHARED_GROUP]) == 2
+    assert 'xc' not in root['foo'] and 'xc' not in root['bar']
+    assert 'xc' in root['qux']
+
+    result = xcollection.open_collection(shared_store)
+    assert list(result.keys()) == ['foo', 'bar', 'baz', 'qux']
+    assert result == collection
+    for key in result.keys():
+        xr.testing.assert_identical(result[key], xcollection.open_collection(plain_store)[key])
+    assert result['foo'].xc.data is result['bar'].xc.data
+
+    lazy = xcollection.open_collection(shared_store, lazy=True)
+    # the internal references are not part of the attributes, whether the dataset is open or not
+    assert SHARED_COORDS_KEY not in lazy.metadata['foo']['attrs']
+    assert lazy.metadata['foo']['attrs'] == collection.metadata['foo']['attrs']
+    assert lazy == collection
+    assert SHARED_COORDS_KEY not in lazy.datasets.metadata('foo')['attrs']
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from xcollection import fingerprint
+
+ds = xr.tutorial.open_dataset('rasm')
+dsa = xr.tutorial.open_dataset('air_temperature')
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(fingerprint, '_BLOCK_BYTES', 2**16)
+
+
+@pytest.mark.parametrize('dataset', [ds, dsa, ds.isel(time=0), xr.Dataset()])
+def test_fingerprint_is_chunking_invariant(small_blocks, dataset):
+    expected = fingerprint.dataset_fingerprint(dataset.copy(deep=True))
+    assert fingerprint.dataset_fingerprint(dataset.chunk()) == expected
+    if dataset.dims:
+        chunks = {dim: size // 3 + 1 for dim, size in dataset.dims.items()}
+        assert fingerprint.dataset_fingerprint(dataset.chunk(chunks)) == expected
+
+
+def test_fingerprint_detects_changes(small_blocks):
+    expected = fingerprint.dataset_fingerprint(dsa)
+    modified = dsa.copy(deep=True)
+    modified['air'][-1, -1, -1] = 0
+    assert fingerprint.dataset_fingerprint(modified) != expected
+    assert fingerprint.dataset_fingerprint(dsa.assign_attrs(foo='bar')) != expected
+    assert fingerprint.dataset_fingerprint(dsa.rename(air='tas')) != expected
+    assert fingerprint.dataset_fingerprint(dsa.drop_vars('lat')) != expected
+    assert fingerprint.dataset_fingerprint(dsa.astype('float64')) != expected
+
+
+def test_fingerprints_follow_changes():
+    dataset = xr.Dataset({'a': ('x', np.arange(10.0))})
+    first = fingerprint.fingerprints({'a': dataset, 'b': dataset})
+    assert first['a'] == first['b']
+
+    dataset['a'] = dataset['a'] + 1
+    second = fingerprint.dataset_fingerprint(dataset)
+    assert second != first['a']
+    # values modified in place leave the dataset object unchanged
+    dataset['a'][0] = -999
+    assert fingerprint.dataset_fingerprint(dataset) != second
+
+
+def test_structure_equal():
+    assert fingerprint.structure_equal(dsa, dsa + 1)
+    assert fingerprint.structure_equal(dsa, dsa.astype('float64'))
+    assert not fingerprint.structure_equal(dsa, dsa.astype('float64'), check_dtypes=True)
+    assert not fingerprint.structure_equal(dsa, dsa.isel(time=slice(0, 10)))
+    assert not fingerprint.structure_equal(dsa, dsa.assign_attrs(foo='bar'))
+    assert not fingerprint.structure_equal(ds, ds.reset_coords(drop=True))
+    assert not fingerprint.structure_equal(ds, dsa)
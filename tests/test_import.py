@@ -0,0 +1,73 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+import xcollection
+
+# `import xcollection` must stay well below the time it takes to import xarray
+IMPORT_TIME_BUDGET = 0.2  # seconds
+
+_HEAVY_MODULES = ['xarray', 'pandas', 'pydantic', 'toolz', 'zarr', 'dask', 'pkg_resources']
+
+
+def _run(code):
+    output = subprocess.run(
+        [sys.executable, '-c', code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def test_import_time():
+    code = f"""
+import json, sys, time
+start = time.perf_counter()
+import xcollection
+duration = time.perf_counter() - start
+print(json.dumps({{
+    'duration': duration,
+    'loaded': [name for name in {_HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+    result = _run(code)
+    assert result['loaded'] == []
+    assert result['duration'] < IMPORT_TIME_BUDGET
+
+
+def test_lazy_attributes():
+    code = """
+import json, sys
+import xcollection
+version = xcollection.__version__
+options = xcollection.set_options
+before = 'xarray' in sys.modules
+collection = xcollection.Collection
+print(json.dumps({'before': before, 'after': 'xarray' in sys.modules}))
+"""
+    assert _run(code) == {'before': False, 'after': True}
+
+
+def test_attributes():
+    assert xcollection.Collection is xcollection.main.Collection
+    assert xcollection.CollectionMapError is xcollection.parallel.CollectionMapError
+    assert isinstance(xcollection.__version__, str)
+    assert {'Collection', 'open_collection', 'main', '__version__'} <= set(dir(xcollection))
+    assert set(xcollection.__all__) <= set(dir(xcollection))
+    with pytest.raises(AttributeError):
+        xcollection.foo
+
+
+def test_version_fallback():
+    # importlib.metadata is only available on Python >= 3.8
+    code = """
+import json, sys, types
+sys.modules['importlib.metadata'] = None
+backport = types.ModuleType('importlib_metadata')
+backport.PackageNotFoundError = LookupError
+backport.version = lambda name: '1.2.3'
+sys.modules['importlib_metadata'] = backport
+import xcollection
+print(json.dumps(xcollection.__version__))
+"""
+    assert _run(code) == '1.2.3'
@@ -0,0 +1,66 @@
+import pytest
+
+from xcollection.index import MetadataTable, VariableIndex
+
+
+def test_variable_index():
+    index = VariableIndex()
+    index.add('foo', ['Tair', 'xc', 'yc'])
+    index.add('bar', ['air', 'lat', 'lon'])
+    index.add('baz', ['Tair', 'air'])
+    assert index['Tair'] == ('foo', 'baz')
+    assert set(index) == {'Tair', 'xc', 'yc', 'air', 'lat', 'lon'}
+    assert index.lookup(['Tair', 'air']) == {'baz'}
+    assert index.lookup(['Tair', 'air'], mode='any') == {'foo', 'bar', 'baz'}
+    assert index.lookup(['foo']) == set()
+    assert index.lookup([]) == {'foo', 'bar', 'baz'}
+
+    index.add('baz', ['lat'])
+    assert index['Tair'] == ('foo',)
+    assert index['lat'] == ('bar', 'baz')
+
+    index.remove('foo')
+    assert 'Tair' not in index
+    assert 'xc' not in index
+
+    with pytest.raises(ValueError):
+        index.lookup(['lat'], mode='foo')
+
+
+def _record(dims, data_vars=(), coords=(), attrs=None):
+    def variables(names):
+        return {
+            name: {'dims': list(dims), 'shape': list(dims.values()), 'dtype': 'float64'}
+            for name in names
+        }
+
+    return {
+        'dims': dims,
+        'data_vars': variables(data_vars),
+        'coords': variables(coords),
+        'attrs': attrs or {},
+    }
+
+
+def test_metadata_table():
+    table = MetadataTable()
+    table.add('foo', _record({'time': 365, 'lat': 10}, ['air'], ['lat'], {'source': 'model'}))
+    table.add('bar', _record({'time': 12}, ['air'], attrs={'source': 'obs'}))
+    table.add('baz', _record({'x': 5}, ['Tair'], ['x']))
+    assert list(table) == ['foo', 'bar', 'baz']
+    assert table.sizes.loc['bar', 'time'] == 12
+    assert table.coords.dtypes.unique().tolist() == [bool]
+    assert table.data_vars.loc['baz'].tolist() == [False, True]
+
+    assert table.query(dims='time') == ['foo', 'bar']
+    assert table.query(dims={'time': lambda size: size > 100}) == ['foo']
+    assert table.query(dims={'time': 12}) == ['bar']
+    assert table.query(dims=['time'], coords='lat') == ['foo']
+    assert table.query(data_vars=['air'], attrs={'source': 'obs'}) == ['bar']
+    assert table.query(attrs={'source': lambda value: value in {'obs', 'model'}}) == ['foo', 'bar']
+    assert table.query(dims='foo') == []
+    assert table.query(coords='foo') == []
+
+    table.remove('foo')
+    assert table.query(coords='lat') == []
+    assert list(table.sizes.index) == ['bar', 'baz']
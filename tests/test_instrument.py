@@ -0,0 +1,121 @@
+import json
+
+import pytest
+import xarray as xr
+
+import xcollection
+from xcollection.instrumentation import Record, enabled, span
+
+ds = xr.tutorial.open_dataset('rasm').isel(time=slice(0, 4), y=slice(0, 10), x=slice(0, 10))
+dsa = xr.tutorial.open_dataset('air_temperature').isel(time=slice(0, 4))
+
+
+def add_one(dataset):
+    return dataset + 1
+
+
+@pytest.fixture
+def collection():
+    return xcollection.Collection({'foo': ds, 'bar': ds.isel(x=0), 'baz': dsa})
+
+
+def _records(profile, op):
+    return [record for record in profile.records if record.op == op]
+
+
+def test_disabled(collection):
+    assert not enabled()
+    with span('map') as record:
+        assert record is None
+    assert collection.map(add_one) == xcollection.Collection(
+        {key: add_one(value) for key, value in collection.items()}
+    )
+
+
+@pytest.mark.parametrize('executor', [None, 'threads'])
+def test_map(collection, executor):
+    with xcollection.instrument() as profile:
+        collection.map(add_one, executor=executor)
+    assert not enabled()
+    records = _records(profile, 'map')
+    assert sorted(record.key for record in records if record.key) == ['bar', 'baz', 'foo']
+    (op,) = [record for record in records if record.key is None]
+    assert op.datasets == 3
+    assert op.validation_time > 0
+    assert all(record.duration <= op.duration for record in records)
+
+
+def test_choose_filter_weighted(collection):
+    weights = xr.ones_like(ds.xc)
+    with xcollection.instrument() as profile:
+        collection.choose('Tair', mode='any')
+        collection.choose('Tair').choose('xc', mode='all')
+        collection.filter(by='value', func=lambda dataset: 'x' in dataset.dims)
+        collection.choose('Tair').weighted(weights).mean()
+
+    chosen = [record for record in _records(profile, 'choose') if record.key is None]
+    assert [record.datasets for record in chosen] == [2, 2, 2, 2]
+    assert sorted(record.key for record in _records(profile, 'choose') if record.key) == [
+        'bar',
+        'foo',
+    ]
+    assert sorted(record.key for record in _records(profile, 'filter') if record.key) == [
+        'bar',
+        'baz',
+        'foo',
+    ]
+    weighted = _records(profile, 'weighted')
+    assert {record.key for record in weighted} == {None, 'foo', 'bar'}
+
+
+def test_zarr_bytes(tmp_path, collection):
+    store = tmp_path / 'test.zarr'
+    with xcollection.instrument() as profile:
+        collection.to_zarr(store, consolidated=True)
+        result = xcollection.open_collection(store)
+    assert result == collection
+
+    (written,) = [record for record in _records(profile, 'to_zarr') if record.key is None]
+    keys = [record for record in _records(profile, 'to_zarr') if record.key is not None]
+    assert written.datasets == 3
+    assert all(record.bytes_written > 0 for record in keys)
+    assert written.bytes_written > sum(record.bytes_written for record in keys)
+
+    (read,) = [record for record in _records(profile, 'open_collection') if record.key is None]
+    keys = [record for record in _records(profile, 'open_collection') if record.key is not None]
+    assert read.datasets == 3
+    assert sorted(record.key for record in keys) == ['bar', 'baz', 'foo']
+    assert read.bytes_read >= sum(record.bytes_read for record in keys) > 0
+
+
+def test_callbacks(collection):
+    seen = []
+    xcollection.register_callback(seen.append)
+    try:
+        collection.map(add_one)
+    finally:
+        xcollection.unregister_callback(seen.append)
+    collection.map(add_one)
+    assert len(seen) == 4
+    assert all(isinstance(record, Record) for record in seen)
+    assert seen[-1].key is None
+
+
+def test_exports(tmp_path, collection):
+    with xcollection.instrument() as profile:
+        collection.map(add_one).choose('Tair')
+    assert repr(profile) == '<Profile (5 records)>'
+
+    frame = profile.to_frame()
+    assert len(frame) == 5
+    assert list(frame.columns[:3]) == ['op', 'key', 'start']
+    assert frame.start.is_monotonic_increasing
+
+    path = tmp_path / 'trace.json'
+    profile.save_chrome_trace(path)
+    with open(path) as file:
+        trace = json.load(file)
+    events = trace['traceEvents']
+    assert len(events) == 5
+    assert {event['ph'] for event in events} == {'X'}
+    assert {event['name'] for event in events} >= {'map', 'map: foo', 'choose'}
@@ -1,11 +1,21 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
 import typing
 
+import dask
+import dask.array
+import numpy as np
 import pydantic
 import pytest
 import xarray as xr
 import zarr
 
 import xcollection
+from xcollection.fingerprint import dataset_fingerprint
+from xcollection.parallel import map_values_async
+from xcollection.storage import LazyDatasets
 
 ds = xr.tutorial.open_dataset('rasm')
 dsa = xr.tutorial.open_dataset('air_temperature')
@@ -34,12 +44,99 @@ def test_html_repr():
     assert formatted.count("<li class='xr-var-item'><strong>") == len(c)
 
 
+def test_repr_summary(tmp_path):
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0), 'baz': dsa})
+    with xcollection.set_options(display_max_keys=2):
+        lines = repr(c).splitlines()
+        assert lines[0] == '<Collection (3 keys)>'
+        assert lines[1].split() == ['dims', 'data_vars', 'nbytes']
+        assert lines[3].split()[:3] == ['foo', 'y:', '205,']
+        assert lines[5].split()[-3:] == ['air', '2.1', 'MB']
+        assert len(lines) == 6
+
+        formatted = c._repr_html_()
+        assert 'xr-var-item' not in formatted
+        assert formatted.count('<tr>') == 4
+
+        store = str(tmp_path / 'testing.zarr')
+        c.to_zarr(store)
+        c2 = xcollection.open_collection(store, lazy=True)
+        assert repr(c2) == repr(c)
+        assert not any(c2.datasets.is_open(key) for key in c2.keys())
+
+    assert 'Data variables' in repr(c)
+    with pytest.raises(ValueError):
+        xcollection.set_options(display_max_keys=-1)
+
+
+def test_html_repr_cached(monkeypatch):
+    calls = []
+    dataset_repr = xr.core.formatting_html.dataset_repr
+
+    def counting_repr(dataset):
+        calls.append(dataset)
+        return dataset_repr(dataset)
+
+    monkeypatch.setattr(xr.core.formatting_html, 'dataset_repr', counting_repr)
+    c = xcollection.Collection({'foo': ds, 'bar': dsa})
+    c._repr_html_()
+    assert len(calls) == 2
+    c._repr_html_()
+    assert len(calls) == 2
+
+    c['bar'] = dsa.isel(time=0)
+    c['foo'].attrs['title'] = 'changed'
+    formatted = c._repr_html_()
+    assert len(calls) == 4
+    assert 'changed' in formatted
+
+
 @pytest.mark.parametrize('datasets', [{'a': ds, 'b': 5}, {1: ds}])
 def test_validation_error(datasets):
     with pytest.raises(pydantic.ValidationError):
         xcollection.Collection(datasets)
 
 
+@pytest.mark.parametrize('validation', ['full', 'shallow', 'off'])
+def test_validation_option(validation):
+    with xcollection.set_options(validation=validation):
+        c = xcollection.Collection({'a': ds, 'b': dsa.air})
+        assert isinstance(c.datasets, dict)
+        assert c['a'] is ds
+        # data arrays are converted whatever the validation level
+        assert isinstance(c['b'], xr.Dataset)
+        d = c.map(lambda x: x.isel(time=0))
+        assert set(d.keys()) == {'a', 'b'}
+        assert list(c.choose('air').keys()) == ['b']
+        assert c == xcollection.Collection({'a': ds, 'b': dsa.air.to_dataset()})
+
+
+@pytest.mark.parametrize('datasets', [{'a': ds, 'b': 5}, {1: ds}])
+def test_validation_option_shallow_error(datasets):
+    with xcollection.set_options(validation='shallow'):
+        with pytest.raises(TypeError):
+            xcollection.Collection(datasets)
+
+
+def test_set_options_error():
+    with pytest.raises(ValueError):
+        xcollection.set_options(validation='foo')
+    with pytest.raises(ValueError):
+        xcollection.set_options(foo='full')
+
+
+def test_derived_collections_skip_validation(monkeypatch):
+    c = xcollection.Collection({'foo': ds, 'bar': dsa})
+
+    def _fail(*args, **kwargs):
+        raise AssertionError('unexpected validation')
+
+    monkeypatch.setattr(xcollection.main, '_validate_input', _fail)
+    assert list(c.choose('Tair').keys()) == ['foo']
+    assert list(c.filter(by='key', func=lambda key: key == 'bar').keys()) == ['bar']
+    assert list(c.query(dims='lat').keys()) == ['bar']
+
+
 @pytest.mark.parametrize('value', [1, ds.coords, 'test'])
 def test_setitem_validation(value):
     c = xcollection.Collection()
@@ -106,6 +203,96 @@ def test_choose_any(data_vars):
     assert len(d) == 1
 
 
+def test_variables_index():
+    c = xcollection.Collection({'foo': ds, 'bar': dsa})
+    assert c.variables_index['Tair'] == ('foo',)
+    assert c.variables_index['air'] == ('bar',)
+
+    c['baz'] = dsa
+    assert c.variables_index['air'] == ('bar', 'baz')
+    del c['bar']
+    assert c.variables_index['air'] == ('baz',)
+    assert list(c.choose('air').keys()) == ['baz']
+
+    c.datasets = {'qux': ds}
+    assert 'air' not in c.variables_index
+    assert c.variables_index['Tair'] == ('qux',)
+
+
+def test_indexes_follow_in_place_edits(tmp_path):
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': dsa.copy()})
+    assert list(c.choose('b').keys()) == []
+    assert list(c.query(attrs={'edited': True}).keys()) == []
+    c['foo']['b'] = c['foo'].Tair * 2
+    c['bar'].attrs['edited'] = True
+    # the in-place edits are only picked up after a refresh
+    assert list(c.choose('b').keys()) == []
+    c.refresh_indexes()
+    assert list(c.choose('b').keys()) == ['foo']
+    assert c.variables_index['b'] == ('foo',)
+    assert list(c.query(attrs={'edited': True}).keys()) == ['bar']
+    del c['foo']['b']
+    c.refresh_indexes(['foo'])
+    assert 'b' not in c.variables_index
+
+    store = str(tmp_path / 'testing.zarr')
+    xcollection.Collection({'foo': ds.isel(time=0), 'bar': dsa}).to_zarr(store)
+    c2 = xcollection.open_collection(store, lazy=True)
+    assert c2.variables_index['air'] == ('bar',)
+    c2['foo']['air'] = c2['foo'].Tair
+    c2.refresh_indexes()
+    assert list(c2.choose('air').keys()) == ['foo', 'bar']
+    assert c2.metadata['foo']['data_vars'].keys() == {'Tair', 'air'}
+
+
+def test_choose_lazy(tmp_path):
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0), 'baz': dsa})
+    store = str(tmp_path / 'testing.zarr')
+    c.to_zarr(store)
+
+    c2 = xcollection.open_collection(store, lazy=True)
+    assert c2.variables_index['Tair'] == ('foo', 'bar')
+    assert not any(c2.datasets.is_open(key) for key in c2.keys())
+    d = c2.choose('air')
+    assert list(d.keys()) == ['baz']
+    assert not c2.datasets.is_open('foo')
+
+
+def test_query():
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0), 'baz': dsa})
+    assert list(c.query(dims={'time': lambda size: size > 100}, coords='lat').keys()) == ['baz']
+    assert list(c.query(dims={'x': 275}).keys()) == ['foo', 'bar']
+    assert list(c.query(dims=['y'], data_vars='Tair').keys()) == ['foo']
+    assert list(c.query(attrs={'title': lambda title: 'air' in title}).keys()) == ['baz']
+    assert len(c.query(coords=['lat', 'xc'])) == 0
+
+    c['qux'] = dsa.isel(time=slice(0, 10))
+    assert list(c.query(dims={'time': 10}).keys()) == ['qux']
+    del c['baz']
+    assert len(c.query(coords='lat')) == 1
+    assert c.metadata.sizes.loc['bar', 'time'] == 36
+
+
+def test_query_lazy(tmp_path):
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0), 'baz': dsa})
+    store = str(tmp_path / 'testing.zarr')
+    c.to_zarr(store)
+
+    c2 = xcollection.open_collection(store, lazy=True)
+    d = c2.query(dims={'time': lambda size: size > 100}, attrs={'title': dsa.attrs['title']})
+    assert list(d.keys()) == ['baz']
+    # neither the source nor the result open any dataset
+    assert not any(c2.datasets.is_open(key) for key in c2.keys())
+    assert isinstance(d.datasets, LazyDatasets)
+    assert not d.datasets.is_open('baz')
+    xr.testing.assert_identical(d['baz'], c2['baz'])
+
+    c2['qux'] = dsa
+    d = c2.choose('air')
+    assert list(d.keys()) == ['baz', 'qux']
+    assert d['qux'] is dsa and not d.datasets.is_open('baz')
+
+
 @pytest.mark.parametrize('dim, attrs', [('time', {'foo': 'bar'}), (['lat', 'lon'], {})])
 def test_map(dim, attrs):
     c = xcollection.Collection({'foo': dsa, 'bar': dsa})
@@ -120,6 +307,33 @@ def test_map(dim, attrs):
     xr.testing.assert_identical(d['foo'], func(dsa, 'air', attrs=attrs, dim=dim).to_dataset())
 
 
+def _mean_air(ds, dim=None):
+    return ds[['air']].mean(dim)
+
+
+@pytest.mark.parametrize('executor', ['threads', 'processes', 'dask'])
+def test_map_executor(executor):
+    c = xcollection.Collection({'foo': dsa, 'bar': dsa.isel(time=slice(0, 10)), 'baz': dsa})
+    d = c.map(_mean_air, executor=executor, max_workers=2, dim='time')
+    assert list(d.keys()) == list(c.keys())
+    assert d == c.map(_mean_air, dim='time')
+
+
+def _select_air(ds):
+    return ds['air']
+
+
+def test_map_executor_errors():
+    c = xcollection.Collection({'foo': ds, 'bar': dsa, 'baz': ds})
+    with pytest.raises(xcollection.CollectionMapError) as excinfo:
+        c.map(_select_air, executor='threads')
+    assert list(excinfo.value.errors) == ['foo', 'baz']
+    assert all(isinstance(err, KeyError) for err in excinfo.value.errors.values())
+
+    with pytest.raises(ValueError):
+        c.map(_select_air, executor='foo')
+
+
 def test_keymap():
     c = xcollection.Collection({'foo': ds, 'bar': ds})
     d = c.keymap(lambda k: k.upper())
@@ -127,6 +341,8 @@ def test_keymap():
 
     with pytest.raises(TypeError):
         c.keymap('TEST')
+    with pytest.raises(TypeError, match='Expected keys to be str'):
+        c.keymap(len)
 
 
 def test_map_type_error():
@@ -168,6 +384,34 @@ def test_equivalence():
     assert a != c
 
 
+@pytest.mark.parametrize('method', ['full', 'hash', 'metadata'])
+def test_equals(method):
+    a = xcollection.Collection({'foo': ds, 'bar': dsa})
+    assert a.equals(a, method=method)
+    assert a.equals(a.map(lambda x: x.chunk()), method=method)
+    assert a.equals(xcollection.Collection({'bar': dsa.copy(deep=True), 'foo': ds}), method=method)
+    assert not a.equals(ds, method=method)
+    assert not a.equals(a.filter(by='key', func=lambda x: x == 'foo'), method=method)
+    assert not a.equals(
+        xcollection.Collection({'foo': ds, 'bar': dsa.assign_attrs(foo='bar')}), method=method
+    )
+
+    shifted = xcollection.Collection({'foo': ds, 'bar': dsa + 1})
+    assert a.equals(shifted, method=method) == (method == 'metadata')
+
+    # values modified in place are compared, not those of an earlier comparison
+    b = xcollection.Collection({'foo': ds, 'bar': dsa.copy(deep=True).load()})
+    assert a.equals(b, method=method)
+    b['bar']['air'][0, 0, 0] = -999
+    assert a.equals(b, method=method) == (method == 'metadata')
+
+
+def test_equals_method_error():
+    c = xcollection.Collection()
+    with pytest.raises(ValueError):
+        c.equals(c, method='foo')
+
+
 def test_to_zarr(tmp_path):
     c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0)})
     store = str(tmp_path / 'testing.zarr')
@@ -180,6 +424,369 @@ def test_to_zarr(tmp_path):
     assert c == c2
 
 
+@pytest.mark.parametrize('parallel', [False, True])
+def test_to_zarr_parallel_and_delayed(tmp_path, parallel):
+    import dask
+    from dask.delayed import Delayed
+
+    c = xcollection.Collection(
+        {'foo': ds.isel(time=0), 'bar': ds.isel(y=0).chunk({'time': 10}), 'baz': dsa}
+    )
+    store = str(tmp_path / 'testing.zarr')
+    c.to_zarr(store, parallel=parallel, max_workers=2)
+    assert xcollection.open_collection(store) == c
+
+    store = str(tmp_path / 'delayed.zarr')
+    delayed = c.to_zarr(store, compute=False, parallel=parallel)
+    assert isinstance(delayed, Delayed)
+    assert set(zarr.open_consolidated(store, mode='r').group_keys()) == set(c.keys())
+    assert xcollection.open_collection(store) != c
+    dask.compute(delayed)
+    assert xcollection.open_collection(store) == c
+
+
+def test_to_zarr_manifest(tmp_path):
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0)})
+    store = str(tmp_path / 'testing.zarr')
+    c.to_zarr(store)
+
+    zstore = zarr.open_consolidated(store, mode='r')
+    assert set(zstore.group_keys()) == set(c.keys())
+    manifest = zstore.attrs['xcollection']
+    assert manifest['keys'] == ['foo', 'bar']
+    assert manifest['datasets']['bar']['dims'] == {'time': 36, 'x': 275}
+    assert manifest['datasets']['foo']['data_vars']['Tair']['shape'] == [205, 275]
+    assert set(manifest['datasets']['foo']['coords']) == {'time', 'xc', 'yc'}
+    assert list(xcollection.open_collection(store).keys()) == ['foo', 'bar']
+
+    xcollection.Collection({'baz': dsa}).to_zarr(store, mode='a')
+    manifest = zarr.open_consolidated(store, mode='r').attrs['xcollection']
+    assert manifest['keys'] == ['foo', 'bar', 'baz']
+    assert list(xcollection.open_collection(store).keys()) == ['foo', 'bar', 'baz']
+
+
+def test_to_zarr_manifest_partial_writes(tmp_path):
+    store = str(tmp_path / 'testing.zarr')
+    air = dsa.isel(time=slice(0, 10)).load()
+    xcollection.Collection({'foo': air.isel(time=slice(0, 5))}).to_zarr(store)
+    xcollection.Collection({'foo': air.isel(time=slice(5, 10))}).to_zarr(
+        store, mode='a', append_dim='time'
+    )
+    # the entry describes the stored group, not the appended part
+    c = xcollection.open_collection(store, lazy=True)
+    assert c.datasets.metadata('foo')['dims']['time'] == 10
+    assert c.datasets.metadata('foo')['data_vars']['air']['shape'] == [10, 25, 53]
+    assert list(c.query(dims={'time': 10}).keys()) == ['foo']
+
+    region = air.isel(time=slice(0, 2)).drop_vars(['lat', 'lon']) + 1
+    xcollection.Collection({'foo': region}).to_zarr(store, mode='r+', region={'time': slice(0, 2)})
+    entry = zarr.open_consolidated(store, mode='r').attrs['xcollection']['datasets']['foo']
+    assert entry['dims'] == {'time': 10, 'lat': 25, 'lon': 53}
+    assert set(entry['coords']) == {'time', 'lat', 'lon'}
+
+
+@pytest.mark.parametrize('consolidated', [False, True])
+@pytest.mark.parametrize('parallel', [False, True])
+def test_open_collection(tmp_path, parallel, consolidated):
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0), 'baz': dsa})
+    store = str(tmp_path / 'testing.zarr')
+    c.to_zarr(store)
+    if not consolidated:
+        zarr.storage.DirectoryStore(store).pop('.zmetadata')
+
+    c2 = xcollection.open_collection(store, parallel=parallel, max_workers=2)
+    assert c == c2
+    # the consolidated argument of xarray.open_dataset is accepted
+    assert xcollection.open_collection(store, parallel=parallel, consolidated=consolidated) == c
+    assert xcollection.open_collection(store, lazy=True, consolidated=consolidated) == c
+
+
+def test_open_collection_lazy(tmp_path):
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0), 'baz': dsa})
+    store = str(tmp_path / 'testing.zarr')
+    c.to_zarr(store)
+
+    c2 = xcollection.open_collection(store, lazy=True, cache_size=2)
+    datasets = c2.datasets
+    assert len(c2) == 3
+    assert set(c2.keys()) == set(c.keys())
+    assert 'foo' in c2
+    assert 'qux' not in c2
+    assert not any(datasets.is_open(key) for key in c2.keys())
+
+    xr.testing.assert_identical(c2['foo'], c['foo'])
+    assert datasets.is_open('foo')
+    assert c2['foo'] is c2['foo']
+    c2['bar']
+    c2['baz']
+    assert not datasets.is_open('foo')
+    assert datasets.is_open('bar') and datasets.is_open('baz')
+
+    c2['qux'] = dsa.air
+    del c2['baz']
+    assert set(c2.keys()) == {'foo', 'bar', 'qux'}
+    assert isinstance(c2['qux'], xr.Dataset)
+    assert c2 == xcollection.Collection({'foo': c['foo'], 'bar': c['bar'], 'qux': dsa.air})
+
+    with pytest.raises(KeyError):
+        c2['baz']
+
+    with pytest.raises(ValueError):
+        xcollection.open_collection(store, cache_size=2)
+
+
+@pytest.mark.parametrize('prefetch', [0, 1, 3])
+def test_iter_map(prefetch):
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0), 'baz': dsa})
+    results = c.iter_map(lambda dset, n: dset.mean() + n, (1,), prefetch=prefetch)
+    assert not isinstance(results, dict)
+    results = list(results)
+    assert [key for key, _ in results] == ['foo', 'bar', 'baz']
+    expected = c.map(lambda dset: dset.mean() + 1)
+    assert xcollection.Collection(dict(results)) == expected
+    # datasets that are not opened from a store are not closed
+    xr.testing.assert_identical(c['foo'], ds.isel(time=0))
+
+    with pytest.raises(ValueError):
+        c.iter_map(lambda dset: dset, prefetch=-1)
+    with pytest.raises(TypeError):
+        c.iter_map('foo')
+
+
+@pytest.mark.parametrize('prefetch', [0, 1])
+def test_iter_map_lazy(tmp_path, monkeypatch, prefetch):
+    c = xcollection.Collection({f'key{i}': ds.isel(time=i) for i in range(6)})
+    store = str(tmp_path / 'testing.zarr')
+    c.to_zarr(store)
+    c2 = xcollection.open_collection(store, lazy=True)
+    datasets = c2.datasets
+
+    lock = threading.Lock()
+    state = {'open': 0, 'max': 0}
+    open_dataset = datasets.open
+
+    def counting_open(key):
+        dataset = open_dataset(key)
+        with lock:
+            state['open'] += 1
+            state['max'] = max(state['max'], state['open'])
+
+        def close(close=dataset._close):
+            with lock:
+                state['open'] -= 1
+            close()
+
+        dataset.set_close(close)
+        return dataset
+
+    monkeypatch.setattr(datasets, 'open', counting_open)
+
+    results = dict(c2.iter_map(lambda dset: dset.Tair.mean().load(), prefetch=prefetch))
+    assert list(results) == list(c.keys())
+    for key, value in results.items():
+        xr.testing.assert_allclose(value, c[key].Tair.mean())
+    assert state['open'] == 0
+    assert state['max'] <= prefetch + 1
+    assert not any(datasets.is_open(key) for key in c2.keys())
+
+    # stopping the iteration early closes the datasets opened in advance
+    iterator = c2.iter_map(lambda dset: dset, prefetch=prefetch)
+    next(iterator)
+    iterator.close()
+    assert state['open'] == 0
+
+
+def test_iter_collection(tmp_path):
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0), 'baz': dsa})
+    store = str(tmp_path / 'testing.zarr')
+    c.to_zarr(store)
+
+    keys = []
+    for key, dataset in xcollection.iter_collection(store, prefetch=1):
+        xr.testing.assert_identical(dataset, c[key])
+        keys.append(key)
+    assert keys == ['foo', 'bar', 'baz']
+
+    results = dict(xcollection.iter_collection(store, lambda dset: len(dset.variables)))
+    assert results == {key: len(dset.variables) for key, dset in c.items()}
+
+
+@pytest.mark.parametrize('memory', [False, True])
+def test_zarr_async(tmp_path, memory):
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0), 'baz': dsa})
+    store = zarr.storage.MemoryStore() if memory else str(tmp_path / 'testing.zarr')
+
+    async def roundtrip():
+        await c.to_zarr_async(store, max_concurrency=2)
+        return await xcollection.open_collection_async(store, max_concurrency=2)
+
+    c2 = asyncio.run(roundtrip())
+    assert list(c2.keys()) == ['foo', 'bar', 'baz']
+    assert c == c2 == xcollection.open_collection(store)
+
+    with pytest.raises(ValueError):
+        asyncio.run(c.to_zarr_async(store, compute=False))
+    with pytest.raises(ValueError):
+        asyncio.run(map_values_async(str, {'a': 1}, max_concurrency=0))
+
+
+def test_map_values_async_bounded():
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def work(value):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        if value < 0:
+            raise ValueError(value)
+        return value * 2
+
+    mapping = {str(i): i for i in range(10)}
+    result = asyncio.run(map_values_async(work, mapping, max_concurrency=3))
+    assert result == {key: value * 2 for key, value in mapping.items()}
+    assert list(result) == list(mapping)
+    assert peak[0] <= 3
+
+    with pytest.raises(xcollection.CollectionMapError) as excinfo:
+        asyncio.run(map_values_async(work, {'a': 1, 'b': -1, 'c': -2}))
+    assert set(excinfo.value.errors) == {'b', 'c'}
+
+
+def test_map_values_async_cancel(monkeypatch):
+    # the cancel_futures argument of ThreadPoolExecutor.shutdown requires Python >= 3.9
+    shutdown = concurrent.futures.ThreadPoolExecutor.shutdown
+    monkeypatch.setattr(
+        concurrent.futures.ThreadPoolExecutor,
+        'shutdown',
+        lambda self, wait=True: shutdown(self, wait),
+    )
+    started, release = [], threading.Event()
+
+    def work(value):
+        started.append(value)
+        release.wait(5)
+        return value
+
+    async def run():
+        task = asyncio.ensure_future(
+            map_values_async(work, {str(i): i for i in range(10)}, max_concurrency=2)
+        )
+        while len(started) < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
+    # no value is processed after the cancellation
+    time.sleep(0.05)
+    assert sorted(started) == [0, 1]
+
+
+def test_sync_zarr(tmp_path):
+    store = str(tmp_path / 'testing.zarr')
+    foo, bar = ds.isel(time=slice(0, 24)), dsa.isel(time=slice(0, 10))
+    c = xcollection.Collection({'foo': foo, 'bar': bar})
+    c.to_zarr(store)
+    # groups written by to_zarr have no fingerprint
+    report = c.sync_zarr(store, append_dim='time')
+    assert report == {'written': [], 'appended': [], 'overwritten': ['foo', 'bar'], 'skipped': []}
+    report = c.sync_zarr(store, append_dim='time')
+    assert report == {'written': [], 'appended': [], 'overwritten': [], 'skipped': ['foo', 'bar']}
+
+    c['foo'] = ds
+    c['bar'] = bar + 1
+    c['baz'] = dsa.isel(time=0)
+    report = c.sync_zarr(store, append_dim='time')
+    assert report == {
+        'written': ['baz'],
+        'appended': ['foo'],
+        'overwritten': ['bar'],
+        'skipped': [],
+    }
+    assert xcollection.open_collection(store) == c
+
+    manifest = zarr.open_group(store, mode='r').attrs['xcollection']
+    assert manifest['keys'] == ['foo', 'bar', 'baz']
+    assert manifest['datasets']['foo']['fingerprint'] == dataset_fingerprint(ds)
+    report = c.sync_zarr(store, append_dim='time')
+    assert report['skipped'] == ['foo', 'bar', 'baz']
+
+    # growing with a modified stored part is not an append
+    c['bar'] = dsa.isel(time=slice(0, 20))
+    report = c.sync_zarr(store, append_dim='time')
+    assert report['overwritten'] == ['bar']
+    assert xcollection.open_collection(store, lazy=True).metadata['bar'] == c.metadata['bar']
+
+    # values modified in place are written
+    c['baz'] = c['baz'].copy(deep=True).load()
+    c.sync_zarr(store)
+    c['baz']['air'][0, 0] = -999
+    report = c.sync_zarr(store)
+    assert report['overwritten'] == ['baz']
+    assert float(xcollection.open_collection(store)['baz'].air[0, 0]) == -999
+
+
+def test_compute_persist_load():
+    calls = []
+
+    def load_shared():
+        calls.append(None)
+        return dsa.air.values
+
+    shared = xr.DataArray(
+        dask.array.from_delayed(dask.delayed(load_shared)(), dsa.air.shape, dsa.air.dtype),
+        dims=dsa.air.dims,
+        coords=dsa.air.coords,
+        name='air',
+    )
+    c = xcollection.Collection(
+        {'foo': shared.to_dataset(), 'bar': (shared + 1).to_dataset(), 'baz': ds.isel(time=0)}
+    )
+
+    computed = c.compute(scheduler='threads')
+    assert len(calls) == 1
+    assert not any(dask.is_dask_collection(dataset) for dataset in computed.values())
+    assert all(dask.is_dask_collection(c[key]) for key in ['foo', 'bar'])
+    xr.testing.assert_identical(computed['bar'], (dsa.air + 1).to_dataset())
+
+    persisted = c.persist(scheduler='threads')
+    assert len(calls) == 2
+    assert dask.is_dask_collection(persisted['foo'])
+    assert persisted == computed
+
+    foo = c['foo']
+    assert c.load(scheduler='threads') is c
+    assert len(calls) == 3
+    assert c['foo'] is foo
+    assert not dask.is_dask_collection(foo)
+    assert c == computed
+
+
+def test_compute_persist_lazy_store(tmp_path):
+    store = str(tmp_path / 'testing.zarr')
+    xcollection.Collection({'foo': ds.isel(time=0), 'bar': dsa}).to_zarr(store)
+    c = xcollection.open_collection(store)
+    assert not isinstance(c['foo'].Tair.variable._data, np.ndarray)
+
+    for result in [c.compute(), c.persist()]:
+        for key, dataset in result.items():
+            for name, variable in dataset.variables.items():
+                if name not in dataset.indexes:
+                    assert isinstance(variable._data, np.ndarray)
+            xr.testing.assert_identical(dataset, c[key].load())
+    # the datasets of the collection are left unchanged
+    c = xcollection.open_collection(store)
+    c.compute()
+    assert not isinstance(c['foo'].Tair.variable._data, np.ndarray)
+
+
 @pytest.mark.parametrize('datasets', [{'foo': ds, 'bar': dsa}])
 def test_weighted(datasets):
     ds_dict = datasets
@@ -211,3 +818,66 @@ def test_weighted(datasets):
             assert isinstance(ds, xr.Dataset)
             assert isinstance(dict_dict[k][j], xr.Dataset)
             assert ds == dict_dict[k][j]
+
+
+@pytest.mark.parametrize('chunks', [None, {'time': 12}])
+@pytest.mark.parametrize('dim', ['time', ('y', 'x'), None])
+@pytest.mark.parametrize('reduction', ['mean', 'sum', 'std', 'sum_of_weights'])
+def test_weighted_stacked_members(chunks, dim, reduction):
+    base = ds.isel(y=slice(0, 20), x=slice(0, 30))
+    if chunks:
+        base = base.chunk(chunks)
+    members = {f'member{i}': base + i for i in range(3)}
+    members['masked'] = members['member0'].where(base.Tair > 0)
+    members['attrs'] = base.assign_attrs(experiment='historical')
+    members['shorter'] = base.isel(time=slice(0, 12))
+    weights = xr.ones_like(base.xc) * base.y
+    c = xcollection.Collection(members)
+
+    groups = xcollection.main._stackable_groups(c.datasets)
+    assert groups == [['member0', 'member1', 'member2', 'masked'], ['attrs'], ['shorter']]
+
+    result = getattr(c.weighted(weights), reduction)(dim=dim)
+    assert list(result.keys()) == list(members)
+    for key, member in members.items():
+        expected = getattr(member.weighted(weights), reduction)(dim=dim)
+        xr.testing.assert_allclose(result[key], expected)
+
+
+@pytest.mark.parametrize('chunks', [None, {'time': 12}])
+def test_to_dataset_from_dataset(chunks):
+    base = ds.isel(y=slice(0, 20), x=slice(0, 30))
+    if chunks:
+        base = base.chunk(chunks)
+    with xr.set_options(keep_attrs=True):
+        c = xcollection.Collection({'a': base, 'b': base * 2, 'c': base + 1})
+    stacked = c.to_dataset(dim='member')
+    assert stacked.Tair.dims == ('member', 'time', 'y', 'x')
+    assert list(stacked.member.values) == ['a', 'b', 'c']
+    assert stacked.xc.dims == ('y', 'x')
+    if chunks:
+        assert stacked.Tair.chunks[0] == (1, 1, 1)
+
+    d = xcollection.Collection.from_dataset(stacked, dim='member')
+    assert list(d.keys()) == ['a', 'b', 'c']
+    for key in c.keys():
+        xr.testing.assert_identical(d[key], c[key])
+
+
+def test_from_dataset_views():
+    data = dsa.isel(time=slice(0, 4)).load()
+    c = xcollection.Collection.from_dataset(data, dim='time')
+    assert list(c.keys()) == [str(value) for value in data.time.values]
+    c = xcollection.Collection.from_dataset(data.drop_vars('time'), dim='time')
+    assert list(c.keys()) == ['0', '1', '2', '3']
+    assert c['1'].air.values.base is not None
+    xr.testing.assert_identical(c['1'], data.drop_vars('time').isel(time=1))
+
+
+def test_to_dataset_errors():
+    with pytest.raises(ValueError, match='empty'):
+        xcollection.Collection().to_dataset()
+    with pytest.raises(ValueError, match='already exists'):
+        xcollection.Collection({'a': ds}).to_dataset(dim='time')
+    with pytest.raises(ValueError, match='not found'):
+        xcollection.Collection.from_dataset(ds, dim='member')
@@ -0,0 +1,162 @@
+import pytest
+import xarray as xr
+
+import xcollection
+from xcollection.plan import LazyCollection, Step, optimize
+
+ds = xr.tutorial.open_dataset('rasm').isel(time=slice(0, 4), y=slice(0, 10), x=slice(0, 10))
+dsa = xr.tutorial.open_dataset('air_temperature').isel(time=slice(0, 4))
+
+
+def add_one(dataset):
+    return dataset + 1
+
+
+def scale(dataset, factor=2):
+    return dataset * factor
+
+
+def not_bar(key):
+    return key != 'BAR'
+
+
+def has_y(dataset):
+    return 'y' in dataset.dims
+
+
+def fail(dataset):
+    raise RuntimeError('boom')
+
+
+@pytest.fixture
+def collection():
+    return xcollection.Collection({'foo': ds, 'bar': ds.isel(x=0), 'baz': dsa})
+
+
+def test_optimize():
+    steps = [
+        Step('map', funcs=(add_one,), names=('add_one',)),
+        Step('keymap', funcs=(str.upper,), names=('upper',)),
+        Step('map', funcs=(scale,), names=('scale',)),
+        Step('map', funcs=(add_one,), names=('add_one',)),
+        Step('filter', funcs=(lambda key: key != 'FOO',), names=('f',), options={'by': 'key'}),
+    ]
+    optimized = optimize(steps)
+    assert [step.op for step in optimized] == ['filter', 'map', 'keymap', 'map']
+    assert optimized[0].funcs[0]('foo') is False
+    assert optimized[0].funcs[0]('bar') is True
+    assert optimized[3].funcs == (scale, add_one)
+
+
+@pytest.mark.parametrize('executor', [None, 'threads'])
+def test_collect_matches_eager(collection, executor):
+    eager = (
+        collection.choose('Tair')
+        .map(add_one)
+        .map(scale, factor=3)
+        .keymap(str.upper)
+        .filter(by='key', func=lambda key: key != 'BAR')
+        .filter(by='value', func=lambda dataset: 'y' in dataset.dims)
+    )
+    lazy = (
+        collection.lazy()
+        .choose('Tair')
+        .map(add_one)
+        .map(scale, factor=3)
+        .keymap(str.upper)
+        .filter(by='key', func=lambda key: key != 'BAR')
+        .filter(by='value', func=lambda dataset: 'y' in dataset.dims)
+    )
+    assert isinstance(lazy, LazyCollection)
+    result = lazy.collect(executor=executor)
+    assert isinstance(result, xcollection.Collection)
+    assert list(result.keys()) == list(eager.keys()) == ['FOO']
+    assert result == eager
+
+
+@pytest.mark.parametrize('executor', ['processes', 'shared_memory'])
+def test_collect_processes(collection, executor):
+    # the plan, including bound arguments and composed filters, is sent to the workers
+    eager = (
+        collection.choose('Tair')
+        .map(scale, factor=3)
+        .keymap(str.upper)
+        .filter(by='key', func=not_bar)
+        .filter(by='value', func=has_y)
+    )
+    lazy = (
+        collection.lazy()
+        .choose('Tair')
+        .map(scale, factor=3)
+        .keymap(str.upper)
+        .filter(by='key', func=not_bar)
+        .filter(by='value', func=has_y)
+    )
+    result = lazy.collect(executor=executor, max_workers=2)
+    assert list(result.keys()) == ['FOO']
+    assert result == eager
+
+    with pytest.raises(xcollection.CollectionMapError) as excinfo:
+        collection.lazy().map(fail).collect(executor=executor, max_workers=2)
+    assert set(excinfo.value.errors) == {'foo', 'bar', 'baz'}
+
+
+def test_explain(collection):
+    lazy = (
+        collection.lazy()
+        .map(add_one)
+        .choose('Tair')
+        .map(scale)
+        .map(add_one)
+        .filter(by='key', func=lambda key: key != 'foo')
+    )
+    assert len(lazy.steps) == 5
+    explained = lazy.explain()
+    assert explained.splitlines() == [
+        '<LazyCollection (3 keys in source)>',
+        "  1. filter(by='key', func=<lambda>)  # keys only",
+        '  2. map(func=add_one)',
+        "  3. choose(data_vars=['Tair'], mode='any')",
+        '  4. map(funcs=[scale, add_one])  # 2 fused maps',
+    ]
+    assert collection.lazy().choose('Tair').explain().splitlines() == [
+        '<LazyCollection (3 keys in source)>',
+        "  1. choose(data_vars=['Tair'], mode='any')  # variables index",
+    ]
+    assert repr(lazy) == explained
+
+
+def test_filtered_keys_are_not_mapped(collection):
+    seen = []
+
+    def record(dataset):
+        seen.append(dataset)
+        return dataset
+
+    lazy = collection.lazy().map(record).filter(by='key', func=lambda key: key == 'baz')
+    result = lazy.compute()
+    assert list(result.keys()) == ['baz']
+    assert len(seen) == 1
+
+    lazy = collection.lazy().choose('air').map(record)
+    assert list(lazy.collect().keys()) == ['baz']
+    assert len(seen) == 2
+
+
+def test_choose_all(collection):
+    lazy = collection.lazy().choose('Tair', mode='all')
+    with pytest.raises(KeyError):
+        lazy.collect()
+    result = collection.lazy().choose('Tair').choose(['Tair', 'xc'], mode='all').collect()
+    assert result == collection.choose('Tair').choose(['Tair', 'xc'], mode='all')
+
+
+def test_invalid_steps(collection):
+    with pytest.raises(ValueError):
+        collection.lazy().choose('Tair', mode='foo')
+    with pytest.raises(ValueError):
+        collection.lazy().filter(by='foo', func=bool)
+    with pytest.raises(TypeError):
+        collection.lazy().map('foo')
+    with pytest.raises(TypeError):
+        collection.lazy().keymap('foo')
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+import xcollection
+from xcollection.reductions import MemberAccumulator
+
+ds = xr.tutorial.open_dataset('rasm').isel(time=slice(0, 6), y=slice(0, 10), x=slice(0, 10)).load()
+dsa = xr.tutorial.open_dataset('air_temperature').isel(time=slice(0, 4)).load()
+
+
+@pytest.fixture
+def members():
+    members = {f'member{i}': ds.isel(time=i) for i in range(6)}
+    # missing values are skipped
+    members['member2'] = members['member2'].where(members['member2'].Tair > 0)
+    return members
+
+
+def _stacked(members, join='exact'):
+    return xr.concat(list(members.values()), dim='member', join=join, coords='different')
+
+
+@pytest.mark.parametrize('stat', ['mean', 'sum', 'min', 'max', 'std'])
+def test_streaming_stats(members, stat):
+    c = xcollection.Collection(members)
+    result = getattr(c, stat)()
+    expected = getattr(_stacked(members), stat)('member')
+    xr.testing.assert_allclose(result, expected)
+    xr.testing.assert_allclose(c.reduce(stat), result)
+
+
+def test_std_ddof(members):
+    c = xcollection.Collection(members)
+    expected = _stacked(members).std('member', ddof=1)
+    xr.testing.assert_allclose(c.std(ddof=1), expected)
+    xr.testing.assert_allclose(c.reduce('std', ddof=1), expected)
+
+
+def test_welford_stability():
+    # the naive sum of squares loses all precision with a large offset
+    offset = 1e9
+    values = [offset + value for value in [4.0, 7.0, 13.0, 16.0]]
+    c = xcollection.Collection(
+        {str(i): xr.Dataset({'a': ('x', [value])}) for i, value in enumerate(values)}
+    )
+    assert float(c.std().a[0]) == pytest.approx(np.std([4.0, 7.0, 13.0, 16.0]))
+
+
+def test_reduce_func(members):
+    c = xcollection.Collection(members)
+    expected = _stacked(members).median('member')
+    xr.testing.assert_allclose(c.reduce(np.nanmedian), expected)
+
+
+def test_join():
+    a, b = dsa.isel(lat=slice(0, 10)), dsa.isel(lat=slice(5, 15))
+    c = xcollection.Collection({'a': a, 'b': b})
+    with pytest.raises(ValueError, match="Member 'b' cannot be aligned"):
+        c.mean()
+    for join in ['inner', 'outer']:
+        expected = _stacked({'a': a, 'b': b}, join=join).mean('member')
+        xr.testing.assert_allclose(c.mean(join=join), expected)
+        assert c.reduce(np.mean, join=join).sizes == expected.sizes
+
+    # variables with different dimensions are never broadcast
+    c = xcollection.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(y=0)})
+    for join in ['exact', 'inner', 'outer']:
+        with pytest.raises(ValueError, match="'Tair' in member 'bar'"):
+            c.mean(join=join)
+
+    c = xcollection.Collection({'a': dsa, 'b': dsa.rename(air='air2')})
+    with pytest.raises(ValueError, match='data variables'):
+        c.sum()
+    assert list(c.sum(join='inner').data_vars) == []
+    result = c.sum(join='outer')
+    xr.testing.assert_allclose(result.air.transpose(*dsa.air.dims), dsa.air.astype(float))
+    xr.testing.assert_allclose(result.air2, dsa.air.astype(float).rename('air2'))
+
+
+def test_non_numeric_and_dask(members):
+    members = {key: value.assign(label=('x', ['a'] * 10)) for key, value in members.items()}
+    c = xcollection.Collection(members).map(lambda dataset: dataset.chunk({'y': 5}))
+    result = c.mean()
+    assert list(result.data_vars) == ['Tair']
+    assert result.Tair.chunks is not None
+    xr.testing.assert_allclose(result.compute(), xcollection.Collection(members).mean())
+
+
+def test_lazy_members_are_closed(tmp_path, members, monkeypatch):
+    store = str(tmp_path / 'test.zarr')
+    xcollection.Collection(members).to_zarr(store)
+    c = xcollection.open_collection(store, lazy=True)
+    closed = []
+    open_dataset = c.datasets.open
+
+    def tracked_open(key):
+        dataset = open_dataset(key)
+        dataset.set_close(lambda key=key: closed.append(key))
+        return dataset
+
+    monkeypatch.setattr(c.datasets, 'open', tracked_open)
+    xr.testing.assert_allclose(c.mean(), xcollection.Collection(members).mean())
+    assert sorted(closed) == sorted(members)
+    assert not any(c.datasets.is_open(key) for key in c.keys())
+
+
+def test_errors(members):
+    c = xcollection.Collection(members)
+    with pytest.raises(ValueError):
+        c.reduce('mean', across='variables')
+    with pytest.raises(ValueError):
+        c.reduce('median')
+    with pytest.raises(ValueError):
+        c.mean(join='left')
+    with pytest.raises(TypeError):
+        c.reduce(42)
+    with pytest.raises(ValueError):
+        xcollection.Collection().mean()
+
+    accumulator = MemberAccumulator(['mean'])
+    with pytest.raises(ValueError):
+        accumulator.result('mean')
+    accumulator.add('foo', ds)
+    with pytest.raises(ValueError):
+        accumulator.result('max')
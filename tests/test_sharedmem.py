@@ -0,0 +1,119 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+
+import xcollection
+from xcollection.sharedmem import _SHM_DIR, rebuild, share
+
+ds = xr.tutorial.open_dataset('rasm').isel(time=slice(0, 4)).load()
+dsa = xr.tutorial.open_dataset('air_temperature').isel(time=slice(0, 10)).load()
+
+
+def _anomaly(dataset, shared=False):
+    if shared:
+        # the workers see the arrays as views of memory-mapped files
+        assert isinstance(dataset.air.data.base, np.memmap)
+    return dataset - dataset.mean('time')
+
+
+def _select_air(dataset):
+    return dataset.air.isel(time=0)
+
+
+def _identity(dataset):
+    return dataset
+
+
+def _fail(dataset):
+    raise RuntimeError('boom')
+
+
+def _leftovers():
+    return glob.glob(os.path.join(_SHM_DIR, 'xcollection-*'))
+
+
+@pytest.fixture
+def collection():
+    return xcollection.Collection({'foo': dsa, 'bar': dsa + 1, 'baz': dsa.isel(lat=slice(0, 5))})
+
+
+def test_share_rebuild(tmp_path):
+    value = dsa.assign(label=('time', np.array(['a'] * 10, dtype=object)))
+    value.attrs['title'] = 'test'
+    shared = share(value, str(tmp_path))
+    # only numpy arrays are stored in files
+    assert len(shared.paths) == len(value.variables) - 1
+    result = rebuild(shared)
+    xr.testing.assert_identical(result, value)
+    assert isinstance(result.air.data.base, np.memmap)
+    # changes are private to the process with copy-on-write
+    result.air.data[0, 0, 0] = -1
+    assert rebuild(shared).air.data[0, 0, 0] == value.air.data[0, 0, 0]
+
+    array = rebuild(share(dsa.air, str(tmp_path)))
+    xr.testing.assert_identical(array, dsa.air)
+
+
+def test_map_shared_memory(collection):
+    before = set(_leftovers())
+    result = collection.map(_anomaly, executor='shared_memory', max_workers=2, shared=True)
+    assert list(result.keys()) == list(collection.keys())
+    expected = collection.map(_anomaly)
+    for key in expected.keys():
+        xr.testing.assert_identical(result[key], expected[key])
+        # the results come back as views of the files written by the workers
+        assert isinstance(result[key].air.data.base, np.memmap)
+    assert set(_leftovers()) == before
+
+
+def test_map_shared_memory_dataarray_and_dask(collection):
+    result = collection.map(_select_air, executor='shared_memory', max_workers=2)
+    assert result == collection.map(_select_air)
+
+    chunked = xcollection.Collection({'foo': ds.chunk({'time': 2})})
+    result = chunked.map(_identity, executor='shared_memory', max_workers=1)
+    assert result['foo'].Tair.chunks is not None
+    xr.testing.assert_identical(result['foo'].compute(), ds)
+
+
+def test_map_shared_memory_errors(collection):
+    before = set(_leftovers())
+    with pytest.raises(xcollection.CollectionMapError) as excinfo:
+        collection.map(_fail, executor='shared_memory', max_workers=2)
+    assert sorted(excinfo.value.errors) == sorted(collection.keys())
+    assert set(_leftovers()) == before
+
+
+def test_map_shared_memory_free_space(collection, tmp_path, monkeypatch):
+    from xcollection import sharedmem
+
+    # /dev/shm is too small: the arrays go to the temporary directory instead
+    monkeypatch.setattr(sharedmem, '_SHM_DIR', str(tmp_path))
+    free_space = sharedmem._free_space
+    monkeypatch.setattr(
+        sharedmem,
+        '_free_space',
+        lambda directory: 1024 if directory == str(tmp_path) else free_space(directory),
+    )
+    directories = []
+    mkdtemp = sharedmem.tempfile.mkdtemp
+
+    def tracked_mkdtemp(**kwargs):
+        directories.append(kwargs['dir'])
+        return mkdtemp(**kwargs)
+
+    monkeypatch.setattr(sharedmem.tempfile, 'mkdtemp', tracked_mkdtemp)
+    result = collection.map(_anomaly, executor='shared_memory', max_workers=2)
+    assert directories == [None]
+    assert result == collection.map(_anomaly)
+
+    # values that do not fit fail instead of crashing the interpreter
+    with pytest.raises(OSError, match='Not enough space'):
+        share(dsa, str(tmp_path))
+    monkeypatch.setattr(sharedmem, '_free_space', lambda directory: 1024)
+    with pytest.raises(xcollection.CollectionMapError) as excinfo:
+        collection.map(_anomaly, executor='shared_memory', max_workers=2)
+    assert all(isinstance(err, OSError) for err in excinfo.value.errors.values())
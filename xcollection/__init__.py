@@ -1,11 +1,78 @@
 #!/usr/bin/env python3
 # flake8: noqa
 """ Top-level module for xcollection. """
-from pkg_resources import DistributionNotFound, get_distribution
+import importlib
+import typing
 
-from .main import Collection, open_collection
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from .cache import MapCache
+    from .instrumentation import instrument, register_callback, unregister_callback
+    from .main import Collection, iter_collection, open_collection, open_collection_async
+    from .options import set_options
+    from .parallel import CollectionMapError
 
-try:
-    __version__ = get_distribution('xcollection').version
-except DistributionNotFound:  # pragma: no cover
-    __version__ = 'unknown'  # pragma: no cover
+# Public attributes and the submodules defining them. The submodules, and xarray,
+# are only imported the first time one of their attributes is accessed, so that
+# importing xcollection is fast.
+_LAZY_ATTRS = {
+    'MapCache': 'cache',
+    'instrument': 'instrumentation',
+    'register_callback': 'instrumentation',
+    'unregister_callback': 'instrumentation',
+    'Collection': 'main',
+    'iter_collection': 'main',
+    'open_collection': 'main',
+    'open_collection_async': 'main',
+    'set_options': 'options',
+    'CollectionMapError': 'parallel',
+}
+
+_SUBMODULES = {
+    'cache',
+    'chunking',
+    'coords',
+    'fingerprint',
+    'index',
+    'instrumentation',
+    'main',
+    'options',
+    'parallel',
+    'plan',
+    'reductions',
+    'sharedmem',
+    'storage',
+    'types',
+}
+
+__all__ = sorted(_LAZY_ATTRS)
+
+
+def _version() -> str:
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:  # pragma: no cover
+        # Python < 3.8
+        from importlib_metadata import PackageNotFoundError, version
+
+    try:
+        return version('xcollection')
+    except PackageNotFoundError:  # pragma: no cover
+        return 'unknown'  # pragma: no cover
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(f'.{_LAZY_ATTRS[name]}', __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f'.{name}', __name__)
+    elif name == '__version__':
+        value = _version()
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    # cache the attribute so that __getattr__ is only called once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> typing.List[str]:
+    return sorted({*globals(), *_LAZY_ATTRS, *_SUBMODULES, '__version__'})
@@ -0,0 +1,301 @@
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import threading
+import types
+import typing
+import uuid
+
+import numpy as np
+import xarray as xr
+
+from .fingerprint import _json_default, dataset_fingerprint
+
+_SUFFIX = '.zarr'
+# the values whose token does not depend on the session
+_PLAIN_TYPES = (type(None), bool, int, float, complex, str, bytes, np.generic, np.ndarray)
+
+
+def _code_token(code: types.CodeType) -> typing.List[typing.Any]:
+    # nested functions are stored as code objects in the constants, whose repr is not stable
+    consts = [
+        _code_token(const) if isinstance(const, types.CodeType) else repr(const)
+        for const in code.co_consts
+    ]
+    return [code.co_code.hex(), consts, list(code.co_names)]
+
+
+def _global_names(code: types.CodeType) -> typing.Set[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def _is_constant(value: typing.Any) -> bool:
+    """Return whether a global variable is an immutable plain value, like a configuration constant."""
+    if isinstance(value, tuple):
+        return all(_is_constant(item) for item in value)
+    return isinstance(value, _PLAIN_TYPES) and not isinstance(value, np.ndarray)
+
+
+def _function_token(
+    func: typing.Callable, _seen: typing.FrozenSet[int] = frozenset()
+) -> typing.Any:
+    """Return a JSON-serializable description of a function that is stable across sessions.
+
+    The description contains the qualified name of the function, its bytecode and
+    constants, the values of its default arguments, of the variables it closes
+    over and of the constant global variables it reads, and its ``__version__``
+    attribute if it has one, so that editing the function, changing these values
+    or bumping its version invalidates the cached results.
+
+    Raises
+    ------
+    TypeError
+        If a default argument or a closure variable has no stable description.
+    """
+    if isinstance(func, functools.partial):
+        return [
+            'partial',
+            _function_token(func.func, _seen),
+            _value_token(func.args, _seen),
+            _value_token(func.keywords, _seen),
+        ]
+    version = getattr(func, '__version__', None)
+    name = f"{getattr(func, '__module__', None)}.{getattr(func, '__qualname__', repr(func))}"
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return [name, version]
+    if id(func) in _seen:
+        # a recursive function, whose closure refers to itself
+        return [name, 'recursive']
+    _seen = _seen | {id(func)}
+
+    cells = []
+    for cell in getattr(func, '__closure__', None) or ():
+        try:
+            contents = cell.cell_contents
+        except ValueError:  # pragma: no cover
+            # a cell whose variable is not assigned yet
+            contents = None
+        cells.append(_value_token(contents, _seen, strict=True))
+    defaults = [
+        _value_token(getattr(func, '__defaults__', None), _seen, strict=True),
+        _value_token(getattr(func, '__kwdefaults__', None), _seen, strict=True),
+    ]
+    # modules, functions and other objects are left out: see MapCache
+    namespace = getattr(func, '__globals__', {})
+    globals_ = {
+        name: _value_token(namespace[name], _seen)
+        for name in sorted(_global_names(code))
+        if name in namespace and _is_constant(namespace[name])
+    }
+    return [name, version, _code_token(code), cells, defaults, globals_]
+
+
+def _value_token(
+    value: typing.Any, _seen: typing.FrozenSet[int] = frozenset(), strict: bool = False
+) -> typing.Any:
+    """Return a JSON-serializable description of a value.
+
+    With ``strict=True``, a TypeError is raised for objects that would be described
+    by their repr, which may not identify them, e.g. when it contains their address.
+    """
+    if isinstance(value, xr.DataArray):
+        value = value.to_dataset(name=value.name if value.name is not None else '__values__')
+    if isinstance(value, xr.Dataset):
+        return ['dataset', dataset_fingerprint(value)]
+    if isinstance(value, (list, tuple)):
+        return [_value_token(item, _seen, strict) for item in value]
+    if isinstance(value, dict):
+        return {
+            str(key): _value_token(item, _seen, strict)
+            for key, item in sorted(value.items(), key=str)
+        }
+    if isinstance(value, types.ModuleType):
+        return ['module', value.__name__]
+    if callable(value):
+        return _function_token(value, _seen)
+    if strict and not isinstance(value, _PLAIN_TYPES):
+        raise TypeError(f'{type(value).__name__} object {value!r} has no stable description')
+    return json.loads(json.dumps(value, default=_json_default))
+
+
+class MapCache:
+    """An on-disk cache of the results of :py:meth:`xcollection.Collection.map`.
+
+    Each result is stored in its own Zarr store in `directory`, under a key derived
+    from the function, its arguments and the content fingerprint of the input
+    dataset (see :py:func:`~xcollection.fingerprint.dataset_fingerprint`). Results
+    for unchanged datasets are read back from the cache instead of being
+    recomputed, including in other sessions using the same directory.
+
+    The function is identified by its qualified name, its bytecode and constants,
+    the values of its default arguments and of the variables it closes over,
+    the values of the global variables it reads that are numbers, strings or
+    tuples of them, and its ``__version__`` attribute if it has one. Changes to
+    functions it calls or to other global objects are not detected:
+    set or bump ``func.__version__`` to invalidate the cached results in that
+    case. Functions closing over objects without a stable description, e.g.
+    instances of arbitrary classes, cannot be cached.
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path
+        The local directory the results are stored in. It is created if needed.
+    max_size : int, optional
+        The maximum total size of the cache, in bytes. When exceeded after
+        storing new results, the least recently used results are deleted. By
+        default, the size of the cache is not limited.
+
+    Examples
+    --------
+    >>> cache = xc.MapCache('/tmp/cache', max_size=10 * 2**30)
+    >>> c.map(climatology, cache=cache)
+    """
+
+    def __init__(self, directory: typing.Union[str, pathlib.Path], max_size: int = None):
+        if max_size is not None and max_size < 0:
+            raise ValueError(f'max_size must be a non-negative integer, got {max_size}')
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def entry_key(
+        self,
+        func: typing.Callable,
+        fingerprint: str,
+        args: typing.Sequence[typing.Any] = (),
+        kwargs: typing.Dict[str, typing.Any] = None,
+    ) -> str:
+        """Return the key of the result of ``func(dataset, *args, **kwargs)``.
+
+        Parameters
+        ----------
+        func : callable
+            The function applied to the dataset.
+        fingerprint : str
+            The fingerprint of the dataset.
+        args : tuple, optional
+            The positional arguments passed to `func` after the dataset.
+        kwargs : dict, optional
+            The keyword arguments passed to `func`.
+
+        Raises
+        ------
+        TypeError
+            If the default arguments or closure variables of `func` cannot be
+            described, so that its results cannot be told apart from those of
+            another function.
+        """
+        try:
+            function_token = _function_token(func)
+        except TypeError as err:
+            raise TypeError(f'Cannot cache the results of {func!r}: {err}') from err
+        token = [
+            function_token,
+            _value_token(list(args)),
+            _value_token(kwargs or {}),
+            fingerprint,
+        ]
+        data = json.dumps(token, sort_keys=True, default=_json_default).encode()
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.directory / f'{key}{_SUFFIX}'
+
+    def get(self, key: str) -> typing.Optional[xr.Dataset]:
+        """Return the result stored under ``key``, loaded in memory, or None if there is none."""
+        path = self._path(key)
+        if not path.exists():
+            with self._lock:
+                self.misses += 1
+            return None
+        with xr.open_dataset(path, engine='zarr', consolidated=True) as dataset:
+            result = dataset.load()
+        # the modification time of an entry is its last access time
+        os.utime(path)
+        for variable in result.variables.values():
+            variable.encoding = {}
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key: str, value: typing.Union[xr.Dataset, xr.DataArray]) -> None:
+        """Store a result under ``key``, replacing any existing result."""
+        if isinstance(value, xr.DataArray):
+            value = value.to_dataset()
+        value = value.copy(deep=False)
+        for variable in value.variables.values():
+            # the encoding of the input, e.g. its chunks, may not be valid for the result
+            variable.encoding = {}
+
+        # the result is written to a temporary store first so that readers never
+        # see a partially written entry
+        path = self._path(key)
+        tmp = self.directory / f'.{key}-{uuid.uuid4().hex}.tmp'
+        try:
+            value.to_zarr(tmp, mode='w', consolidated=True)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp, path)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _entries(self) -> typing.List[typing.Tuple[float, int, pathlib.Path]]:
+        entries = []
+        for path in self.directory.glob(f'*{_SUFFIX}'):
+            try:
+                size = sum(item.stat().st_size for item in path.rglob('*') if item.is_file())
+                entries.append((path.stat().st_mtime, size, path))
+            except FileNotFoundError:  # pragma: no cover
+                # removed concurrently
+                continue
+        return entries
+
+    @property
+    def size(self) -> int:
+        """The total size of the stored results, in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> typing.List[str]:
+        """Delete the least recently used results until the cache fits in `max_size`.
+
+        Returns
+        -------
+        list of str
+            The keys of the deleted results.
+        """
+        if self.max_size is None:
+            return []
+        entries = sorted(self._entries(), key=lambda entry: entry[0])
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            evicted.append(path.name[: -len(_SUFFIX)])
+        return evicted
+
+    def clear(self) -> None:
+        """Delete all the stored results."""
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._path(key).exists()
+
+    def __len__(self) -> int:
+        return len(list(self.directory.glob(f'*{_SUFFIX}')))
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} {str(self.directory)!r} ({len(self)} results)>'
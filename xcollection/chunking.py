@@ -0,0 +1,161 @@
+import typing
+
+import numpy as np
+import xarray as xr
+
+_ENCODING_KEYS = ('chunks', 'preferred_chunks')
+
+
+def _is_chunked(variable: xr.Variable) -> bool:
+    return variable.chunks is not None
+
+
+def _encoded_chunks(variable: xr.Variable) -> typing.Optional[typing.Tuple[int, ...]]:
+    """Return the Zarr chunks of a variable read from, or to be written to, a Zarr store."""
+    chunks = variable.encoding.get('chunks')
+    if chunks is not None and len(chunks) == variable.ndim:
+        return tuple(int(size) for size in chunks)
+    preferred = variable.encoding.get('preferred_chunks')
+    if preferred and set(preferred) == set(variable.dims):
+        return tuple(int(preferred[dim]) for dim in variable.dims)
+    return None
+
+
+def _current_chunks(variable: xr.Variable) -> typing.Tuple[int, ...]:
+    """Return the size of the largest chunk along each axis, or the full size if not chunked."""
+    if _is_chunked(variable):
+        return tuple(max(sizes) if sizes else 0 for sizes in variable.chunks)
+    return variable.shape
+
+
+def _chunk_nbytes(variable: xr.Variable, chunks: typing.Mapping[str, int]) -> int:
+    shape = [min(chunks.get(dim, size), size) for dim, size in zip(variable.dims, variable.shape)]
+    return int(np.prod(shape, dtype=int)) * variable.dtype.itemsize
+
+
+def _nchunks(variable: xr.Variable, chunks: typing.Mapping[str, int]) -> int:
+    counts = [
+        -(-size // max(chunks.get(dim, size), 1)) if size else 1
+        for dim, size in zip(variable.dims, variable.shape)
+    ]
+    return int(np.prod(counts, dtype=int))
+
+
+def _chunked_variables(dataset: xr.Dataset) -> typing.Dict[typing.Hashable, xr.Variable]:
+    # index coordinates are never chunked
+    return {
+        name: variable
+        for name, variable in dataset.variables.items()
+        if variable.ndim and not isinstance(variable, xr.IndexVariable)
+    }
+
+
+def plan_chunks(
+    dataset: xr.Dataset,
+    target: typing.Union[str, typing.Mapping[str, typing.Any]] = 'auto',
+    max_mem: typing.Union[int, str] = None,
+) -> typing.Dict[str, typing.Any]:
+    """Plan how to rechunk a dataset so that its chunks fit in a memory budget.
+
+    The chunk size along each dimension is chosen with
+    :py:func:`dask.array.core.normalize_chunks` for each variable and the smallest
+    size across variables is used, so that the dimension is chunked consistently.
+    Automatic chunk sizes are multiples of the Zarr chunks of the variables, read
+    from their encoding, or of their current chunks, so that each new chunk reads
+    and writes whole Zarr chunks.
+
+    Parameters
+    ----------
+    dataset : xarray.Dataset
+        The dataset to rechunk.
+    target : 'auto' or dict, optional
+        Either 'auto' to choose the chunk size along every dimension, or a mapping
+        of dimension names to chunk sizes, -1 for no chunking along the dimension,
+        or 'auto'. Dimensions missing from the mapping keep their current chunking.
+    max_mem : int or str, optional
+        The memory budget of a chunk, in bytes or as a string like '128MiB'.
+        Defaults to dask's ``array.chunk-size`` configuration value.
+
+    Returns
+    -------
+    dict
+        The plan, with the following entries:
+
+        - 'chunks': the new chunk size along each dimension.
+        - 'previous': the current largest chunk size along each dimension.
+        - 'chunk_nbytes': the size of the largest chunk of any variable, in bytes,
+          with the new chunks. This is the expected memory use per task.
+        - 'previous_chunk_nbytes': the same, with the current chunks.
+        - 'nchunks': the total number of chunks of the variables with the new chunks.
+    """
+    from dask.array.core import normalize_chunks
+    from dask.utils import parse_bytes
+
+    if target != 'auto' and not isinstance(target, typing.Mapping):
+        raise ValueError(f"Invalid target: {target!r}. Accepted targets are 'auto' or a dict")
+    if isinstance(max_mem, str):
+        max_mem = parse_bytes(max_mem)
+
+    variables = _chunked_variables(dataset)
+    chunks, previous = {}, {}
+    for variable in variables.values():
+        current = _current_chunks(variable)
+        requested = []
+        for dim, size in zip(variable.dims, current):
+            request = 'auto' if target == 'auto' else target.get(dim, size)
+            if request == 'auto' and variable.dtype.hasobject:
+                # the size of objects is unknown, so they are not chunked automatically
+                request = size
+            requested.append(request)
+        reference = _encoded_chunks(variable) or (current if _is_chunked(variable) else None)
+        normalized = normalize_chunks(
+            tuple(requested),
+            shape=variable.shape,
+            limit=max_mem,
+            dtype=variable.dtype,
+            previous_chunks=reference,
+        )
+        for dim, sizes, size in zip(variable.dims, normalized, current):
+            chunks[dim] = min(chunks.get(dim, max(sizes, default=0)), max(sizes, default=0))
+            previous[dim] = max(previous.get(dim, size), size)
+
+    current_chunks = {
+        name: dict(zip(var.dims, _current_chunks(var))) for name, var in variables.items()
+    }
+    return {
+        'chunks': chunks,
+        'previous': previous,
+        'chunk_nbytes': max(
+            (_chunk_nbytes(variable, chunks) for variable in variables.values()), default=0
+        ),
+        'previous_chunk_nbytes': max(
+            (_chunk_nbytes(var, current_chunks[name]) for name, var in variables.items()),
+            default=0,
+        ),
+        'nchunks': sum(_nchunks(variable, chunks) for variable in variables.values()),
+    }
+
+
+def _aligned(variable: xr.Variable, encoded: typing.Tuple[int, ...]) -> bool:
+    """Return whether every dask chunk of ``variable`` but the last is made of whole Zarr chunks."""
+    return all(
+        all(size % zarr_size == 0 for size in sizes[:-1])
+        for sizes, zarr_size in zip(variable.chunks, encoded)
+    )
+
+
+def apply_chunks(dataset: xr.Dataset, chunks: typing.Mapping[str, int]) -> xr.Dataset:
+    """Rechunk a dataset, keeping the Zarr chunks in the encoding only if they are still aligned.
+
+    Dask-backed variables are rechunked lazily and numpy-backed variables are
+    wrapped in dask arrays, without copying the data.
+    """
+    result = dataset.chunk(dict(chunks))
+    for variable in _chunked_variables(result).values():
+        encoded = variable.encoding.get('chunks')
+        if encoded is not None and not _aligned(variable, encoded):
+            # replace the encoding, which may be shared with the variable of `dataset`
+            variable.encoding = {
+                key: value for key, value in variable.encoding.items() if key not in _ENCODING_KEYS
+            }
+    return result
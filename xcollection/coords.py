@@ -0,0 +1,213 @@
+import hashlib
+import json
+import threading
+import typing
+
+import numpy as np
+import xarray as xr
+
+from .fingerprint import _hash_block, _is_dask_collection, _variable_blocks
+
+# the group, at the root of a store, that the shared coordinates are written to
+SHARED_GROUP = '__xcollection_shared_coords__'
+# the attribute of a group listing the shared coordinates it references
+SHARED_COORDS_KEY = 'xcollection_shared_coords'
+
+
+def _is_shareable(name: typing.Hashable, dataset: xr.Dataset) -> bool:
+    """Return whether the coordinate ``name`` of ``dataset`` can be shared.
+
+    Index coordinates are backed by the pandas indexes of each dataset and are
+    not shared. Only in-memory or lazily loaded numeric arrays are, since their
+    values can be written to Zarr as they are.
+    """
+    variable = dataset.variables[name]
+    if name in dataset.indexes or variable.ndim == 0:
+        return False
+    return variable.dtype.kind in 'biufc' and not _is_dask_collection(variable.data)
+
+
+def coord_fingerprint(variable: xr.Variable) -> str:
+    """Return a fingerprint of the dims, shape, dtype and values of a coordinate.
+
+    Unlike :py:func:`~xcollection.fingerprint.dataset_fingerprint`, the
+    attributes are not part of the fingerprint, since they are kept by each
+    member referencing a shared coordinate.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(json.dumps([variable.dims, variable.shape, str(variable.dtype)]).encode())
+    for block in _variable_blocks(variable):
+        hasher.update(_hash_block(block()).encode())
+    return hasher.hexdigest()
+
+
+def find_shared_coords(
+    datasets: typing.Mapping[str, xr.Dataset]
+) -> typing.Tuple[typing.Dict[str, xr.Variable], typing.Dict[str, typing.Dict[str, str]]]:
+    """Find the coordinates with identical values in several datasets.
+
+    Returns
+    -------
+    shared : dict
+        A variable with the values of each shared coordinate, keyed by fingerprint.
+    references : dict
+        For each key, the names of the coordinates of its dataset that are
+        shared, mapped to their fingerprint.
+    """
+    found = {}
+    for key, dataset in datasets.items():
+        for name in dataset.coords:
+            if _is_shareable(name, dataset):
+                fingerprint = coord_fingerprint(dataset.variables[name])
+                found.setdefault(fingerprint, []).append((key, name))
+
+    shared, references = {}, {}
+    for fingerprint, uses in found.items():
+        if len(uses) < 2:
+            continue
+        key, name = uses[0]
+        shared[fingerprint] = datasets[key].variables[name]
+        for key, name in uses:
+            references.setdefault(key, {})[str(name)] = fingerprint
+    return shared, references
+
+
+def _to_json(value):
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return repr(value)
+
+
+def _read_only(values: np.ndarray) -> np.ndarray:
+    values = np.array(values)
+    values.flags.writeable = False
+    return values
+
+
+def intern_coords(datasets: typing.Mapping[str, xr.Dataset]) -> typing.Dict[str, xr.Dataset]:
+    """Return the datasets with identical coordinates backed by a single read-only array.
+
+    See :py:meth:`xcollection.Collection.share_coords`.
+    """
+    shared, references = find_shared_coords(datasets)
+    buffers = {fingerprint: _read_only(var.values) for fingerprint, var in shared.items()}
+    result = {}
+    for key, dataset in datasets.items():
+        refs = references.get(key, {})
+        result[key] = dataset.assign_coords(
+            {
+                name: dataset.variables[name].copy(deep=False, data=buffers[fingerprint])
+                for name, fingerprint in refs.items()
+            }
+        )
+    return result
+
+
+def _drop_coords(dataset: xr.Dataset, names: typing.List[str]) -> xr.Dataset:
+    """Drop coordinates, including from the 'coordinates' encoding of the other variables."""
+    result = dataset.drop_vars(names)
+    for name, variable in result.variables.items():
+        listed = variable.encoding.get('coordinates')
+        if listed is None:
+            continue
+        kept = ' '.join(coord for coord in listed.split() if coord not in names)
+        # the variables are shared with `dataset`, so they are copied to change their encoding
+        variable = variable.copy(deep=False)
+        variable.encoding = {
+            key: value for key, value in variable.encoding.items() if key != 'coordinates'
+        }
+        if kept:
+            variable.encoding['coordinates'] = kept
+        result[name] = variable
+    return result
+
+
+def split_shared_coords(
+    datasets: typing.Mapping[str, xr.Dataset]
+) -> typing.Tuple[typing.Dict[str, xr.Variable], typing.Dict[str, xr.Dataset]]:
+    """Remove the shared coordinates from the datasets, to write them once.
+
+    The shared coordinates are replaced by a reference in the attributes of each
+    dataset, holding their fingerprint and attributes, that
+    :py:meth:`SharedCoordsReader.restore` uses to put them back.
+
+    Returns
+    -------
+    shared : dict
+        The shared coordinates, keyed by fingerprint.
+    datasets : dict
+        The datasets without the shared coordinates.
+    """
+    shared, references = find_shared_coords(datasets)
+    result = {}
+    for key, dataset in datasets.items():
+        refs = references.get(key)
+        if not refs:
+            result[key] = dataset
+            continue
+        stripped = _drop_coords(dataset, list(refs))
+        # attributes must be strings, numbers or arrays, so the references are stored as JSON
+        refs = {
+            name: {'fingerprint': fingerprint, 'attrs': dict(dataset.variables[name].attrs)}
+            for name, fingerprint in refs.items()
+        }
+        stripped.attrs = {**dataset.attrs, SHARED_COORDS_KEY: json.dumps(refs, default=_to_json)}
+        result[key] = stripped
+    return shared, result
+
+
+def write_shared_coords(store, shared: typing.Mapping[str, xr.Variable]) -> None:
+    """Write the shared coordinates to the :py:data:`SHARED_GROUP` group of a store."""
+    import zarr
+
+    if not shared:
+        return
+    group = zarr.open_group(store, mode='a').require_group(SHARED_GROUP)
+    for fingerprint, variable in shared.items():
+        if fingerprint in group:
+            # the fingerprint identifies the values, which are already stored
+            continue
+        array = group.array(fingerprint, variable.values)
+        array.attrs['_ARRAY_DIMENSIONS'] = list(variable.dims)
+
+
+class SharedCoordsReader:
+    """Read the shared coordinates of a store, loading each of them once.
+
+    The coordinates are loaded in read-only arrays that are shared by all the
+    datasets referencing them.
+
+    Parameters
+    ----------
+    root : zarr.hierarchy.Group
+        The root group of the store.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def _load(self, fingerprint: str) -> xr.Variable:
+        with self._lock:
+            if fingerprint not in self._loaded:
+                array = self.root[SHARED_GROUP][fingerprint]
+                self._loaded[fingerprint] = xr.Variable(
+                    array.attrs['_ARRAY_DIMENSIONS'], _read_only(array[...])
+                )
+            return self._loaded[fingerprint]
+
+    def restore(self, dataset: xr.Dataset) -> xr.Dataset:
+        """Put back the shared coordinates referenced in the attributes of a dataset."""
+        refs = dataset.attrs.get(SHARED_COORDS_KEY)
+        if refs is None:
+            return dataset
+        coords = {}
+        for name, ref in json.loads(refs).items():
+            variable = self._load(ref['fingerprint'])
+            coords[name] = xr.Variable(variable.dims, variable.data, attrs=ref['attrs'])
+        result = dataset.assign_coords(coords)
+        result.attrs = {
+            key: value for key, value in result.attrs.items() if key != SHARED_COORDS_KEY
+        }
+        return result
@@ -0,0 +1,198 @@
+import concurrent.futures
+import hashlib
+import json
+import pickle
+import typing
+
+import numpy as np
+import xarray as xr
+from xarray.core.utils import dict_equiv
+
+# Target size of the blocks that are hashed independently. The blocks are always
+# slices along the first dimension of a variable, so that the fingerprint does
+# not depend on the chunking of the data.
+_BLOCK_BYTES = 2**24
+
+
+def _digest(data) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _hash_block(block) -> str:
+    block = np.asarray(block)
+    if block.dtype.hasobject:
+        return _digest(pickle.dumps(block.tolist(), protocol=4))
+    return _digest(np.ascontiguousarray(block).reshape(-1).view(np.uint8))
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return _hash_block(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
+
+
+def _header(variable: xr.Variable) -> str:
+    return json.dumps(
+        [variable.dims, variable.shape, str(variable.dtype), variable.attrs],
+        default=_json_default,
+        sort_keys=True,
+    )
+
+
+def _is_dask_collection(obj) -> bool:
+    try:
+        from dask.base import is_dask_collection
+    except ImportError:  # pragma: no cover
+        return False
+    return is_dask_collection(obj)
+
+
+def _block_rows(variable: xr.Variable) -> int:
+    row_bytes = variable.dtype.itemsize * int(np.prod(variable.shape[1:], dtype=int))
+    return max(1, _BLOCK_BYTES // max(row_bytes, 1))
+
+
+def _variable_blocks(variable: xr.Variable):
+    """Split ``variable`` into the blocks that are hashed.
+
+    Returns a list of either :py:class:`dask.delayed.Delayed` objects or functions
+    returning numpy arrays, so that blocks of lazily loaded variables are only
+    read when they are hashed.
+    """
+    if variable.ndim == 0:
+        return [lambda: variable.values]
+    rows = _block_rows(variable)
+    if _is_dask_collection(variable.data):
+        chunks = {0: rows, **{axis: -1 for axis in range(1, variable.ndim)}}
+        return list(variable.data.rechunk(chunks).to_delayed().ravel())
+    dim = variable.dims[0]
+    return [
+        (lambda start=start: variable[{dim: slice(start, start + rows)}].values)
+        for start in range(0, max(variable.shape[0], 1), rows)
+    ]
+
+
+def _cache_token(dataset: xr.Dataset) -> typing.Hashable:
+    # Detects datasets whose variables or attributes have been replaced, e.g. to
+    # invalidate their cached html repr. In-place modifications of the data are
+    # not detected, so this must not be used to cache anything derived from values.
+    return (
+        tuple(
+            (name, id(variable._data), variable.dims, repr(variable.attrs))
+            for name, variable in dataset.variables.items()
+        ),
+        repr(dataset.attrs),
+        tuple(dataset.coords),
+    )
+
+
+def fingerprints(
+    datasets: typing.Mapping[typing.Hashable, xr.Dataset], *, max_workers: int = None
+) -> typing.Dict[typing.Hashable, str]:
+    """Compute a content fingerprint for each dataset of a mapping.
+
+    The fingerprint of a dataset is a hash of its attributes and the names, dims,
+    shapes, dtypes, attributes and values of its variables. The values are hashed
+    block by block: blocks of dask-backed variables are hashed in a single
+    :py:func:`dask.compute` call, and other blocks are hashed concurrently with a
+    thread pool. The fingerprint does not depend on how the data is chunked.
+
+    A dataset appearing several times in the mapping is hashed once. Fingerprints
+    are not cached across calls: values modified in place, e.g. with
+    ``dataset['air'][0, 0, 0] = 0``, leave no trace on the dataset object, so a
+    cached fingerprint could silently describe older values.
+
+    Parameters
+    ----------
+    datasets : dict
+        The datasets to fingerprint.
+    max_workers : int, optional
+        The maximum number of threads used to hash blocks that are not dask-backed.
+
+    Returns
+    -------
+    dict
+        The fingerprint of each dataset, as a hexadecimal string.
+    """
+    # datasets are fingerprinted once per object, even if they appear under several keys
+    result = {}
+    pending = {id(dataset): dataset for dataset in datasets.values()}
+
+    blocks = {
+        (dataset_id, name): _variable_blocks(variable)
+        for dataset_id, dataset in pending.items()
+        for name, variable in dataset.variables.items()
+    }
+    digests = {
+        task_key: [None] * len(variable_blocks) for task_key, variable_blocks in blocks.items()
+    }
+    delayed = [
+        (task_key, index, block)
+        for task_key, variable_blocks in blocks.items()
+        for index, block in enumerate(variable_blocks)
+        if _is_dask_collection(block)
+    ]
+    if delayed:
+        import dask
+
+        computed = dask.compute(*[dask.delayed(_hash_block)(block) for _, _, block in delayed])
+        for (task_key, index, _), digest in zip(delayed, computed):
+            digests[task_key][index] = digest
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            (task_key, index, pool.submit(lambda block=block: _hash_block(block())))
+            for task_key, variable_blocks in blocks.items()
+            for index, block in enumerate(variable_blocks)
+            if not _is_dask_collection(block)
+        ]
+        for task_key, index, future in futures:
+            digests[task_key][index] = future.result()
+
+    for dataset_id, dataset in pending.items():
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(json.dumps(dataset.attrs, default=_json_default, sort_keys=True).encode())
+        for name in sorted(dataset.variables, key=str):
+            is_coord = name in dataset.coords
+            hasher.update(
+                json.dumps([str(name), is_coord, _header(dataset.variables[name])]).encode()
+            )
+            hasher.update(''.join(digests[(dataset_id, name)]).encode())
+        result[dataset_id] = hasher.hexdigest()
+
+    return {key: result[id(dataset)] for key, dataset in datasets.items()}
+
+
+def dataset_fingerprint(dataset: xr.Dataset) -> str:
+    """Compute a content fingerprint of a dataset. See :py:func:`fingerprints`."""
+    return fingerprints({None: dataset})[None]
+
+
+def structure_equal(a: xr.Dataset, b: xr.Dataset, *, check_dtypes: bool = False) -> bool:
+    """Return whether two datasets have the same structure and attributes, without comparing values.
+
+    The dimensions and their sizes, the names of the variables and coordinates,
+    the dims of each variable and the attributes of the datasets and variables are
+    compared. These are all necessary conditions for the datasets to be identical.
+
+    Parameters
+    ----------
+    a, b : xarray.Dataset
+        The datasets to compare.
+    check_dtypes : bool, optional
+        If True, the dtypes of the variables are compared as well.
+    """
+    if dict(a.dims) != dict(b.dims):
+        return False
+    if set(a.variables) != set(b.variables) or set(a.coords) != set(b.coords):
+        return False
+    for name, variable in a.variables.items():
+        other = b.variables[name]
+        if variable.dims != other.dims:
+            return False
+        if check_dtypes and variable.dtype != other.dtype:
+            return False
+        if not dict_equiv(variable.attrs, other.attrs):
+            return False
+    return dict_equiv(a.attrs, b.attrs)
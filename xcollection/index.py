@@ -0,0 +1,240 @@
+import typing
+from collections.abc import Mapping
+
+import pandas as pd
+import xarray as xr
+
+from .storage import dataset_record
+
+
+class VariableIndex(Mapping):
+    """An inverted index mapping variable names to the keys of the datasets containing them.
+
+    Indexing the mapping with a variable name returns the keys of the datasets
+    that contain a variable with that name, in the order they were added.
+
+    Examples
+    --------
+    >>> index = VariableIndex()
+    >>> index.add('foo', ['Tair', 'xc', 'yc'])
+    >>> index.add('bar', ['air', 'lat', 'lon'])
+    >>> index['Tair']
+    ('foo',)
+    >>> index.lookup(['Tair', 'air'], mode='any')
+    {'foo', 'bar'}
+    """
+
+    _VALID_MODES = ['all', 'any']
+
+    def __init__(self):
+        self._keys_by_name: typing.Dict[str, typing.Dict[str, None]] = {}
+        self._names_by_key: typing.Dict[str, typing.Tuple[str, ...]] = {}
+
+    @staticmethod
+    def describe(dataset: xr.Dataset) -> typing.Tuple[str, ...]:
+        """Return the entry of ``dataset`` in the index, i.e. its variable names."""
+        return tuple(dataset.variables)
+
+    def add(self, key: str, names: typing.Iterable[str]) -> None:
+        """Add or replace the variable names of the dataset ``key``."""
+        if key in self._names_by_key:
+            self.remove(key)
+        names = tuple(names)
+        self._names_by_key[key] = names
+        for name in names:
+            self._keys_by_name.setdefault(name, {})[key] = None
+
+    def remove(self, key: str) -> None:
+        """Remove the dataset ``key`` from the index."""
+        for name in self._names_by_key.pop(key, ()):
+            keys = self._keys_by_name[name]
+            del keys[key]
+            if not keys:
+                del self._keys_by_name[name]
+
+    def lookup(self, names: typing.Iterable[str], *, mode: str = 'all') -> typing.Set[str]:
+        """Return the keys of the datasets containing all or any of the given variables.
+
+        Parameters
+        ----------
+        names : iterable of str
+            The variable names to look up.
+        mode : str, optional
+            Must be one of 'all' or 'any'. Defaults to 'all'.
+        """
+        if mode not in self._VALID_MODES:
+            raise ValueError(f'Invalid mode: {mode}. Accepted modes are {self._VALID_MODES}')
+
+        matches = [self._keys_by_name.get(name, {}).keys() for name in names]
+        if not matches:
+            return set(self._names_by_key) if mode == 'all' else set()
+        if mode == 'all':
+            return set.intersection(*map(set, matches))
+        return set().union(*matches)
+
+    def __getitem__(self, name: str) -> typing.Tuple[str, ...]:
+        return tuple(self._keys_by_name[name])
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._keys_by_name)
+
+    def __len__(self) -> int:
+        return len(self._keys_by_name)
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} ({len(self)} variables, {len(self._names_by_key)} keys)>'
+
+
+def _matches(value: typing.Any, condition: typing.Any) -> bool:
+    if callable(condition):
+        return bool(condition(value))
+    try:
+        return bool(value == condition)
+    except ValueError:
+        # array-like attribute values
+        return bool((value == condition).all())
+
+
+class MetadataTable(Mapping):
+    """A table of the structural metadata of the datasets in a collection.
+
+    Indexing the table with a key returns the record of the dataset (see
+    :py:func:`~xcollection.storage.dataset_record`). The records are also exposed as columnar
+    :py:class:`pandas.DataFrame` objects with one row per key, which are used to
+    answer queries without touching the datasets.
+    """
+
+    def __init__(self):
+        self._records: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        self._frames: typing.Dict[str, pd.DataFrame] = {}
+
+    @staticmethod
+    def describe(dataset: xr.Dataset) -> typing.Dict[str, typing.Any]:
+        """Return the entry of ``dataset`` in the table, i.e. its record."""
+        return dataset_record(dataset)
+
+    def add(self, key: str, record: typing.Dict[str, typing.Any]) -> None:
+        """Add or replace the record of the dataset ``key``."""
+        self._records[key] = record
+        self._frames.clear()
+
+    def remove(self, key: str) -> None:
+        """Remove the dataset ``key`` from the table."""
+        self._records.pop(key, None)
+        self._frames.clear()
+
+    def _frame(
+        self, name: str, row: typing.Callable[[dict], dict], fill_value: typing.Any = None
+    ) -> pd.DataFrame:
+        # the frames are built from the records on first use after a change
+        if name not in self._frames:
+            frame = pd.DataFrame(
+                [row(record) for record in self._records.values()],
+                index=pd.Index(list(self._records), dtype=object),
+            )
+            if fill_value is not None:
+                frame = frame.fillna(fill_value).astype(type(fill_value))
+            self._frames[name] = frame
+        return self._frames[name]
+
+    @property
+    def sizes(self) -> pd.DataFrame:
+        """The size of each dimension, with one column per dimension name.
+
+        The size is missing for datasets without the dimension.
+        """
+        return self._frame('sizes', lambda record: record['dims'])
+
+    @property
+    def coords(self) -> pd.DataFrame:
+        """Whether each dataset has a coordinate, with one boolean column per coordinate name."""
+        return self._frame('coords', lambda record: dict.fromkeys(record['coords'], True), False)
+
+    @property
+    def data_vars(self) -> pd.DataFrame:
+        """Whether each dataset has a data variable, with one boolean column per variable name."""
+        return self._frame(
+            'data_vars', lambda record: dict.fromkeys(record['data_vars'], True), False
+        )
+
+    @property
+    def dtypes(self) -> pd.DataFrame:
+        """The dtype of each data variable and coordinate, with one column per variable name."""
+        return self._frame(
+            'dtypes',
+            lambda record: {
+                name: variable['dtype']
+                for name, variable in {**record['coords'], **record['data_vars']}.items()
+            },
+        )
+
+    @property
+    def attrs(self) -> pd.DataFrame:
+        """The attributes of each dataset, with one column per attribute name."""
+        return self._frame('attrs', lambda record: record['attrs'])
+
+    def query(
+        self,
+        *,
+        dims: typing.Union[str, typing.Iterable[str], typing.Mapping[str, typing.Any]] = None,
+        coords: typing.Union[str, typing.Iterable[str]] = None,
+        data_vars: typing.Union[str, typing.Iterable[str]] = None,
+        attrs: typing.Mapping[str, typing.Any] = None,
+    ) -> typing.List[str]:
+        """Return the keys of the datasets matching all the given conditions.
+
+        See :py:meth:`xcollection.Collection.query` for a description of the conditions.
+        """
+        mask = pd.Series(True, index=pd.Index(list(self._records), dtype=object), dtype=bool)
+
+        if dims is not None:
+            if isinstance(dims, str):
+                dims = [dims]
+            conditions = dims if isinstance(dims, Mapping) else dict.fromkeys(dims)
+            sizes = self.sizes
+            for dim, condition in conditions.items():
+                if dim not in sizes:
+                    return []
+                column = sizes[dim]
+                matched = column.notna()
+                if callable(condition):
+                    matched &= condition(column).astype(bool)
+                elif condition is not None:
+                    matched &= column == condition
+                mask &= matched
+
+        for names, table in ((coords, 'coords'), (data_vars, 'data_vars')):
+            if names is None:
+                continue
+            frame = getattr(self, table)
+            for name in [names] if isinstance(names, str) else names:
+                if name not in frame:
+                    return []
+                mask &= frame[name]
+
+        if attrs is not None:
+            mask &= pd.Series(
+                [
+                    all(
+                        name in record['attrs'] and _matches(record['attrs'][name], condition)
+                        for name, condition in attrs.items()
+                    )
+                    for record in self._records.values()
+                ],
+                index=mask.index,
+                dtype=bool,
+            )
+
+        return list(mask.index[mask.values])
+
+    def __getitem__(self, key: str) -> typing.Dict[str, typing.Any]:
+        return self._records[key]
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} ({len(self)} keys)>'
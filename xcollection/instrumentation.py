@@ -0,0 +1,281 @@
+import contextlib
+import dataclasses
+import functools
+import json
+import os
+import threading
+import time
+import typing
+
+_CALLBACKS: typing.List[typing.Callable[['Record'], None]] = []
+_LOCAL = threading.local()
+
+
+@dataclasses.dataclass
+class Record:
+    """The measurements of an operation on a collection, or of the part of it handling one key.
+
+    Parameters
+    ----------
+    op : str
+        The name of the operation, e.g. 'map' or 'to_zarr'.
+    key : str or None
+        The key the record is about, or None for the whole operation.
+    start : float
+        The start time, in seconds since the epoch.
+    duration : float
+        The wall time, in seconds.
+    bytes_read, bytes_written : int
+        The number of bytes read from and written to Zarr stores.
+    datasets : int
+        The number of datasets touched.
+    validation_time : float
+        The time spent validating the datasets of the resulting collection, in seconds.
+    thread : int
+        The identifier of the thread that ran the operation.
+    """
+
+    op: str
+    key: typing.Optional[str] = None
+    start: float = 0.0
+    duration: float = 0.0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    datasets: int = 0
+    validation_time: float = 0.0
+    thread: int = 0
+
+
+def register_callback(callback: typing.Callable[[Record], None]) -> None:
+    """Register a function called with each :py:class:`Record` as soon as it is complete.
+
+    Instrumentation is enabled while at least one callback is registered. Callbacks
+    may be called from worker threads.
+    """
+    _CALLBACKS.append(callback)
+
+
+def unregister_callback(callback: typing.Callable[[Record], None]) -> None:
+    """Unregister a function registered with :py:func:`register_callback`."""
+    _CALLBACKS.remove(callback)
+
+
+def enabled() -> bool:
+    """Return whether instrumentation is enabled."""
+    return bool(_CALLBACKS)
+
+
+def _stack() -> typing.List[Record]:
+    if not hasattr(_LOCAL, 'stack'):
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+
+@contextlib.contextmanager
+def span(op: str, key: str = None, parent: Record = None, datasets: int = 0):
+    """Measure the code run in the context as an operation, or as the part of one handling ``key``.
+
+    Yields the :py:class:`Record` being measured, or None if instrumentation is
+    disabled. Byte counts and validation time are added to the record while it
+    is measured, and to its ``parent`` record if one is given.
+    """
+    if not _CALLBACKS:
+        yield None
+        return
+    record = Record(
+        op=op, key=key, start=time.time(), datasets=datasets, thread=threading.get_ident()
+    )
+    stack = _stack()
+    stack.append(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.duration = time.perf_counter() - started
+        stack.pop()
+        if parent is not None:
+            parent.bytes_read += record.bytes_read
+            parent.bytes_written += record.bytes_written
+        for callback in list(_CALLBACKS):
+            callback(record)
+
+
+@contextlib.contextmanager
+def validation():
+    """Add the time spent in the context to the validation time of the current record."""
+    stack = _stack() if _CALLBACKS else []
+    if not stack:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stack[-1].validation_time += time.perf_counter() - started
+
+
+def traced(func: typing.Callable, parent: typing.Optional[Record]) -> typing.Callable:
+    """Wrap ``func(key, ...)`` so that each call is recorded as the part of ``parent`` handling ``key``.
+
+    Returns ``func`` itself if ``parent`` is None, i.e. if instrumentation is disabled.
+    """
+    if parent is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(key, *args, **kwargs):
+        with span(parent.op, key=key, parent=parent, datasets=1):
+            return func(key, *args, **kwargs)
+
+    return wrapper
+
+
+def _nbytes(value) -> int:
+    try:
+        return memoryview(value).nbytes
+    except TypeError:
+        return 0
+
+
+@functools.lru_cache(maxsize=None)
+def _counting_store_class():
+    import zarr
+
+    class CountingStore(zarr.storage.KVStore):
+        """A Zarr store adding the bytes read and written to the record being measured."""
+
+        def __init__(self, store, record: Record):
+            super().__init__(store)
+            self.record = record
+
+        def _current(self) -> Record:
+            # reads and writes run by worker threads without records, e.g. dask
+            # threads, are added to the record the store was created for
+            stack = _stack()
+            return stack[-1] if stack else self.record
+
+        def __getitem__(self, key):
+            value = super().__getitem__(key)
+            self._current().bytes_read += _nbytes(value)
+            return value
+
+        def __setitem__(self, key, value):
+            super().__setitem__(key, value)
+            self._current().bytes_written += _nbytes(value)
+
+        def listdir(self, path=''):
+            return zarr.storage.listdir(self._mutable_mapping, path)
+
+        def rmdir(self, path=''):
+            zarr.storage.rmdir(self._mutable_mapping, path)
+
+        def getsize(self, path=''):
+            return zarr.storage.getsize(self._mutable_mapping, path)
+
+    return CountingStore
+
+
+def counting_store(store, record: typing.Optional[Record]):
+    """Wrap a Zarr store so that the bytes read from and written to it are recorded.
+
+    The bytes are added to the record being measured in the current thread, or
+    to ``record`` if there is none. Returns ``store`` itself if ``record`` is None,
+    i.e. if instrumentation is disabled.
+    """
+    if record is None:
+        return store
+    return _counting_store_class()(store, record)
+
+
+class Profile:
+    """The records of the operations run while instrumentation was enabled by :py:func:`instrument`."""
+
+    def __init__(self):
+        self.records: typing.List[Record] = []
+        self._lock = threading.Lock()
+
+    def _append(self, record: Record) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def to_frame(self) -> 'pandas.DataFrame':  # noqa: F821
+        """Return the records as a table, with one row per record, in the order they started."""
+        import pandas as pd
+
+        columns = [field.name for field in dataclasses.fields(Record)]
+        frame = pd.DataFrame(
+            [dataclasses.asdict(record) for record in self.records], columns=columns
+        )
+        return frame.sort_values('start', kind='stable').reset_index(drop=True)
+
+    def to_chrome_trace(self) -> typing.Dict[str, typing.Any]:
+        """Return the records in the Chrome trace event format.
+
+        The result can be written to a JSON file with :py:meth:`save_chrome_trace`
+        and loaded in ``chrome://tracing`` or https://ui.perfetto.dev.
+        """
+        pid = os.getpid()
+        events = [
+            {
+                'name': record.op if record.key is None else f'{record.op}: {record.key}',
+                'cat': record.op,
+                'ph': 'X',
+                'ts': record.start * 1e6,
+                'dur': record.duration * 1e6,
+                'pid': pid,
+                'tid': record.thread,
+                'args': {
+                    'key': record.key,
+                    'bytes_read': record.bytes_read,
+                    'bytes_written': record.bytes_written,
+                    'datasets': record.datasets,
+                    'validation_time': record.validation_time,
+                },
+            }
+            for record in self.records
+        ]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, path: typing.Union[str, os.PathLike]) -> None:
+        """Write the records to a JSON file in the Chrome trace event format."""
+        with open(path, 'w') as file:
+            json.dump(self.to_chrome_trace(), file)
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} ({len(self.records)} records)>'
+
+
+@contextlib.contextmanager
+def instrument():
+    """Record the operations on collections run in the context.
+
+    The operations instrumented are :py:meth:`~xcollection.Collection.map`,
+    :py:meth:`~xcollection.Collection.choose`, :py:meth:`~xcollection.Collection.filter`,
+    :py:meth:`~xcollection.Collection.to_zarr`, :py:func:`~xcollection.open_collection`
+    and weighted reductions. Each operation produces a record for the whole
+    operation and one record per key, with its wall time, the bytes read from
+    and written to Zarr stores, the number of datasets touched and the time
+    spent validating the result.
+
+    Functions applied with the 'processes' or 'shared_memory' executors of
+    :py:meth:`~xcollection.Collection.map` are only recorded as a whole.
+
+    Yields
+    ------
+    Profile
+        The records, available as they complete.
+
+    Examples
+    --------
+    >>> import xcollection as xc
+    >>> with xc.instrument() as profile:
+    ...     c.map(func).to_zarr('/tmp/foo.zarr')
+    >>> profile.to_frame()
+    >>> profile.save_chrome_trace('/tmp/trace.json')
+    """
+    profile = Profile()
+    register_callback(profile._append)
+    try:
+        yield profile
+    finally:
+        unregister_callback(profile._append)
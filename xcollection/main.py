@@ -1,14 +1,37 @@
+import collections
+import concurrent.futures
 import functools
 import typing
 from collections.abc import MutableMapping
 from html import escape
-from typing import Hashable, Iterable, Optional, Union
+from typing import TYPE_CHECKING, Hashable, Iterable, Optional, Union
 
+import numpy as np
+import pandas as pd
 import pydantic
 import toolz
 import xarray as xr
 from xarray.core.weighted import Weighted
 
+from . import instrumentation
+from .coords import intern_coords, split_shared_coords, write_shared_coords
+from .fingerprint import _cache_token, dataset_fingerprint, fingerprints, structure_equal
+from .index import MetadataTable, VariableIndex
+from .options import OPTIONS
+from .parallel import map_values, map_values_async
+from .reductions import MemberAccumulator
+from .storage import (
+    MANIFEST_KEY,
+    LazyDatasets,
+    StoreReader,
+    dataset_manifest,
+    write_collection_metadata,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .cache import MapCache
+    from .plan import LazyCollection
+
 unicode_key = u'\U0001F511'
 
 
@@ -24,6 +47,15 @@ def _rpartial(func, *args, **kwargs):
     return lambda *a, **kw: func(*(a + args), **dict(kwargs, **kw))
 
 
+def _validate_shallow(datasets):
+    result = {}
+    for key, value in datasets.items():
+        if not isinstance(key, str):
+            raise TypeError(f'Expected keys to be str, got {type(key)}')
+        result[key] = _validate_input(value)
+    return result
+
+
 def _validate_input(value):
     if not isinstance(
         value,
@@ -35,11 +67,171 @@ def _validate_input(value):
         ),
     ):
         raise TypeError(f'Expected an xarray.Dataset or xarray.DataArray, got {type(value)}')
+    return _as_dataset(value)
+
+
+def _as_dataset(value):
+    # data arrays are converted even when the validation is off, since every
+    # operation of a collection expects datasets
     if isinstance(value, xr.DataArray):
         return value.to_dataset()
     return value
 
 
+def _load_lazy_variables(dataset: xr.Dataset) -> xr.Dataset:
+    # returns a shallow copy in which the variables lazily read from disk without
+    # dask, e.g. those of a collection opened from a zarr store, are loaded
+    dataset = dataset.copy(deep=False)
+    for variable in dataset.variables.values():
+        if variable.chunks is None:
+            variable.load()
+    return dataset
+
+
+def _stream(
+    keys: typing.Iterable[str],
+    open_dataset: typing.Callable[[str], typing.Tuple[xr.Dataset, bool]],
+    func: typing.Callable[[xr.Dataset], typing.Any],
+    prefetch: int,
+) -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+    """Yield ``(key, func(dataset))`` pairs, opening the next ``prefetch`` datasets in the background.
+
+    ``open_dataset`` returns the dataset and whether it must be closed once its
+    result has been yielded.
+    """
+    if not isinstance(prefetch, int) or prefetch < 0:
+        raise ValueError(f'prefetch must be a non-negative integer, got {prefetch}')
+    return _stream_results(iter(keys), open_dataset, func, prefetch)
+
+
+def _stream_results(keys, open_dataset, func, prefetch):
+    if not prefetch:
+        for key in keys:
+            dataset, close = open_dataset(key)
+            try:
+                result = func(dataset)
+                yield key, result
+            finally:
+                if close:
+                    dataset.close()
+        return
+
+    pending = collections.deque()
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=prefetch)
+
+    def _submit_next():
+        key = next(keys, None)
+        if key is not None:
+            pending.append((key, pool.submit(open_dataset, key)))
+
+    try:
+        for _ in range(prefetch):
+            _submit_next()
+        while pending:
+            key, future = pending.popleft()
+            dataset, close = future.result()
+            # keep `prefetch` datasets opening while the current one is processed
+            _submit_next()
+            try:
+                result = func(dataset)
+                yield key, result
+            finally:
+                if close:
+                    dataset.close()
+    finally:
+        # the iteration stopped early: close the datasets opened in advance
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+        for _, future in pending:
+            if not future.cancelled() and future.exception() is None:
+                dataset, close = future.result()
+                if close:
+                    dataset.close()
+
+
+def _apply(func, datasets, *, executor, max_workers, args, kwargs, record):
+    """Apply ``func`` to each dataset, recording each key as part of ``record`` if it is set."""
+    if record is None or executor in {'processes', 'shared_memory'}:
+        # the per-key records of worker processes would not reach the callbacks
+        if executor is not None:
+            return map_values(
+                func,
+                datasets,
+                executor=executor,
+                max_workers=max_workers,
+                args=args,
+                kwargs=kwargs,
+            )
+        return toolz.valmap(_rpartial(func, *args, **kwargs), datasets)
+
+    apply = instrumentation.traced(lambda key: func(datasets[key], *args, **kwargs), record)
+    keys = dict(zip(datasets, datasets))
+    if executor is not None:
+        return map_values(apply, keys, executor=executor, max_workers=max_workers)
+    return toolz.valmap(apply, keys)
+
+
+def _is_update(mode: typing.Optional[str], kwargs: typing.Dict[str, typing.Any]) -> bool:
+    """Return whether a write updates existing groups, so that a dataset may only hold
+    part of its group, e.g. when appending or writing a region."""
+    if mode in {'a', 'r+'}:
+        return True
+    return kwargs.get('append_dim') is not None or kwargs.get('region') is not None
+
+
+def _grew_along(dataset: xr.Dataset, entry: typing.Dict[str, typing.Any], append_dim: str) -> bool:
+    """Return whether ``dataset`` has the structure of a manifest entry, with more elements
+    along ``append_dim``."""
+    manifest = dataset_manifest(dataset)
+    sizes, stored_sizes = dict(manifest['dims']), dict(entry['dims'])
+    if append_dim not in sizes or append_dim not in stored_sizes:
+        return False
+    if sizes.pop(append_dim) <= stored_sizes.pop(append_dim) or sizes != stored_sizes:
+        return False
+    for name in ('data_vars', 'coords'):
+        variables, stored = manifest[name], entry[name]
+        if variables.keys() != stored.keys():
+            return False
+        for var_name, variable in variables.items():
+            if variable['dims'] != stored[var_name]['dims']:
+                return False
+            if variable['dtype'] != stored[var_name]['dtype']:
+                return False
+    return True
+
+
+_SUMMARY_COLUMNS = ['dims', 'data_vars', 'nbytes']
+
+
+def _record_dims(record: typing.Dict[str, typing.Any]) -> typing.List[str]:
+    """Return the dims of a dataset record, in the order they appear in its variables.
+
+    The dims of records read from a store manifest are sorted by name otherwise.
+    """
+    dims = {}
+    for variable in [*record['data_vars'].values(), *record['coords'].values()]:
+        dims.update(dict.fromkeys(variable['dims']))
+    dims.update(dict.fromkeys(record['dims']))
+    return list(dims)
+
+
+def _record_nbytes(record: typing.Dict[str, typing.Any]) -> int:
+    """Return the total size of the variables of a dataset record, in bytes."""
+    return sum(
+        int(np.prod(variable['shape'], dtype=int)) * np.dtype(variable['dtype']).itemsize
+        for variable in {**record['coords'], **record['data_vars']}.values()
+    )
+
+
+def _format_bytes(nbytes: int) -> str:
+    for unit in ['B', 'kB', 'MB', 'GB', 'TB']:
+        if nbytes < 1000 or unit == 'TB':
+            break
+        nbytes /= 1000
+    return f'{nbytes:.0f} {unit}' if unit == 'B' else f'{nbytes:.1f} {unit}'
+
+
 class Config:
     validate_assignment = True
     arbitrary_types_allowed = True
@@ -52,7 +244,9 @@ class Collection(MutableMapping):
     Parameters
     ----------
     datasets : dict, optional
-        A dictionary of datasets to initialize the collection with.
+        A dictionary of datasets to initialize the collection with. How it is
+        validated is controlled by the ``validation`` option (see
+        :py:func:`~xcollection.set_options`).
 
     Examples
     --------
@@ -86,6 +280,19 @@ class Collection(MutableMapping):
 
     datasets: typing.Dict[pydantic.StrictStr, typing.Union[xr.Dataset, xr.DataArray]] = None
 
+    def __init__(
+        self, datasets: typing.Dict[str, typing.Union[xr.Dataset, xr.DataArray]] = None
+    ) -> None:
+        validation = OPTIONS['validation']
+        if validation != 'full' and datasets is not None:
+            if validation == 'shallow':
+                datasets = _validate_shallow(datasets)
+            else:
+                datasets = {key: _as_dataset(value) for key, value in datasets.items()}
+            # pydantic skips the validation of collections that are already initialised
+            object.__setattr__(self, '__pydantic_initialised__', True)
+        object.__setattr__(self, 'datasets', datasets)
+
     @pydantic.validator('datasets', pre=True, each_item=True)
     def _validate_datasets(cls, value):
         return _validate_input(value)
@@ -93,9 +300,25 @@ class Collection(MutableMapping):
     def __post_init_post_parse__(self):
         if self.datasets is None:
             self.datasets = {}
+        self._indexes = {}
+        self._indexed_datasets = None
+        self._index_tokens = {}
+        self._html_fragments = {}
+
+    @classmethod
+    def _construct(cls, datasets: typing.MutableMapping[str, xr.Dataset]) -> 'Collection':
+        """Create a collection from a trusted mapping of datasets without validating it.
+
+        This is used for collections derived from already validated datasets, e.g. by
+        selecting a subset of the keys of a collection.
+        """
+        collection = cls()
+        object.__setattr__(collection, 'datasets', datasets)
+        return collection
 
     def __delitem__(self, key: str) -> None:
         del self.datasets[key]
+        self._update_indexes(key)
 
     def __getitem__(self, key: str) -> xr.Dataset:
         try:
@@ -111,36 +334,134 @@ class Collection(MutableMapping):
 
     def __setitem__(self, key: str, value: xr.Dataset) -> None:
         self.datasets[key] = _validate_input(value)
+        self._update_indexes(key)
 
     def __contains__(self, key: str) -> bool:
         return key in self.datasets
 
     def __eq__(self, other: object) -> bool:
+        return self.equals(other)
+
+    def equals(self, other: object, *, method: str = 'full') -> bool:
+        """Return whether two collections contain the same keys and identical datasets.
+
+        The comparison is tiered and stops at the first difference: the keys are
+        compared first, then the dimensions, variable names, coordinates and
+        attributes of each pair of datasets, and finally their values.
+
+        Parameters
+        ----------
+        other : Collection
+            The collection to compare with.
+        method : str, optional
+            How the values are compared. Must be one of:
+
+            - 'full': compare the values element-wise with
+              :py:func:`xarray.testing.assert_identical`.
+            - 'hash': compare content fingerprints of the datasets (see
+              :py:func:`xcollection.fingerprint.fingerprints`), computed in parallel,
+              instead of the values. Datasets shared by both collections are
+              only hashed once.
+            - 'metadata': only compare the keys, structure, dtypes and attributes
+              without looking at the values.
+
+            Defaults to 'full'.
+
+        Returns
+        -------
+        bool
+
+        Examples
+        --------
+        >>> c.equals(c.map(lambda ds: ds.copy()), method='hash')
+        True
+        >>> c.equals(c.map(lambda ds: ds + 1), method='metadata')
+        True
+        """
+        _VALID_METHODS = ['full', 'hash', 'metadata']
+        if method not in _VALID_METHODS:
+            raise ValueError(f'Invalid method: {method}. Accepted methods are {_VALID_METHODS}')
+
         if not isinstance(other, Collection):
             return False
         if set(self.keys()) != set(other.keys()):
             return False
-        for key in sorted(self.keys()):
+
+        keys = sorted(self.keys())
+        for key in keys:
+            if not structure_equal(self[key], other[key], check_dtypes=method != 'full'):
+                return False
+
+        if method == 'metadata':
+            return True
+        if method == 'hash':
+            # a single call, so that datasets shared by both collections are hashed once
+            digests = fingerprints(
+                {**{(0, key): self[key] for key in keys}, **{(1, key): other[key] for key in keys}}
+            )
+            return all(digests[(0, key)] == digests[(1, key)] for key in keys)
+
+        for key in keys:
             try:
                 xr.testing.assert_identical(self[key], other[key])
             except AssertionError:
                 return False
         return True
 
-    def __repr__(self) -> str:
+    def _summary(self) -> pd.DataFrame:
+        """Return a table with the dimensions, data variables and size of each dataset.
+
+        The table is built from :py:attr:`metadata`, so datasets of collections
+        opened lazily are not opened.
+        """
+        rows = [
+            {
+                'dims': ', '.join(f"{dim}: {record['dims'][dim]}" for dim in _record_dims(record)),
+                'data_vars': ', '.join(record['data_vars']),
+                'nbytes': _format_bytes(_record_nbytes(record)),
+            }
+            for record in self.metadata.values()
+        ]
+        return pd.DataFrame(
+            rows, index=pd.Index(list(self.metadata), name='key'), columns=_SUMMARY_COLUMNS
+        )
 
+    def _display_summary(self) -> bool:
+        return len(self) > OPTIONS['display_max_keys']
+
+    def __repr__(self) -> str:
+        header = f'<{type(self).__name__} ({len(self)} keys)>'
+        if self._display_summary():
+            return f'{header}\n{self._summary().to_string()}'
         output = ''.join(f'{unicode_key} {key}\n{repr(value)}\n\n' for key, value in self.items())
-        return f'<{type(self).__name__} ({len(self)} keys)>\n{output}'
+        return f'{header}\n{output}'
+
+    def _dataset_html(self, key: str, dataset: xr.Dataset) -> str:
+        # the html of each dataset is cached until the dataset or its variables are replaced
+        token = (id(dataset), _cache_token(dataset))
+        cached = self._html_fragments.get(key)
+        if cached is None or cached[0] != token:
+            cached = (token, xr.core.formatting_html.dataset_repr(dataset))
+            self._html_fragments[key] = cached
+        return cached[1]
 
     def _repr_html_(self):
         """
         Return an html representation for the collection object.
         Mainly for IPython notebook
         """
+        obj_type = f'xcollection.{type(self).__name__}'
+        header = f"<div class='xr-header'><div class='xr-obj-type'>{escape(obj_type)}</div></div>"
+
+        if self._display_summary():
+            # Rendering the datasets of large collections is slow and produces huge
+            # outputs, so only a summary row is shown for each of them.
+            summary = self._summary().to_html(border=0, classes='xr-collection-summary')
+            return '<div>' f'{header}' f'<div>{len(self)} keys</div>' f'{summary}' '</div>'
 
         def _summarize_datasets(datasets):
             ds_li = ''.join(
-                f"<li class='xr-var-item'><strong>{unicode_key}&nbsp;{key}</strong>{xr.core.formatting_html.dataset_repr(ds)}</li>"
+                f"<li class='xr-var-item'><strong>{unicode_key}&nbsp;{key}</strong>{self._dataset_html(key, ds)}</li>"
                 for key, ds in datasets.items()
             )
             return f'<ul>{ds_li}</ul>'
@@ -153,8 +474,6 @@ class Collection(MutableMapping):
             expand_option_name='display_expand_data_vars',
             enabled=True,
         )
-        obj_type = f'xcollection.{type(self).__name__}'
-        header = f"<div class='xr-header'><div class='xr-obj-type'>{escape(obj_type)}</div></div>"
         return (
             '<div>'
             "<div class='xr-wrap' style='display:none'>"
@@ -172,6 +491,112 @@ class Collection(MutableMapping):
 
         display(HTML(self._repr_html_()))
 
+    _INDEXES = {
+        'variables': (VariableIndex, 'variable_names'),
+        'metadata': (MetadataTable, 'metadata'),
+    }
+
+    def _index_token(self, key: str) -> typing.Optional[typing.Hashable]:
+        # Detects datasets that have been replaced or whose variables or attributes
+        # have been replaced or modified in place, e.g. ``c['foo']['bar'] = ...``.
+        # Datasets of a lazy collection that are not open are described by the store.
+        if isinstance(self.datasets, LazyDatasets) and not self.datasets.is_open(key):
+            return None
+        dataset = self.datasets[key]
+        return (id(dataset), _cache_token(dataset))
+
+    def _describe(self, key: str, indexes: typing.Iterable[str]) -> None:
+        """Add or replace the entries of ``key`` in the given indexes."""
+        token = self._index_token(key)
+        for name in indexes:
+            index = self._indexes[name]
+            if token is None:
+                # read the entries from the store metadata to avoid opening the datasets
+                index.add(key, getattr(self.datasets, self._INDEXES[name][1])(key))
+            else:
+                index.add(key, index.describe(self.datasets[key]))
+        self._index_tokens[key] = token
+
+    def _index(self, name: str):
+        """Return the index ``name``, building it on first use."""
+        if self._indexed_datasets is not self.datasets:
+            # `datasets` has been reassigned since the indexes were built
+            self._indexes = {}
+            self._index_tokens = {}
+            self._indexed_datasets = self.datasets
+        if name not in self._indexes:
+            self._indexes[name] = self._INDEXES[name][0]()
+            for key in self.keys():
+                self._describe(key, [name])
+        return self._indexes[name]
+
+    def refresh_indexes(self, keys: typing.Optional[typing.Iterable[str]] = None) -> None:
+        """Update the index entries of datasets that have been modified in place.
+
+        Adding, replacing and removing datasets keeps :py:attr:`variables_index` and
+        :py:attr:`metadata` up to date, but changes made to a dataset of the collection,
+        e.g. ``c['foo']['bar'] = ...``, are only picked up by this method.
+
+        Parameters
+        ----------
+        keys : iterable of str, optional
+            The keys of the datasets to refresh. By default, the datasets that have
+            changed since they were indexed are searched for among all the keys.
+        """
+        if self._indexed_datasets is not self.datasets or not self._indexes:
+            return
+        if keys is None:
+            keys = [
+                key for key in self.keys() if self._index_token(key) != self._index_tokens.get(key)
+            ]
+        for key in keys:
+            self._update_indexes(key)
+
+    def _update_indexes(self, key: str) -> None:
+        if self._indexed_datasets is not self.datasets or not self._indexes:
+            return
+        if key in self.datasets:
+            self._describe(key, self._indexes)
+        else:
+            for index in self._indexes.values():
+                index.remove(key)
+            self._index_tokens.pop(key, None)
+
+    @property
+    def variables_index(self) -> VariableIndex:
+        """An inverted index mapping each variable name to the keys of the datasets containing it.
+
+        The index is built on first access and kept up to date when datasets are
+        added to or removed from the collection. Use :py:meth:`refresh_indexes` after
+        modifying a dataset of the collection in place. For collections opened lazily,
+        the variable names are read from the store metadata without opening any
+        dataset.
+
+        Examples
+        --------
+        >>> c.variables_index['Tair']
+        ('foo', 'bar')
+        >>> c.variables_index.lookup(['Tair', 'air'], mode='any')
+        {'foo', 'bar', 'baz'}
+        """
+        return self._index('variables')
+
+    @property
+    def metadata(self) -> MetadataTable:
+        """A table of the dimensions, coordinates, variables, dtypes and attributes of each dataset.
+
+        Like :py:attr:`variables_index`, the table is built on first access and kept
+        up to date when datasets are added to or removed from the collection.
+
+        Examples
+        --------
+        >>> c.metadata.sizes
+              y      x  time
+        foo  205.0  275.0   NaN
+        bar    NaN  275.0  36.0
+        """
+        return self._index('metadata')
+
     def keys(self) -> typing.Iterable[str]:
         """Return the keys of the collection."""
         return self.datasets.keys()
@@ -249,19 +674,34 @@ class Collection(MutableMapping):
         if isinstance(data_vars, str):
             data_vars = [data_vars]
 
-        def _select_vars(dset):
-            try:
-                return dset[data_vars]
-            except KeyError:
-                if mode == 'all':
-                    raise KeyError(f'No data variables: `{data_vars}` found in dataset: {dset!r}')
-
-        if mode == 'all':
-            result = toolz.valmap(_select_vars, self.datasets)
-        elif mode == 'any':
-            result = toolz.valfilter(_select_vars, self.datasets)
-
-        return type(self)(datasets=result)
+        with instrumentation.span('choose') as record:
+            selected = self.variables_index.lookup(data_vars, mode='all')
+
+            if mode == 'all':
+                missing = [key for key in self.keys() if key not in selected]
+                if missing:
+                    raise KeyError(
+                        f'No data variables: `{data_vars}` found in dataset: {self[missing[0]]!r}'
+                    )
+                select = instrumentation.traced(lambda key: self[key][data_vars], record)
+                result = {key: select(key) for key in self.keys()}
+                result = type(self)._construct(result)
+            elif mode == 'any':
+                result = self._subset(selected)
+
+            if record is not None:
+                record.datasets = len(result)
+            return result
+
+    def _subset(self, selected: typing.Container[str]) -> 'Collection':
+        """Return a collection of the keys in ``selected``, in the order of the collection.
+
+        The datasets of a lazily opened collection are not opened.
+        """
+        keys = [key for key in self.keys() if key in selected]
+        if isinstance(self.datasets, LazyDatasets):
+            return type(self)._construct(self.datasets.subset(keys))
+        return type(self)._construct({key: self.datasets[key] for key in keys})
 
     def filter(self, *, by: str, func: typing.Callable) -> 'Collection':
         """Return a collection with datasets that match the filter function.
@@ -324,16 +764,71 @@ class Collection(MutableMapping):
         if by not in _VALID_BY:
             raise ValueError(f'Invalid by: {by}. Accepted by are {_VALID_BY}')
 
-        if by == 'key':
-            result = toolz.keyfilter(func, self.datasets)
+        with instrumentation.span('filter', datasets=0 if by == 'key' else len(self)) as record:
+            if by == 'key':
+                result = toolz.keyfilter(func, self.datasets)
 
-        elif by == 'value':
-            result = toolz.valfilter(func, self.datasets)
+            elif record is not None:
+                # the predicate is evaluated key by key to record each evaluation
+                value = toolz.second if by == 'value' else toolz.identity
+                predicate = instrumentation.traced(lambda key, item: func(value(item)), record)
+                result = {key: dset for key, dset in self.items() if predicate(key, (key, dset))}
 
-        elif by == 'item':
-            result = toolz.itemfilter(func, self.datasets)
+            elif by == 'value':
+                result = toolz.valfilter(func, self.datasets)
 
-        return type(self)(datasets=result)
+            elif by == 'item':
+                result = toolz.itemfilter(func, self.datasets)
+
+            return type(self)._construct(result)
+
+    def query(
+        self,
+        *,
+        dims: typing.Union[str, typing.Iterable[str], typing.Mapping[str, typing.Any]] = None,
+        coords: typing.Union[str, typing.Iterable[str]] = None,
+        data_vars: typing.Union[str, typing.Iterable[str]] = None,
+        attrs: typing.Mapping[str, typing.Any] = None,
+    ) -> 'Collection':
+        """Return a collection with the datasets matching all the given structural conditions.
+
+        The conditions are evaluated against :py:attr:`metadata`, so the
+        datasets themselves are not accessed. The result of a lazily opened
+        collection is lazy too: its datasets are opened on first access.
+
+        Parameters
+        ----------
+        dims : str, list of str or dict, optional
+            The dimensions the datasets must have. If a dictionary, each value is
+            either an exact size, or a callable that takes a :py:class:`pandas.Series`
+            of the sizes of the dimension and returns a boolean Series.
+        coords : str or list of str, optional
+            The coordinates the datasets must have.
+        data_vars : str or list of str, optional
+            The data variables the datasets must have.
+        attrs : dict, optional
+            The attributes the datasets must have. Each value is either the
+            expected value of the attribute, or a callable that takes the value
+            of the attribute and returns a boolean.
+
+        Returns
+        -------
+        Collection
+            A new collection containing only the selected datasets.
+
+        Examples
+        --------
+        >>> c.keys()
+        dict_keys(['foo', 'bar', 'baz'])
+        >>> c.query(dims={'time': lambda size: size > 100}, coords='lat').keys()
+        dict_keys(['baz'])
+        >>> c.query(dims=['x', 'y'], attrs={'title': lambda title: 'rasm' in title}).keys()
+        dict_keys(['foo'])
+        """
+        selected = set(
+            self.metadata.query(dims=dims, coords=coords, data_vars=data_vars, attrs=attrs)
+        )
+        return self._subset(selected)
 
     def keymap(self, func: typing.Callable[[str], str]) -> 'Collection':
         """Apply a function to each key in the collection.
@@ -382,12 +877,23 @@ class Collection(MutableMapping):
         if not callable(func):
             raise TypeError(f'First argument must be callable function, got {type(func)}')
 
-        return type(self)(datasets=toolz.keymap(func, self.datasets))
+        with instrumentation.span('keymap', datasets=len(self)):
+            result = toolz.keymap(func, self.datasets)
+            # the datasets are already valid, only the new keys need to be checked
+            with instrumentation.validation():
+                for key in result:
+                    if not isinstance(key, str):
+                        raise TypeError(f'Expected keys to be str, got {type(key)}')
+            return type(self)._construct(result)
 
     def map(
         self,
         func: typing.Callable[[xr.Dataset], xr.Dataset],
         args: typing.Sequence[typing.Any] = None,
+        *,
+        executor: str = None,
+        max_workers: int = None,
+        cache: 'MapCache' = None,
         **kwargs: typing.Dict[str, typing.Any],
     ) -> 'Collection':
         """Apply a function to each dataset in the collection.
@@ -399,6 +905,22 @@ class Collection(MutableMapping):
         args : tuple, optional
             Positional arguments to pass to `func` in addition to the
             dataset.
+        executor : str, optional
+            Apply `func` to the datasets concurrently using the given executor.
+            Must be one of 'threads', 'processes', 'dask' or 'shared_memory'. With
+            'processes', `func` and the datasets must be picklable. 'shared_memory'
+            also uses worker processes, which is best for CPU-bound functions
+            holding the GIL, but the numpy arrays of the datasets and of the results
+            are transferred through shared memory instead of being pickled, and
+            the workers see the datasets as views of that memory. By default,
+            `func` is applied to one dataset at a time.
+        max_workers : int, optional
+            The maximum number of workers used by `executor`.
+        cache : MapCache, optional
+            Read the results from, and store them in, the given cache. The results
+            are looked up by function, arguments and content fingerprint of the
+            datasets, and `func` is only applied to the datasets without a cached
+            result. Fingerprinting reads the values of all the datasets.
         kwargs
             Additional keyword arguments to pass as keywords arguments to
             `func`.
@@ -408,6 +930,12 @@ class Collection(MutableMapping):
         Collection
             A new collection containing the results of the function.
 
+        Raises
+        ------
+        CollectionMapError
+            If `executor` is set and `func` fails for one or more datasets. The
+            failures for all keys are reported together.
+
         Examples
         --------
         >>> c
@@ -463,10 +991,134 @@ class Collection(MutableMapping):
         if not isinstance(args, tuple):
             raise TypeError(f'Second argument must be a tuple, got {type(args)}')
 
-        func = _rpartial(func, *args, **kwargs)
-        return type(self)(datasets=toolz.valmap(func, self.datasets))
+        with instrumentation.span('map', datasets=len(self)) as record:
+            datasets, cached = self.datasets, {}
+            if cache is not None:
+                entry_keys = {
+                    key: cache.entry_key(func, fingerprint, args, kwargs)
+                    for key, fingerprint in fingerprints(self.datasets).items()
+                }
+                cached = {key: cache.get(entry_key) for key, entry_key in entry_keys.items()}
+                cached = toolz.valfilter(lambda value: value is not None, cached)
+                datasets = {key: value for key, value in self.items() if key not in cached}
+
+            result = _apply(
+                func,
+                datasets,
+                executor=executor,
+                max_workers=max_workers,
+                args=args,
+                kwargs=kwargs,
+                record=record,
+            )
+
+            if cache is not None:
+                for key, value in result.items():
+                    cache.put(entry_keys[key], value)
+                cache.evict()
+                result = {key: cached[key] if key in cached else result[key] for key in self.keys()}
+            with instrumentation.validation():
+                return type(self)(datasets=result)
+
+    def lazy(self) -> 'LazyCollection':
+        """Return a lazy version of the collection, on which operations are recorded as a plan.
+
+        The :py:meth:`choose`, :py:meth:`filter`, :py:meth:`keymap` and :py:meth:`map`
+        methods of the lazy collection don't build intermediate collections.
+        Instead, the recorded plan is optimized and run in a single pass over
+        each key when :py:meth:`~xcollection.plan.LazyCollection.collect` is called:
+        consecutive maps are fused, and filters on keys are moved to the front of
+        the plan so that the datasets they filter out are never accessed.
+
+        Returns
+        -------
+        LazyCollection
+
+        Examples
+        --------
+        >>> lc = c.lazy().choose('Tair').map(func=f).map(func=g).filter(by='key', func=h)
+        >>> print(lc.explain())
+        <LazyCollection (3 keys in source)>
+          1. choose(data_vars=['Tair'], mode='any')  # variables index
+          2. filter(by='key', func=h)  # keys only
+          3. map(funcs=[f, g])  # 2 fused maps
+        >>> lc.collect()
+        """
+        from .plan import LazyCollection
+
+        return LazyCollection(self)
+
+    def iter_map(
+        self,
+        func: typing.Callable[[xr.Dataset], typing.Any],
+        args: typing.Sequence[typing.Any] = None,
+        *,
+        prefetch: int = 2,
+        **kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+        """Apply a function to each dataset in turn, yielding ``(key, result)`` pairs.
+
+        While a dataset is processed, the next `prefetch` datasets are accessed in
+        the background. For collections opened with ``open_collection(..., lazy=True)``,
+        datasets that are not already open are opened from the store without being
+        cached, and closed once their result has been yielded, so that at most
+        ``prefetch + 1`` of them are open at once regardless of the size of the
+        collection.
+
+        Parameters
+        ----------
+        func : callable
+            The function to apply to each dataset. Since the dataset may be closed
+            after its result is yielded, results should not reference data that is
+            not loaded yet (e.g. call :py:meth:`~xarray.Dataset.load` in `func`).
+        args : tuple, optional
+            Positional arguments to pass to `func` in addition to the
+            dataset.
+        prefetch : int, optional
+            The number of datasets to access ahead of the one being processed.
+            Defaults to 2. If 0, the datasets are accessed one at a time.
+        kwargs
+            Additional keyword arguments to pass as keywords arguments to
+            `func`.
+
+        Yields
+        ------
+        tuple
+            The key and the result of `func` for each dataset, in the order of the keys.
+
+        Examples
+        --------
+        >>> for key, mean in c.iter_map(lambda ds: ds.mean().load(), prefetch=4):
+        ...     print(key, float(mean.Tair))
+        """
+        args = args or ()
 
-    def to_zarr(self, store, mode: str = 'w', **kwargs):
+        if not callable(func):
+            raise TypeError(f'First argument must be callable function, got {type(func)}')
+
+        if not isinstance(args, tuple):
+            raise TypeError(f'Second argument must be a tuple, got {type(args)}')
+
+        datasets = self.datasets
+
+        def _open(key):
+            if isinstance(datasets, LazyDatasets) and not datasets.is_open(key):
+                return datasets.open(key), True
+            return datasets[key], False
+
+        return _stream(list(self.keys()), _open, _rpartial(func, *args, **kwargs), prefetch)
+
+    def to_zarr(
+        self,
+        store,
+        mode: str = 'w',
+        *,
+        compute: bool = True,
+        parallel: bool = False,
+        max_workers: int = None,
+        share_coords: bool = False,
+        **kwargs,
+    ):
         """Write the collection to a Zarr store.
 
         Parameters
@@ -481,20 +1133,612 @@ class Collection(MutableMapping):
             any metadata or shapes would change).
             The default mode is "a" if ``append_dim`` is set. Otherwise, it is
             "r+" if ``region`` is set and ``w-`` otherwise.
+        compute : bool, optional
+            If True, write the array data immediately. Otherwise, only the metadata is
+            written, and a single :py:class:`dask.delayed.Delayed` object that writes the
+            array data of all groups is returned. Computing it executes the writes of the
+            whole collection in one graph.
+        parallel : bool, optional
+            If True, the groups are written concurrently using a thread pool.
+        max_workers : int, optional
+            The maximum number of threads used when `parallel` is True.
+        share_coords : bool, optional
+            If True, the numeric coordinates that are identical in several datasets,
+            other than index coordinates, are written once at the root of the store
+            and referenced from each group (see :py:meth:`share_coords`).
+            :py:func:`open_collection` puts them back in each dataset.
         kwargs
             Additional keyword arguments to pass to :py:meth:`~xarray.Dataset.to_zarr` method.
 
+        Returns
+        -------
+        list or dask.delayed.Delayed
+            The stores of the written groups, or a delayed object writing all of them
+            if `compute` is False.
+
+        Notes
+        -----
+        Once all groups are written, a manifest of the collection listing the keys,
+        variables, dimensions and shapes of each dataset is stored in the attributes
+        of the root group, and the metadata of all groups is consolidated at the root
+        so that :py:func:`open_collection` can read it in a single request.
+
         Examples
         --------
         >>> c.to_zarr(store='/tmp/foo.zarr', mode='w')
+        >>> c.to_zarr(store='/tmp/foo.zarr', mode='w', parallel=True)
+        >>> c.to_zarr(store='/tmp/foo.zarr', mode='w', share_coords=True)
+        >>> delayed = c.to_zarr(store='/tmp/foo.zarr', mode='w', compute=False)
+        >>> delayed.compute()
         """
 
+        import zarr
+
         if kwargs.get('group', None) is not None:
             raise NotImplementedError(
                 'specifying a root group for the collection has not been implemented.'
             )
 
-        return [value.to_zarr(store, group=key, mode=mode, **kwargs) for key, value in self.items()]
+        store = zarr.storage.normalize_store_arg(
+            store, storage_options=kwargs.pop('storage_options', None), mode='a'
+        )
+        # the metadata of all groups is consolidated once, after all of them are written
+        kwargs.setdefault('consolidated', False)
+
+        datasets, shared = self.datasets, {}
+        if share_coords:
+            shared, datasets = split_shared_coords(self.datasets)
+
+        with instrumentation.span('to_zarr', datasets=len(self)) as record:
+            store = instrumentation.counting_store(store, record)
+
+            def _write_group(key):
+                return datasets[key].to_zarr(store, group=key, mode=mode, compute=compute, **kwargs)
+
+            _write_group = instrumentation.traced(_write_group, record)
+
+            if parallel:
+                # create the root group up front so that concurrent writes don't race to create it
+                zarr.open_group(store, mode='a')
+                result = list(
+                    map_values(
+                        _write_group,
+                        dict(zip(self.keys(), self.keys())),
+                        executor='threads',
+                        max_workers=max_workers,
+                    ).values()
+                )
+            else:
+                result = [_write_group(key) for key in self.keys()]
+
+            # The shared coordinates and the metadata of every group are written eagerly,
+            # even when `compute` is False.
+            write_shared_coords(store, shared)
+            updating = _is_update(mode, kwargs)
+            write_collection_metadata(store, self.datasets, merge=updating, from_store=updating)
+        if not compute:
+            import dask
+
+            return dask.delayed(list)(result)
+        return result
+
+    async def to_zarr_async(
+        self, store, mode: str = 'w', *, max_concurrency: int = None, **kwargs
+    ) -> typing.List[typing.Any]:
+        """Write the collection to a Zarr store without blocking the event loop.
+
+        This is the asynchronous variant of :py:meth:`to_zarr`: the groups are
+        written concurrently in threads, and at most `max_concurrency` of them
+        are written at once, so that the data of at most as many datasets is
+        loaded in memory at a time. The collection metadata is written once all
+        groups are written.
+
+        If the awaiting task is cancelled, no new group is written and the
+        collection metadata is not written. The groups being written when the
+        task is cancelled are completed in the background.
+
+        Parameters
+        ----------
+        store : str or pathlib.Path
+             Store or path to directory in local or remote file system.
+        mode : {"w", "w-", "a", "r+", None}, optional
+            Persistence mode. See :py:meth:`to_zarr`.
+        max_concurrency : int, optional
+            The maximum number of groups written at once.
+        kwargs
+            Additional keyword arguments to pass to :py:meth:`~xarray.Dataset.to_zarr` method.
+
+        Returns
+        -------
+        list
+            The stores of the written groups.
+
+        Raises
+        ------
+        CollectionMapError
+            If writing one or more groups fails.
+
+        Examples
+        --------
+        >>> await c.to_zarr_async('/tmp/foo.zarr', max_concurrency=4)
+        """
+        import zarr
+
+        if kwargs.get('group', None) is not None:
+            raise NotImplementedError(
+                'specifying a root group for the collection has not been implemented.'
+            )
+        import asyncio
+
+        if kwargs.get('compute', True) is False:
+            raise ValueError('compute=False is not supported by to_zarr_async, use to_zarr')
+
+        loop = asyncio.get_running_loop()
+        storage_options = kwargs.pop('storage_options', None)
+
+        def _open_root():
+            normalized = zarr.storage.normalize_store_arg(
+                store, storage_options=storage_options, mode='a'
+            )
+            zarr.open_group(normalized, mode='a')
+            return normalized
+
+        # even opening the store may block, e.g. on a remote file system
+        target = await loop.run_in_executor(None, _open_root)
+        kwargs.setdefault('consolidated', False)
+
+        def _write_group(key):
+            return self[key].to_zarr(target, group=key, mode=mode, **kwargs)
+
+        result = await map_values_async(
+            _write_group, dict(zip(self.keys(), self.keys())), max_concurrency=max_concurrency
+        )
+        await loop.run_in_executor(
+            None,
+            functools.partial(
+                write_collection_metadata,
+                target,
+                self.datasets,
+                merge=_is_update(mode, kwargs),
+                from_store=_is_update(mode, kwargs),
+            ),
+        )
+        return list(result.values())
+
+    def to_dataset(self, dim: str = 'member', **kwargs) -> xr.Dataset:
+        """Concatenate the datasets of the collection along a new dimension.
+
+        This is useful for collections of members with the same structure, e.g. an
+        ensemble: operations on the resulting dataset are vectorized across the
+        members instead of being applied to one dataset at a time. Dask-backed
+        variables are concatenated lazily, without copying the data.
+
+        Parameters
+        ----------
+        dim : str, optional
+            The name of the new dimension. The keys of the collection are used as
+            its coordinate. Defaults to 'member'.
+        kwargs
+            Additional keyword arguments to pass to :py:func:`~xarray.concat` function.
+            By default, only the variables that are not coordinates are
+            concatenated, the other coordinates must be equal across members, and
+            the indexes must be equal (``join='exact'``).
+
+        Returns
+        -------
+        xarray.Dataset
+
+        See Also
+        --------
+        Collection.from_dataset
+
+        Examples
+        --------
+        >>> c = xc.Collection({'a': ds, 'b': ds + 1})
+        >>> c.to_dataset(dim='member').Tair.dims
+        ('member', 'time', 'y', 'x')
+        """
+        if not len(self):
+            raise ValueError('Cannot convert an empty collection to a dataset')
+        if any(dim in dataset.dims for dataset in self.values()):
+            raise ValueError(f'Dimension {dim!r} already exists in the datasets of the collection')
+
+        kwargs = {
+            'data_vars': 'all',
+            'coords': 'minimal',
+            'join': 'exact',
+            'combine_attrs': 'drop_conflicts',
+            **kwargs,
+        }
+        keys = pd.Index(list(self.keys()), name=dim, dtype=object)
+        return xr.concat(list(self.values()), dim=keys, **kwargs)
+
+    @classmethod
+    def from_dataset(cls, dataset: xr.Dataset, dim: str = 'member') -> 'Collection':
+        """Split a dataset along a dimension into a collection, one key per position.
+
+        This is the inverse of :py:meth:`Collection.to_dataset`. The datasets of the
+        collection are views of ``dataset``: the data is not copied.
+
+        Parameters
+        ----------
+        dataset : xarray.Dataset
+            The dataset to split.
+        dim : str, optional
+            The dimension to split ``dataset`` along. If it has a coordinate, its
+            values are used as keys. Otherwise, the keys are the positions along the
+            dimension. Defaults to 'member'.
+
+        Returns
+        -------
+        Collection
+
+        Examples
+        --------
+        >>> d = xc.Collection.from_dataset(c.to_dataset(dim='member'), dim='member')
+        >>> d.keys()
+        dict_keys(['a', 'b'])
+        """
+        if dim not in dataset.dims:
+            raise ValueError(f'Dimension {dim!r} not found in dataset')
+
+        if dim in dataset.coords:
+            keys = [str(key) for key in dataset[dim].values]
+            dataset = dataset.drop_vars(dim)
+        else:
+            keys = [str(position) for position in range(dataset.sizes[dim])]
+        if len(set(keys)) != len(keys):
+            raise ValueError(f'The values of {dim!r} must be unique to be used as keys')
+        return cls._construct(
+            {key: dataset.isel({dim: position}) for position, key in enumerate(keys)}
+        )
+
+    def sync_zarr(
+        self, store, *, append_dim: str = None, **kwargs
+    ) -> typing.Dict[str, typing.List[str]]:
+        """Incrementally update a Zarr store written by :py:meth:`to_zarr` or :py:meth:`sync_zarr`.
+
+        The datasets of the collection are compared with the collection manifest
+        of the store, using content fingerprints (see
+        :py:func:`~xcollection.fingerprint.fingerprints`), and only what changed is
+        written:
+
+        - groups for keys that are not in the store are written;
+        - groups whose fingerprint matches the manifest are skipped;
+        - if `append_dim` is given, groups that only grew along `append_dim`, i.e.
+          whose stored part is unchanged, are appended the new part;
+        - other groups are overwritten.
+
+        Groups of the store without a key in the collection are left untouched.
+        The fingerprints are computed from the current values on every call, so
+        that values modified in place are written, and recorded in the manifest. Groups written by
+        :py:meth:`to_zarr` have no recorded fingerprint and are overwritten by the
+        first sync.
+
+        Parameters
+        ----------
+        store : str or pathlib.Path
+             Store or path to directory in local or remote file system.
+        append_dim : str, optional
+            The dimension along which the datasets grow, e.g. 'time'.
+        kwargs
+            Additional keyword arguments to pass to :py:meth:`~xarray.Dataset.to_zarr` method.
+
+        Returns
+        -------
+        dict
+            The keys that were 'written' (new), 'appended', 'overwritten' and 'skipped'.
+
+        Examples
+        --------
+        >>> c.sync_zarr('/tmp/foo.zarr', append_dim='time')
+        {'written': ['new'], 'appended': ['foo'], 'overwritten': [], 'skipped': ['bar']}
+        """
+        import zarr
+
+        store = zarr.storage.normalize_store_arg(
+            store, storage_options=kwargs.pop('storage_options', None), mode='a'
+        )
+        kwargs.setdefault('consolidated', False)
+        root = zarr.open_group(store, mode='a')
+        groups = set(root.group_keys())
+        entries = root.attrs.get(MANIFEST_KEY, {}).get('datasets', {})
+
+        current = fingerprints(self.datasets)
+        report = {'written': [], 'appended': [], 'overwritten': [], 'skipped': []}
+        for key, dataset in self.items():
+            entry = entries.get(key, {}) if key in groups else {}
+            stored = entry.get('fingerprint')
+            if key not in groups:
+                status = 'written'
+            elif stored is not None and stored == current[key]:
+                status = 'skipped'
+            elif stored is not None and append_dim and _grew_along(dataset, entry, append_dim):
+                # the stored part must be unchanged for the new part to be appended
+                size = entry['dims'][append_dim]
+                head = dataset.isel({append_dim: slice(0, size)})
+                status = 'appended' if dataset_fingerprint(head) == stored else 'overwritten'
+            else:
+                status = 'overwritten'
+
+            if status == 'appended':
+                new = dataset.isel({append_dim: slice(size, None)})
+                new.to_zarr(store, group=key, append_dim=append_dim, **kwargs)
+            elif status != 'skipped':
+                dataset.to_zarr(store, group=key, mode='w', **kwargs)
+            report[status].append(key)
+
+        write_collection_metadata(store, self.datasets, merge=True, fingerprints=current)
+        return report
+
+    def compute(self, **kwargs) -> 'Collection':
+        """Compute the dask-backed datasets of the collection and return them in a new collection.
+
+        The graphs of all the datasets are merged and computed in a single
+        :py:func:`dask.compute` call, so that tasks shared by several datasets,
+        e.g. loading a common coordinate, are executed only once. The variables
+        lazily read from disk without dask are loaded as well. The datasets of
+        the collection are left unchanged.
+
+        Parameters
+        ----------
+        kwargs
+            Additional keyword arguments to pass to :py:func:`dask.compute`, e.g.
+            ``scheduler``.
+
+        Returns
+        -------
+        Collection
+
+        See Also
+        --------
+        Collection.load
+        Collection.persist
+        """
+        import dask
+
+        computed = dask.compute(*self.values(), **kwargs)
+        return type(self)._construct(
+            {key: _load_lazy_variables(dataset) for key, dataset in zip(self.keys(), computed)}
+        )
+
+    def persist(self, **kwargs) -> 'Collection':
+        """Persist the dask-backed datasets of the collection in memory and return them in a new collection.
+
+        Like :py:meth:`compute`, the graphs of all the datasets are persisted in
+        a single :py:func:`dask.persist` call, but the datasets remain backed by
+        dask arrays, whose chunks are in memory (or on the workers of a
+        distributed cluster). The variables lazily read from disk without dask are
+        loaded in memory.
+
+        Parameters
+        ----------
+        kwargs
+            Additional keyword arguments to pass to :py:func:`dask.persist`.
+
+        Returns
+        -------
+        Collection
+        """
+        import dask
+
+        persisted = dask.persist(*self.values(), **kwargs)
+        return type(self)._construct(
+            {key: _load_lazy_variables(dataset) for key, dataset in zip(self.keys(), persisted)}
+        )
+
+    def load(self, **kwargs) -> 'Collection':
+        """Load the data of all the datasets of the collection in memory, in place.
+
+        Like :py:meth:`xarray.Dataset.load`, the datasets are modified in place.
+        The data of all the datasets is computed in a single :py:func:`dask.compute`
+        call. See :py:meth:`compute`.
+
+        Parameters
+        ----------
+        kwargs
+            Additional keyword arguments to pass to :py:func:`dask.compute`.
+
+        Returns
+        -------
+        Collection
+            The collection itself.
+        """
+        import dask
+
+        lazy = [
+            variable
+            for dataset in self.values()
+            for variable in dataset.variables.values()
+            if dask.is_dask_collection(variable.data)
+        ]
+        computed = dask.compute(*(variable.data for variable in lazy), **kwargs)
+        for variable, data in zip(lazy, computed):
+            variable.data = data
+        # load the variables that are lazily read from disk without dask
+        for dataset in self.values():
+            dataset.load()
+        return self
+
+    def chunk_plan(
+        self,
+        target: typing.Union[str, typing.Mapping[str, typing.Any]] = 'auto',
+        *,
+        max_mem: typing.Union[int, str] = None,
+    ) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """Return the per-key plan used by :py:meth:`rechunk`, without rechunking.
+
+        See :py:func:`xcollection.chunking.plan_chunks` for a description of the
+        parameters and of the plan of each key.
+
+        Examples
+        --------
+        >>> c.chunk_plan(max_mem='16MiB')['foo']
+        {'chunks': {'time': 36, 'y': 205, 'x': 275}, 'previous': {'time': 36, 'y': 205, 'x': 275},
+         'chunk_nbytes': 16236000, 'previous_chunk_nbytes': 16236000, 'nchunks': 3}
+        """
+        from .chunking import plan_chunks
+
+        return {
+            key: plan_chunks(dataset, target=target, max_mem=max_mem)
+            for key, dataset in self.items()
+        }
+
+    def rechunk(
+        self,
+        target: typing.Union[str, typing.Mapping[str, typing.Any]] = 'auto',
+        *,
+        max_mem: typing.Union[int, str] = None,
+    ) -> 'Collection':
+        """Rechunk the datasets of the collection so that their chunks fit in a memory budget.
+
+        The chunk sizes are chosen per dataset, and automatic chunk sizes are
+        multiples of the Zarr chunks of the variables (from their encoding), so
+        that the result can be written efficiently with :py:meth:`to_zarr`. If a
+        new chunking is not aligned with the Zarr chunks of a variable, they are
+        removed from its encoding. Dask-backed datasets are rechunked lazily and
+        numpy-backed datasets are wrapped in dask arrays, without copying the data.
+        Use :py:meth:`chunk_plan` to inspect the plan and the expected memory use
+        beforehand.
+
+        Parameters
+        ----------
+        target : 'auto' or dict, optional
+            Either 'auto' to choose the chunk size along every dimension, or a
+            mapping of dimension names to chunk sizes, -1 for no chunking along
+            the dimension, or 'auto'. Dimensions missing from the mapping keep their
+            current chunking.
+        max_mem : int or str, optional
+            The memory budget of a chunk, in bytes or as a string like '128MiB'.
+            Defaults to dask's ``array.chunk-size`` configuration value.
+
+        Returns
+        -------
+        Collection
+
+        Examples
+        --------
+        >>> c.rechunk(max_mem='64MiB')
+        >>> c.rechunk({'time': 'auto', 'x': -1}, max_mem='64MiB')
+        """
+        from .chunking import apply_chunks
+
+        plans = self.chunk_plan(target, max_mem=max_mem)
+        return type(self)._construct(
+            {key: apply_chunks(dataset, plans[key]['chunks']) for key, dataset in self.items()}
+        )
+
+    def share_coords(self) -> 'Collection':
+        """Return a collection whose identical coordinates share a single read-only array.
+
+        Numeric coordinates other than index coordinates, e.g. 2D grids of
+        latitudes and longitudes, are compared by fingerprint of their dims, shape,
+        dtype and values. The coordinates found in several datasets are loaded once,
+        in an array marked read-only that all of them reference, so that the
+        memory they use is not multiplied by the number of datasets. Their
+        attributes are kept per dataset. Dask-backed coordinates are left as they are.
+
+        Returns
+        -------
+        Collection
+
+        Examples
+        --------
+        >>> c = xc.Collection({'foo': ds.isel(time=0), 'bar': ds.isel(time=1)}).share_coords()
+        >>> c['foo'].xc.data is c['bar'].xc.data
+        True
+        """
+        return type(self)._construct(intern_coords(self.datasets))
+
+    def reduce(
+        self,
+        func: typing.Union[str, typing.Callable],
+        across: str = 'members',
+        *,
+        join: str = 'exact',
+        **kwargs,
+    ) -> xr.Dataset:
+        """Reduce the datasets of the collection element-wise, across its members.
+
+        Parameters
+        ----------
+        func : str or callable
+            Either the name of a statistic computed in a single streaming pass over
+            the members, one of 'mean', 'sum', 'min', 'max' or 'std', or a function
+            with the signature ``func(array, axis, **kwargs)``, like
+            :py:func:`numpy.median`. A function is applied to all the members
+            stacked along a new axis, so they must all fit in memory, unless they
+            are dask-backed.
+        across : str, optional
+            What to reduce across. Only 'members' is supported.
+        join : {'exact', 'inner', 'outer'}, optional
+            How to handle members whose indexes or data variables differ. With
+            'exact', the default, a ValueError is raised. With 'inner', only the
+            index labels and data variables common to all members are kept. With
+            'outer', those of any member are kept, and members without a label or
+            a variable do not contribute to it.
+        kwargs
+            Additional keyword arguments: ``ddof`` for 'std', or keyword arguments
+            to pass to `func`.
+
+        Returns
+        -------
+        xarray.Dataset
+
+        Notes
+        -----
+        The statistics are computed with a :py:class:`~xcollection.reductions.MemberAccumulator`:
+        members are read one at a time, and only a running count, mean, sum of
+        squared deviations (Welford's algorithm), sum, minimum or maximum is kept,
+        so memory use does not grow with the number of members. Missing values
+        are skipped, and non-numeric data variables are dropped. For collections
+        opened with ``open_collection(..., lazy=True)``, the members that are not
+        already open are closed once they have been added.
+
+        Examples
+        --------
+        >>> c.reduce('mean')
+        >>> c.reduce('std', ddof=1)
+        >>> c.reduce(np.median, join='inner')
+        """
+        _VALID_ACROSS = ['members']
+        if across not in _VALID_ACROSS:
+            raise ValueError(f'Invalid across: {across}. Accepted values are {_VALID_ACROSS}')
+        if not len(self):
+            raise ValueError('Cannot reduce an empty collection')
+
+        with instrumentation.span('reduce', datasets=len(self)):
+            if isinstance(func, str):
+                accumulator = MemberAccumulator([func], join=join)
+                for key, dataset in self.iter_map(toolz.identity):
+                    accumulator.add(key, dataset)
+                return accumulator.result(func, **kwargs)
+
+            if not callable(func):
+                raise TypeError(f'First argument must be a string or a callable, got {type(func)}')
+            # coordinates that differ between members are stacked, and dropped by the reduction
+            stacked = self.to_dataset(dim=_MEMBER_DIM, join=join, coords='different')
+            return stacked.reduce(func, dim=_MEMBER_DIM, numeric_only=True, **kwargs)
+
+    def mean(self, *, join: str = 'exact') -> xr.Dataset:
+        """Return the element-wise mean across the members. See :py:meth:`reduce`."""
+        return self.reduce('mean', join=join)
+
+    def sum(self, *, join: str = 'exact') -> xr.Dataset:
+        """Return the element-wise sum across the members. See :py:meth:`reduce`."""
+        return self.reduce('sum', join=join)
+
+    def min(self, *, join: str = 'exact') -> xr.Dataset:
+        """Return the element-wise minimum across the members. See :py:meth:`reduce`."""
+        return self.reduce('min', join=join)
+
+    def max(self, *, join: str = 'exact') -> xr.Dataset:
+        """Return the element-wise maximum across the members. See :py:meth:`reduce`."""
+        return self.reduce('max', join=join)
+
+    def std(self, *, join: str = 'exact', ddof: int = 0) -> xr.Dataset:
+        """Return the element-wise standard deviation across the members. See :py:meth:`reduce`."""
+        return self.reduce('std', join=join, ddof=ddof)
 
     def weighted(self, weights, **kwargs) -> 'Collection':
         """Return a collection with datasets weighted by the given weights."""
@@ -520,21 +1764,116 @@ class CollectionWeighted(Weighted['Collection']):
 
         self._check_dim(dim)
 
+        if dim is None:
+            # The stacked datasets must not be reduced along the member dimension, so
+            # the reduction dims are made explicit: all the dims of each variable and
+            # of the weights, as with ``dim=None``.
+            def reduce(da, dim, **kwargs):
+                dims = {*da.dims, *self.weights.dims} - {_MEMBER_DIM}
+                return func(da, dim=list(dims), **kwargs)
+
+        else:
+            reduce = func
+
         dataset_dict = {}
-        for key, dataset in self.obj.items():
+        with instrumentation.span('weighted', datasets=len(self.obj)) as record:
+            for keys in _stackable_groups(self.obj.datasets):
+                # the members of a group are recorded together, under their joined keys
+                with instrumentation.span('weighted', ', '.join(keys), record, datasets=len(keys)):
+                    if len(keys) == 1:
+                        dataset_dict[keys[0]] = self.obj[keys[0]].map(func, dim=dim, **kwargs)
+                        continue
+                    # the weighted reduction, including the sum of weights, is computed
+                    # once for all the members of the group
+                    stacked = _stack([self.obj[key] for key in keys])
+                    reduced = stacked.map(reduce, dim=dim, **kwargs)
+                    dataset_dict.update(zip(keys, _unstack(reduced)))
+        return Collection._construct({key: dataset_dict[key] for key in self.obj.keys()})
+
+
+# name of the virtual dimension along which members of a collection are stacked
+_MEMBER_DIM = '__xcollection_member__'
+
+
+def _signature(dataset: xr.Dataset) -> typing.Hashable:
+    return (
+        tuple(sorted((str(dim), size) for dim, size in dataset.dims.items())),
+        tuple(
+            sorted(
+                (str(name), name in dataset.coords, variable.dims, str(variable.dtype))
+                for name, variable in dataset.variables.items()
+            )
+        ),
+    )
 
-            dataset = dataset.map(func, dim=dim, **kwargs)
-            dataset_dict[key] = dataset
-        return Collection(dataset_dict)
 
+def _stackable_groups(datasets: typing.Mapping[str, xr.Dataset]) -> typing.List[typing.List[str]]:
+    """Group the keys of datasets that can be stacked along a new dimension.
 
-def open_collection(store: typing.Union[str, pydantic.DirectoryPath], **kwargs):
+    The datasets of a group have the same dimensions, variables, dtypes and
+    attributes, and identical coordinates.
+    """
+    buckets = {}
+    for key, dataset in datasets.items():
+        groups = buckets.setdefault(_signature(dataset), [])
+        for group in groups:
+            first = datasets[group[0]]
+            if not structure_equal(first, dataset, check_dtypes=True):
+                continue
+            if first.coords.to_dataset().identical(dataset.coords.to_dataset()):
+                group.append(key)
+                break
+        else:
+            groups.append([key])
+    return [group for groups in buckets.values() for group in groups]
+
+
+def _stack(datasets: typing.List[xr.Dataset]) -> xr.Dataset:
+    """Stack datasets returned by :py:func:`_stackable_groups` along ``_MEMBER_DIM``."""
+    return xr.concat(
+        datasets,
+        dim=_MEMBER_DIM,
+        data_vars='all',
+        coords='minimal',
+        compat='override',
+        join='override',
+        combine_attrs='override',
+    )
+
+
+def _unstack(dataset: xr.Dataset) -> typing.List[xr.Dataset]:
+    """Split a dataset stacked by :py:func:`_stack` back into its members."""
+    return [dataset.isel({_MEMBER_DIM: i}) for i in range(dataset.sizes[_MEMBER_DIM])]
+
+
+def open_collection(
+    store: typing.Union[str, pydantic.DirectoryPath],
+    *,
+    parallel: bool = False,
+    max_workers: int = None,
+    lazy: bool = False,
+    cache_size: int = None,
+    **kwargs,
+):
     """Open a collection stored in a Zarr store.
 
     Parameters
     ----------
     store : str or pathlib.Path
          Store or path to directory in local or remote file system.
+    parallel : bool, optional
+        If True, the datasets are opened concurrently using a thread pool.
+    max_workers : int, optional
+        The maximum number of threads used when `parallel` is True.
+    lazy : bool, optional
+        If True, the keys are listed from the store but each dataset is only
+        opened the first time it is accessed. Listing the keys, counting them
+        and membership tests never open a dataset.
+    cache_size : int, optional
+        Only used when `lazy` is True. The maximum number of datasets to keep
+        open at once. When exceeded, the least recently used dataset is closed
+        and evicted, and will be opened again on its next access. By default,
+        opened datasets are kept open.
     kwargs
         Additional keyword arguments to pass to :py:func:`~xarray.open_dataset` function.
 
@@ -543,18 +1882,153 @@ def open_collection(store: typing.Union[str, pydantic.DirectoryPath], **kwargs):
     Collection
         A collection containing the datasets in the Zarr store.
 
+    Notes
+    -----
+    The root of the store is opened only once. If the store has consolidated
+    metadata at its root, the metadata for all groups is read in a single pass.
+
     Examples
     --------
     >>> import xcollection as xc
     >>> c = xc.open_collection('/tmp/foo.zarr', decode_times=True, use_cftime=True)
+    >>> c = xc.open_collection('/tmp/foo.zarr', parallel=True, max_workers=8)
+    >>> c = xc.open_collection('/tmp/foo.zarr', lazy=True, cache_size=10)
 
     """
 
     import zarr
 
-    zstore = zarr.open_group(store, mode='r')
-    datasets = {
-        key: xr.open_dataset(store, group=key, engine='zarr', **kwargs)
-        for key in zstore.group_keys()
-    }
-    return Collection(datasets=datasets)
+    if cache_size is not None and not lazy:
+        raise ValueError('cache_size can only be used when lazy=True')
+
+    storage_options = kwargs.pop('storage_options', None)
+    with instrumentation.span('open_collection') as record:
+        if record is not None:
+            store = zarr.storage.normalize_store_arg(
+                store, storage_options=storage_options, mode='r'
+            )
+            store, storage_options = instrumentation.counting_store(store, record), None
+        reader = StoreReader(store, storage_options=storage_options)
+        keys = reader.keys()
+        if lazy:
+            return Collection._construct(
+                LazyDatasets(reader, keys, cache_size=cache_size, open_kwargs=kwargs)
+            )
+
+        open_dataset = instrumentation.traced(reader.open_dataset, record)
+        if record is not None:
+            record.datasets = len(keys)
+        if parallel:
+            datasets = map_values(
+                open_dataset,
+                dict(zip(keys, keys)),
+                executor='threads',
+                max_workers=max_workers,
+                kwargs=kwargs,
+            )
+        else:
+            datasets = {key: open_dataset(key, **kwargs) for key in keys}
+        return Collection._construct(datasets)
+
+
+async def open_collection_async(
+    store: typing.Union[str, pydantic.DirectoryPath], *, max_concurrency: int = None, **kwargs
+) -> Collection:
+    """Open a collection stored in a Zarr store without blocking the event loop.
+
+    This is the asynchronous variant of :py:func:`open_collection`: the groups
+    are opened concurrently in threads, at most `max_concurrency` at once. The
+    datasets are opened lazily, as with :py:func:`open_collection`, so only their
+    metadata is read.
+
+    If the awaiting task is cancelled, no new group is opened. The groups being
+    opened when the task is cancelled are completed in the background.
+
+    Parameters
+    ----------
+    store : str or pathlib.Path
+         Store or path to directory in local or remote file system.
+    max_concurrency : int, optional
+        The maximum number of groups opened at once.
+    kwargs
+        Additional keyword arguments to pass to :py:func:`~xarray.open_dataset` function.
+
+    Returns
+    -------
+    Collection
+        A collection containing the datasets in the Zarr store.
+
+    Raises
+    ------
+    CollectionMapError
+        If opening one or more groups fails.
+
+    Examples
+    --------
+    >>> import xcollection as xc
+    >>> c = await xc.open_collection_async('/tmp/foo.zarr', max_concurrency=8)
+    """
+    import asyncio
+
+    storage_options = kwargs.pop('storage_options', None)
+
+    def _open_reader():
+        reader = StoreReader(store, storage_options=storage_options)
+        return reader, reader.keys()
+
+    # reading the root metadata and listing the groups may block too
+    reader, keys = await asyncio.get_running_loop().run_in_executor(None, _open_reader)
+    datasets = await map_values_async(
+        reader.open_dataset,
+        dict(zip(keys, keys)),
+        max_concurrency=max_concurrency,
+        kwargs=kwargs,
+    )
+    return Collection._construct(datasets)
+
+
+def iter_collection(
+    store: typing.Union[str, pydantic.DirectoryPath],
+    func: typing.Callable[[xr.Dataset], typing.Any] = None,
+    *,
+    prefetch: int = 2,
+    **kwargs,
+) -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+    """Iterate over the datasets of a collection stored in a Zarr store, one at a time.
+
+    This is a streaming variant of :py:func:`open_collection`: each dataset is
+    opened while the previous ones are processed, and closed once it has been
+    yielded. At most ``prefetch + 1`` datasets are open at once, regardless of the
+    number of groups in the store.
+
+    Parameters
+    ----------
+    store : str or pathlib.Path
+         Store or path to directory in local or remote file system.
+    func : callable, optional
+        A function to apply to each dataset. By default, the datasets are yielded
+        as they are, and are only valid until the next iteration.
+    prefetch : int, optional
+        The number of datasets to open in the background ahead of the one being
+        processed. Defaults to 2. If 0, the datasets are opened one at a time.
+    kwargs
+        Additional keyword arguments to pass to :py:func:`~xarray.open_dataset` function.
+
+    Yields
+    ------
+    tuple
+        The key and the dataset, or the result of `func`, for each group, in the
+        order of the keys.
+
+    Examples
+    --------
+    >>> import xcollection as xc
+    >>> for key, mean in xc.iter_collection('/tmp/foo.zarr', lambda ds: ds.mean().load()):
+    ...     print(key, float(mean.Tair))
+    """
+    reader = StoreReader(store, storage_options=kwargs.pop('storage_options', None))
+
+    def _open(key):
+        return reader.open_dataset(key, **kwargs), True
+
+    return _stream(reader.keys(), _open, func or toolz.identity, prefetch)
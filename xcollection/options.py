@@ -0,0 +1,71 @@
+import typing
+
+_VALIDATION_LEVELS = ['full', 'shallow', 'off']
+
+OPTIONS: typing.Dict[str, typing.Any] = {
+    'display_max_keys': 20,
+    'validation': 'full',
+}
+
+_VALIDATORS = {
+    'display_max_keys': lambda value: isinstance(value, int) and value >= 0,
+    'validation': lambda value: value in _VALIDATION_LEVELS,
+}
+
+_DESCRIPTIONS = {
+    'display_max_keys': 'must be a non-negative integer',
+    'validation': f'must be one of {_VALIDATION_LEVELS}',
+}
+
+
+class set_options:
+    """Set options for xcollection in a controlled context.
+
+    Parameters
+    ----------
+    display_max_keys : int, default: 20
+        The maximum number of keys of a collection whose datasets are displayed
+        in full. Larger collections are displayed as a summary table with one
+        row per key, showing the dimensions, data variables and size of each dataset.
+    validation : {'full', 'shallow', 'off'}, default: 'full'
+        How the datasets passed to :py:class:`~xcollection.Collection` are validated.
+
+        - 'full': validate the keys and values with pydantic.
+        - 'shallow': only check that the keys are strings and the values are
+          datasets or data arrays, which is much cheaper for large collections.
+          Invalid inputs raise a ``TypeError``.
+        - 'off': do not validate the inputs at all. Data arrays are still
+          converted to datasets.
+
+    Examples
+    --------
+    It is possible to use ``set_options`` either as a context manager:
+
+    >>> import xcollection as xc
+    >>> with xc.set_options(validation='shallow'):
+    ...     c = xc.Collection(datasets)
+
+    Or to set global options:
+
+    >>> xc.set_options(validation='off')
+    """
+
+    def __init__(self, **kwargs):
+        self.old = {}
+        for key, value in kwargs.items():
+            if key not in OPTIONS:
+                raise ValueError(
+                    f'argument name {key!r} is not in the set of valid options {set(OPTIONS)!r}'
+                )
+            if key in _VALIDATORS and not _VALIDATORS[key](value):
+                raise ValueError(
+                    f'option {key!r} given an invalid value: {value!r}. {key!r} {_DESCRIPTIONS[key]}'
+                )
+            self.old[key] = OPTIONS[key]
+        OPTIONS.update(kwargs)
+
+    def __enter__(self):
+        return
+
+    def __exit__(self, type, value, traceback):
+        OPTIONS.update(self.old)
@@ -0,0 +1,201 @@
+import concurrent.futures
+import functools
+import os
+import typing
+
+_VALID_EXECUTORS = ['threads', 'processes', 'dask', 'shared_memory']
+
+
+class CollectionMapError(Exception):
+    """Raised when applying a function to the members of a collection fails for one or more keys.
+
+    Parameters
+    ----------
+    errors : dict
+        A dictionary mapping each failing key to the exception it raised.
+    """
+
+    def __init__(self, errors: typing.Dict[str, BaseException]):
+        self.errors = errors
+        summary = '\n'.join(
+            f'    {key}: {type(err).__name__}: {err}' for key, err in errors.items()
+        )
+        super().__init__(f'Function failed for {len(errors)} key(s):\n{summary}')
+
+
+def _try_apply(func, value, args, kwargs):
+    """Apply ``func`` and return a ``(succeeded, result_or_exception)`` pair.
+
+    Exceptions are returned instead of raised so that failures for every key
+    can be collected and reported together.
+    """
+    try:
+        return True, func(value, *args, **kwargs)
+    except Exception as exc:
+        return False, exc
+
+
+def _run_futures(pool_cls, func, mapping, args, kwargs, max_workers):
+    with pool_cls(max_workers=max_workers) as pool:
+        futures = {
+            key: pool.submit(_try_apply, func, value, args, kwargs)
+            for key, value in mapping.items()
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+
+def _run_dask(func, mapping, args, kwargs, max_workers):
+    import dask
+
+    # The values are wrapped in a partial so that dask-backed datasets are handed to
+    # ``func`` as they are instead of being computed as dependencies of the task.
+    tasks = [
+        dask.delayed(functools.partial(_try_apply, func, value, args, kwargs), pure=False)()
+        for value in mapping.values()
+    ]
+    compute_kwargs = {'num_workers': max_workers} if max_workers is not None else {}
+    return dict(zip(mapping.keys(), dask.compute(*tasks, **compute_kwargs)))
+
+
+def map_values(
+    func: typing.Callable,
+    mapping: typing.Mapping[str, typing.Any],
+    *,
+    executor: str,
+    max_workers: int = None,
+    args: typing.Sequence[typing.Any] = (),
+    kwargs: typing.Dict[str, typing.Any] = None,
+) -> typing.Dict[str, typing.Any]:
+    """Apply a function to each value of a mapping concurrently.
+
+    Parameters
+    ----------
+    func : callable
+        The function to apply to each value.
+    mapping : dict
+        The mapping whose values ``func`` is applied to.
+    executor : str
+        The executor to use. Must be one of 'threads', 'processes', 'dask' or
+        'shared_memory'. 'shared_memory' uses worker processes like 'processes',
+        but transfers the numpy arrays of dataset and data array values and
+        results through shared memory instead of pickling them (see
+        :py:func:`xcollection.sharedmem.map_shared_memory`).
+    max_workers : int, optional
+        The maximum number of workers to use. Defaults to the executor's default.
+    args : tuple, optional
+        Positional arguments to pass to `func` in addition to the value.
+    kwargs : dict, optional
+        Keyword arguments to pass to `func`.
+
+    Returns
+    -------
+    dict
+        A dictionary with the results, in the same key order as ``mapping``.
+
+    Raises
+    ------
+    CollectionMapError
+        If ``func`` raised for any of the keys. All failures are reported together.
+    """
+    if executor not in _VALID_EXECUTORS:
+        raise ValueError(f'Invalid executor: {executor}. Accepted executors are {_VALID_EXECUTORS}')
+
+    args, kwargs = tuple(args), kwargs or {}
+    if executor == 'threads':
+        outcomes = _run_futures(
+            concurrent.futures.ThreadPoolExecutor, func, mapping, args, kwargs, max_workers
+        )
+    elif executor == 'processes':
+        outcomes = _run_futures(
+            concurrent.futures.ProcessPoolExecutor, func, mapping, args, kwargs, max_workers
+        )
+    elif executor == 'dask':
+        outcomes = _run_dask(func, mapping, args, kwargs, max_workers)
+    elif executor == 'shared_memory':
+        from .sharedmem import map_shared_memory
+
+        outcomes = map_shared_memory(func, mapping, args, kwargs, max_workers)
+
+    errors = {key: result for key, (ok, result) in outcomes.items() if not ok}
+    if errors:
+        raise CollectionMapError(errors) from next(iter(errors.values()))
+    return {key: result for key, (_, result) in outcomes.items()}
+
+
+async def map_values_async(
+    func: typing.Callable,
+    mapping: typing.Mapping[str, typing.Any],
+    *,
+    max_concurrency: int = None,
+    args: typing.Sequence[typing.Any] = (),
+    kwargs: typing.Dict[str, typing.Any] = None,
+) -> typing.Dict[str, typing.Any]:
+    """Apply a blocking function to each value of a mapping in threads, without blocking the event loop.
+
+    At most `max_concurrency` values are processed at once, and a value is only
+    handed to a thread once a previous one is done, so that the number of
+    in-flight values, and the memory they use, stays bounded.
+
+    If the awaiting task is cancelled, no new value is processed. The calls
+    already running in threads cannot be interrupted and complete in the
+    background.
+
+    Parameters
+    ----------
+    func : callable
+        The blocking function to apply to each value.
+    mapping : dict
+        The mapping whose values ``func`` is applied to.
+    max_concurrency : int, optional
+        The maximum number of values processed at once. Defaults to the default
+        number of workers of :py:class:`concurrent.futures.ThreadPoolExecutor`.
+    args : tuple, optional
+        Positional arguments to pass to `func` in addition to the value.
+    kwargs : dict, optional
+        Keyword arguments to pass to `func`.
+
+    Returns
+    -------
+    dict
+        A dictionary with the results, in the same key order as ``mapping``.
+
+    Raises
+    ------
+    CollectionMapError
+        If ``func`` raised for any of the keys. All failures are reported together.
+    """
+    import asyncio
+
+    if max_concurrency is not None and max_concurrency < 1:
+        raise ValueError(f'max_concurrency must be a positive integer, got {max_concurrency}')
+
+    # the default of ThreadPoolExecutor
+    limit = max_concurrency or min(32, (os.cpu_count() or 1) + 4)
+    args, kwargs = tuple(args), kwargs or {}
+    loop = asyncio.get_running_loop()
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=limit)
+    items = iter(list(mapping.items()))
+    outcomes, futures = {}, set()
+
+    async def _worker():
+        # the workers share the iterator, so each value is processed once
+        for key, value in items:
+            future = pool.submit(_try_apply, func, value, args, kwargs)
+            futures.add(future)
+            try:
+                outcomes[key] = await asyncio.wrap_future(future, loop=loop)
+            finally:
+                futures.discard(future)
+
+    try:
+        await asyncio.gather(*(_worker() for _ in range(min(limit, len(mapping)))))
+    finally:
+        # ThreadPoolExecutor.shutdown only accepts cancel_futures on Python >= 3.9
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+    errors = {key: result for key, (ok, result) in outcomes.items() if not ok}
+    if errors:
+        raise CollectionMapError(errors) from next(iter(errors.values()))
+    return {key: outcomes[key][1] for key in mapping}
@@ -0,0 +1,317 @@
+import dataclasses
+import functools
+import typing
+
+import xarray as xr
+
+from .parallel import map_values
+
+_VALID_MODES = ['all', 'any']
+_VALID_BY = ['key', 'value', 'item']
+
+
+def _name(func: typing.Callable) -> str:
+    return getattr(func, '__name__', None) or repr(func)
+
+
+def _call_bound(func, args, kwargs, dataset):
+    return func(dataset, *args, **kwargs)
+
+
+def _bind(func, args, kwargs):
+    """Return a function of the dataset only, with ``args`` and ``kwargs`` applied last.
+
+    The function is picklable if `func` is, so that plans can run in worker processes.
+    """
+    if not args and not kwargs:
+        return func
+    return functools.partial(_call_bound, func, args, kwargs)
+
+
+def _keymapped(predicate, keymap, key):
+    return predicate(keymap(key))
+
+
+@dataclasses.dataclass
+class Step:
+    """A recorded operation of a :py:class:`LazyCollection` plan.
+
+    Parameters
+    ----------
+    op : str
+        The operation: one of 'choose', 'filter', 'keymap' or 'map'.
+    funcs : tuple of callable
+        The functions applied by the step. Fused 'map' steps have several.
+    names : tuple of str
+        The names of the functions, used by :py:meth:`LazyCollection.explain`.
+    options : dict
+        The other arguments of the operation, e.g. ``by`` for 'filter'.
+    """
+
+    op: str
+    funcs: typing.Tuple[typing.Callable, ...] = ()
+    names: typing.Tuple[str, ...] = ()
+    options: typing.Dict[str, typing.Any] = dataclasses.field(default_factory=dict)
+
+    @property
+    def is_key_filter(self) -> bool:
+        return self.op == 'filter' and self.options['by'] == 'key'
+
+    def describe(self) -> str:
+        if self.op == 'choose':
+            return f"choose(data_vars={self.options['data_vars']!r}, mode={self.options['mode']!r})"
+        if self.op == 'filter':
+            return f"filter(by={self.options['by']!r}, func={self.names[0]})"
+        if self.op == 'keymap':
+            return f'keymap(func={self.names[0]})'
+        if len(self.funcs) == 1:
+            return f'map(func={self.names[0]})'
+        return f"map(funcs=[{', '.join(self.names)}])  # {len(self.funcs)} fused maps"
+
+
+def optimize(steps: typing.Sequence[Step]) -> typing.List[Step]:
+    """Return an equivalent, optimized list of steps.
+
+    - Filters on keys are moved to the front of the plan. The other steps do not
+      change the keys, except keymaps, which the filter is composed with. The
+      datasets of filtered out keys are then never accessed or mapped.
+    - Consecutive maps are fused into a single step.
+    """
+    steps = list(steps)
+    moved = True
+    while moved:
+        moved = False
+        for i in range(1, len(steps)):
+            previous, step = steps[i - 1], steps[i]
+            if not step.is_key_filter or previous.is_key_filter:
+                continue
+            if previous.op == 'keymap':
+                (predicate,), (keymap,) = step.funcs, previous.funcs
+                step = Step(
+                    'filter',
+                    funcs=(functools.partial(_keymapped, predicate, keymap),),
+                    names=(f'{step.names[0]} . {previous.names[0]}',),
+                    options=step.options,
+                )
+            steps[i - 1], steps[i] = step, previous
+            moved = True
+
+    fused = []
+    for step in steps:
+        if step.op == 'map' and fused and fused[-1].op == 'map':
+            previous = fused.pop()
+            step = Step('map', funcs=previous.funcs + step.funcs, names=previous.names + step.names)
+        fused.append(step)
+    return fused
+
+
+def _split(steps: typing.List[Step]) -> typing.Tuple[typing.List[Step], typing.List[Step]]:
+    """Split the leading steps that only need the keys and the variables index of the source."""
+    for i, step in enumerate(steps):
+        if not (step.is_key_filter or (step.op == 'choose' and step.options['mode'] == 'any')):
+            return steps[:i], steps[i:]
+    return steps, []
+
+
+def _run_steps(steps: typing.List[Step], key: str, dataset: xr.Dataset):
+    """Apply ``steps`` to a single dataset. Returns None if the dataset is filtered out."""
+    for step in steps:
+        if step.op == 'map':
+            for func in step.funcs:
+                dataset = func(dataset)
+                if isinstance(dataset, xr.DataArray):
+                    dataset = dataset.to_dataset()
+        elif step.op == 'keymap':
+            key = step.funcs[0](key)
+        elif step.op == 'filter':
+            by, (predicate,) = step.options['by'], step.funcs
+            value = {'key': key, 'value': dataset, 'item': (key, dataset)}[by]
+            if not predicate(value):
+                return None
+        elif step.op == 'choose':
+            data_vars = step.options['data_vars']
+            missing = [name for name in data_vars if name not in dataset.variables]
+            if step.options['mode'] == 'any':
+                if missing:
+                    return None
+            else:
+                if missing:
+                    raise KeyError(
+                        f'No data variables: `{data_vars}` found in dataset: {dataset!r}'
+                    )
+                dataset = dataset[data_vars]
+    return key, dataset
+
+
+def _run_item(steps: typing.List[Step], item: typing.Tuple[str, xr.Dataset]):
+    """Apply ``steps`` to a ``(key, dataset)`` pair. Used in worker processes."""
+    return _run_steps(steps, *item)
+
+
+class LazyCollection:
+    """A collection whose operations are recorded as a plan instead of being applied.
+
+    Use :py:meth:`xcollection.Collection.lazy` to create one. The
+    :py:meth:`choose`, :py:meth:`filter`, :py:meth:`keymap` and :py:meth:`map`
+    methods return a new lazy collection with the operation appended to the
+    plan. When :py:meth:`collect` is called, the plan is optimized (see
+    :py:meth:`explain`) and run in a single pass over each key, without
+    building the intermediate collections.
+
+    Parameters
+    ----------
+    source : Collection
+        The collection the plan is applied to.
+    steps : list of Step, optional
+        The recorded steps.
+
+    Examples
+    --------
+    >>> lc = c.lazy().map(func=f).filter(by='key', func=lambda key: key != 'foo').map(func=g)
+    >>> print(lc.explain())
+    <LazyCollection (3 keys in source)>
+      1. filter(by='key', func=<lambda>)  # keys only
+      2. map(funcs=[f, g])  # 2 fused maps
+    >>> lc.collect()
+    """
+
+    def __init__(self, source, steps: typing.Sequence[Step] = ()):
+        self._source = source
+        self._steps = list(steps)
+
+    def _append(self, step: Step) -> 'LazyCollection':
+        return type(self)(self._source, [*self._steps, step])
+
+    @property
+    def steps(self) -> typing.List[Step]:
+        """The recorded steps, before optimization."""
+        return list(self._steps)
+
+    def choose(
+        self, data_vars: typing.Union[str, typing.List[str]], *, mode: str = 'any'
+    ) -> 'LazyCollection':
+        """Record a :py:meth:`xcollection.Collection.choose` step."""
+        if mode not in _VALID_MODES:
+            raise ValueError(f'Invalid mode: {mode}. Accepted modes are {_VALID_MODES}')
+        if isinstance(data_vars, str):
+            data_vars = [data_vars]
+        return self._append(Step('choose', options={'data_vars': list(data_vars), 'mode': mode}))
+
+    def filter(self, *, by: str, func: typing.Callable) -> 'LazyCollection':
+        """Record a :py:meth:`xcollection.Collection.filter` step."""
+        if by not in _VALID_BY:
+            raise ValueError(f'Invalid by: {by}. Accepted by are {_VALID_BY}')
+        return self._append(Step('filter', funcs=(func,), names=(_name(func),), options={'by': by}))
+
+    def keymap(self, func: typing.Callable[[str], str]) -> 'LazyCollection':
+        """Record a :py:meth:`xcollection.Collection.keymap` step."""
+        if not callable(func):
+            raise TypeError(f'First argument must be callable function, got {type(func)}')
+        return self._append(Step('keymap', funcs=(func,), names=(_name(func),)))
+
+    def map(
+        self,
+        func: typing.Callable[[xr.Dataset], xr.Dataset],
+        args: typing.Sequence[typing.Any] = None,
+        **kwargs: typing.Dict[str, typing.Any],
+    ) -> 'LazyCollection':
+        """Record a :py:meth:`xcollection.Collection.map` step."""
+        args = args or ()
+        if not callable(func):
+            raise TypeError(f'First argument must be callable function, got {type(func)}')
+        if not isinstance(args, tuple):
+            raise TypeError(f'Second argument must be a tuple, got {type(args)}')
+        return self._append(Step('map', funcs=(_bind(func, args, kwargs),), names=(_name(func),)))
+
+    def optimized_steps(self) -> typing.List[Step]:
+        """Return the steps that are run by :py:meth:`collect`. See :py:func:`optimize`."""
+        return optimize(self._steps)
+
+    def explain(self) -> str:
+        """Return a description of the optimized plan.
+
+        The leading steps marked as ``keys only`` or ``variables index`` are
+        evaluated without accessing the datasets of the source collection.
+        """
+        head, tail = _split(self.optimized_steps())
+        lines = [f'<{type(self).__name__} ({len(self._source)} keys in source)>']
+        for number, step in enumerate([*head, *tail], start=1):
+            line = f'  {number}. {step.describe()}'
+            if number <= len(head):
+                line += '  # keys only' if step.op == 'filter' else '  # variables index'
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def __repr__(self) -> str:
+        return self.explain()
+
+    def _select_keys(self, steps: typing.List[Step]) -> typing.List[str]:
+        keys = list(self._source.keys())
+        for step in steps:
+            if step.op == 'filter':
+                keys = [key for key in keys if step.funcs[0](key)]
+            else:
+                index = self._source.variables_index
+                selected = index.lookup(step.options['data_vars'], mode='all')
+                keys = [key for key in keys if key in selected]
+        return keys
+
+    def collect(self, *, executor: str = None, max_workers: int = None):
+        """Run the optimized plan and return the resulting collection.
+
+        Each key of the source collection goes through all the steps in a single
+        pass, and only the datasets of the keys that are not filtered out by the
+        leading key filters are accessed.
+
+        Parameters
+        ----------
+        executor : str, optional
+            Process the keys concurrently using the given executor. Must be one of
+            'threads', 'processes', 'dask' or 'shared_memory'. With 'processes' and
+            'shared_memory', the steps and the datasets are sent to the worker
+            processes, so the functions of the plan must be picklable, e.g. defined
+            at the top level of a module. By default, one key is processed at a time.
+        max_workers : int, optional
+            The maximum number of workers used by `executor`.
+
+        Returns
+        -------
+        Collection
+
+        Raises
+        ------
+        CollectionMapError
+            If `executor` is set and the plan fails for one or more keys.
+        """
+        head, steps = _split(self.optimized_steps())
+        keys = self._select_keys(head)
+
+        def _run(key):
+            return _run_steps(steps, key, self._source[key])
+
+        if executor in {'processes', 'shared_memory'}:
+            # a module-level function, which can be pickled unlike `_run`
+            items = {key: (key, self._source[key]) for key in keys}
+            outcomes = map_values(
+                functools.partial(_run_item, steps),
+                items,
+                executor=executor,
+                max_workers=max_workers,
+            ).values()
+        elif executor is not None:
+            outcomes = map_values(
+                _run, dict(zip(keys, keys)), executor=executor, max_workers=max_workers
+            ).values()
+        else:
+            outcomes = map(_run, keys)
+        datasets = dict(outcome for outcome in outcomes if outcome is not None)
+
+        collection_cls = type(self._source)
+        if any(step.op in {'map', 'keymap'} for step in steps):
+            # the outputs of the functions are validated like those of `Collection.map`
+            return collection_cls(datasets=datasets)
+        return collection_cls._construct(datasets)
+
+    def compute(self, **kwargs):
+        """Run the plan. Alias of :py:meth:`collect`."""
+        return self.collect(**kwargs)
@@ -0,0 +1,150 @@
+import typing
+
+import numpy as np
+import xarray as xr
+
+_VALID_JOINS = ['exact', 'inner', 'outer']
+_VALID_STATS = ['mean', 'sum', 'min', 'max', 'std']
+
+# the running quantities each statistic needs, besides the count of valid values
+_COMPONENTS = {
+    'mean': ['mean'],
+    'sum': ['sum'],
+    'min': ['min'],
+    'max': ['max'],
+    'std': ['mean', 'm2'],
+}
+
+
+def _numeric(dataset: xr.Dataset) -> xr.Dataset:
+    """Return the numeric data variables of a dataset, with its coordinates."""
+    names = [name for name, var in dataset.data_vars.items() if var.dtype.kind in 'biuf']
+    return dataset[names]
+
+
+def _empty(like: xr.DataArray, component: str) -> xr.DataArray:
+    """Return the state of a variable that no member has contributed to yet."""
+    fill = np.nan if component in {'min', 'max'} else 0
+    return xr.full_like(like, fill, dtype=int if component == 'count' else float)
+
+
+class MemberAccumulator:
+    """Accumulate statistics of the members of a collection, one member at a time.
+
+    The statistics are computed element-wise across members, ignoring missing
+    values. The state holds a running count, mean, sum of squared deviations
+    (following Welford's algorithm, which is numerically stable), sum, minimum
+    or maximum, depending on the statistics requested, so memory use is a few
+    times the size of one member regardless of the number of members.
+
+    Parameters
+    ----------
+    stats : list of str
+        The statistics to accumulate, among 'mean', 'sum', 'min', 'max' and 'std'.
+    join : {'exact', 'inner', 'outer'}, optional
+        How to handle members whose indexes or data variables differ:
+
+        - 'exact': raise a ValueError.
+        - 'inner': only keep the index labels and data variables common to all members.
+        - 'outer': keep the index labels and data variables of any member. Members
+          without a label or a variable do not contribute to it.
+    """
+
+    def __init__(self, stats: typing.Sequence[str], join: str = 'exact'):
+        for stat in stats:
+            if stat not in _VALID_STATS:
+                raise ValueError(f'Invalid stat: {stat}. Accepted stats are {_VALID_STATS}')
+        if join not in _VALID_JOINS:
+            raise ValueError(f'Invalid join: {join}. Accepted joins are {_VALID_JOINS}')
+        self.join = join
+        self.components = ['count', *{c: None for stat in stats for c in _COMPONENTS[stat]}]
+        self.state: typing.Optional[typing.Dict[str, xr.Dataset]] = None
+
+    def _align(self, key: str, member: xr.Dataset) -> xr.Dataset:
+        """Align the state and ``member`` according to the join policy."""
+        names, state_names = set(member.data_vars), set(self.state['count'].data_vars)
+        if names != state_names:
+            if self.join == 'exact':
+                raise ValueError(
+                    f'The data variables of member {key!r} differ from those of the previous '
+                    f'members: {sorted(names ^ state_names, key=str)}. Use join="inner" or '
+                    'join="outer" to combine them.'
+                )
+            if self.join == 'inner':
+                common = [name for name in self.state['count'].data_vars if name in names]
+                self.state = {c: dataset[common] for c, dataset in self.state.items()}
+                member = member[common]
+            else:
+                for name in names - state_names:
+                    for component, dataset in self.state.items():
+                        dataset[name] = _empty(member[name], component)
+                for name in state_names - names:
+                    member[name] = xr.full_like(self.state['count'][name], np.nan, dtype=float)
+
+        for name, variable in member.data_vars.items():
+            if name not in self.state['count']:
+                continue
+            expected = self.state['count'][name]
+            if set(variable.dims) != set(expected.dims) or (
+                self.join == 'exact' and dict(variable.sizes) != dict(expected.sizes)
+            ):
+                raise ValueError(
+                    f'The dimensions of {name!r} in member {key!r} differ from those of the '
+                    f'previous members: {dict(variable.sizes)} != {dict(expected.sizes)}'
+                )
+
+        try:
+            aligned = xr.align(*self.state.values(), member, join=self.join, fill_value=np.nan)
+        except ValueError as err:
+            raise ValueError(f'Member {key!r} cannot be aligned with the previous members: {err}')
+        # labels added by an outer join have no contribution yet
+        self.state = {
+            component: dataset.fillna(0) if component in {'count', 'sum', 'mean', 'm2'} else dataset
+            for component, dataset in zip(self.state, aligned)
+        }
+        self.state['count'] = self.state['count'].astype(int)
+        return aligned[-1]
+
+    def add(self, key: str, dataset: xr.Dataset) -> None:
+        """Add the numeric data variables of a member to the statistics."""
+        member = _numeric(dataset)
+        if self.state is None:
+            self.state = {c: member.map(_empty, component=c) for c in self.components}
+        else:
+            member = self._align(key, member)
+
+        state = self.state
+        valid = member.notnull()
+        values = member.where(valid, 0)
+        count = state['count'] + valid
+        if 'mean' in state:
+            # Welford's update of the mean and of the sum of squared deviations
+            delta = values - state['mean']
+            mean = state['mean'] + (delta / count.where(valid, 1)).where(valid, 0)
+            if 'm2' in state:
+                state['m2'] = state['m2'] + (delta * (values - mean)).where(valid, 0)
+            state['mean'] = mean
+        if 'sum' in state:
+            state['sum'] = state['sum'] + values
+        if 'min' in state:
+            state['min'] = np.fmin(state['min'], member)
+        if 'max' in state:
+            state['max'] = np.fmax(state['max'], member)
+        state['count'] = count
+
+    def result(self, stat: str, ddof: int = 0) -> xr.Dataset:
+        """Return a statistic of the members added so far.
+
+        Elements without any valid value are NaN, except for 'sum' where they are 0.
+        """
+        if self.state is None:
+            raise ValueError('No member has been added')
+        if stat not in _VALID_STATS or _COMPONENTS[stat][-1] not in self.state:
+            raise ValueError(f'Statistic {stat!r} has not been accumulated')
+        count = self.state['count']
+        if stat == 'std':
+            dof = count - ddof
+            return np.sqrt(self.state['m2'] / dof.where(dof > 0))
+        if stat == 'mean':
+            return self.state['mean'].where(count > 0)
+        return self.state[stat]
@@ -0,0 +1,226 @@
+import concurrent.futures
+import dataclasses
+import errno
+import heapq
+import os
+import shutil
+import tempfile
+import typing
+import uuid
+
+import numpy as np
+import xarray as xr
+
+from .fingerprint import _is_dask_collection
+
+# tmpfs mount where files live in memory, on Linux
+_SHM_DIR = '/dev/shm'
+# the name of the variable holding the values of a DataArray while it is transferred
+_DATAARRAY_NAME = '__xcollection_dataarray__'
+
+
+@dataclasses.dataclass
+class SharedArray:
+    """A numpy array stored in a memory-mapped file."""
+
+    path: str
+    dims: typing.Tuple[typing.Hashable, ...]
+    attrs: typing.Dict[typing.Hashable, typing.Any]
+    encoding: typing.Dict[str, typing.Any]
+
+
+@dataclasses.dataclass
+class SharedDataset:
+    """A dataset whose numpy arrays are stored in memory-mapped files.
+
+    Only the paths of the files and the metadata are pickled when a
+    ``SharedDataset`` is sent to another process. Variables that cannot be
+    memory-mapped, i.e. dask-backed or with an object dtype, are pickled as they are.
+    """
+
+    variables: typing.Dict[typing.Hashable, typing.Union[SharedArray, xr.Variable]]
+    coord_names: typing.List[typing.Hashable]
+    attrs: typing.Dict[typing.Hashable, typing.Any]
+    encoding: typing.Dict[str, typing.Any]
+    # the name of the DataArray the dataset was made from, if any
+    dataarray_name: typing.Optional[typing.List[typing.Hashable]] = None
+
+    @property
+    def paths(self) -> typing.List[str]:
+        return [var.path for var in self.variables.values() if isinstance(var, SharedArray)]
+
+
+def _is_shareable(variable: xr.Variable) -> bool:
+    return not _is_dask_collection(variable.data) and not variable.dtype.hasobject
+
+
+def _shared_nbytes(value: typing.Any) -> int:
+    """Return the number of bytes :py:func:`share` writes for a value."""
+    if isinstance(value, xr.DataArray):
+        value = value.to_dataset(name=_DATAARRAY_NAME)
+    if not isinstance(value, xr.Dataset):
+        return 0
+    return sum(var.nbytes for var in value.variables.values() if _is_shareable(var))
+
+
+def _free_space(directory: str) -> int:
+    return shutil.disk_usage(directory).free
+
+
+def share(value: typing.Union[xr.Dataset, xr.DataArray], directory: str) -> SharedDataset:
+    """Copy the numpy arrays of a dataset or data array to memory-mapped files in `directory`.
+
+    Raises
+    ------
+    OSError
+        If there is not enough free space in `directory`. Writing to a memory-mapped
+        file beyond the space available would otherwise kill the process with SIGBUS.
+    """
+    nbytes = _shared_nbytes(value)
+    free = _free_space(directory)
+    if nbytes > free:
+        raise OSError(
+            errno.ENOSPC,
+            f'Not enough space in {directory} to share {nbytes} bytes ({free} bytes free)',
+        )
+    dataarray_name = None
+    if isinstance(value, xr.DataArray):
+        dataarray_name = [value.name]
+        value = value.to_dataset(name=_DATAARRAY_NAME)
+
+    variables = {}
+    for name, variable in value.variables.items():
+        if not _is_shareable(variable):
+            variables[name] = variable
+            continue
+        path = os.path.join(directory, f'{uuid.uuid4().hex}.npy')
+        array = np.lib.format.open_memmap(
+            path, mode='w+', dtype=variable.dtype, shape=variable.shape
+        )
+        array[...] = variable.values
+        array.flush()
+        del array
+        variables[name] = SharedArray(path, variable.dims, variable.attrs, variable.encoding)
+    return SharedDataset(
+        variables=variables,
+        coord_names=list(value.coords),
+        attrs=value.attrs,
+        encoding=value.encoding,
+        dataarray_name=dataarray_name,
+    )
+
+
+def rebuild(shared: SharedDataset, mode: str = 'c') -> typing.Union[xr.Dataset, xr.DataArray]:
+    """Rebuild a dataset, or data array, shared with :py:func:`share`, without copying its arrays.
+
+    Parameters
+    ----------
+    shared : SharedDataset
+        The shared dataset.
+    mode : {'c', 'r', 'r+'}, optional
+        The mode the files are mapped with. With 'c' (copy-on-write), the arrays
+        are writable but changes are private to the process. With 'r+', changes
+        are written to the files.
+    """
+    variables = {}
+    for name, variable in shared.variables.items():
+        if isinstance(variable, SharedArray):
+            # a plain ndarray view, which keeps the memory map open as its base
+            data = np.load(variable.path, mmap_mode=mode).view(np.ndarray)
+            variable = xr.Variable(variable.dims, data, variable.attrs, variable.encoding)
+        variables[name] = variable
+    coords = {name: variables.pop(name) for name in shared.coord_names}
+    dataset = xr.Dataset(variables, coords=coords, attrs=shared.attrs)
+    dataset.encoding = shared.encoding
+    if shared.dataarray_name is not None:
+        return dataset[_DATAARRAY_NAME].rename(shared.dataarray_name[0])
+    return dataset
+
+
+def _apply_shared(value, func, directory, args, kwargs):
+    """Run in a worker: apply ``func`` to a shared dataset and share the result back."""
+    if isinstance(value, SharedDataset):
+        value = rebuild(value, mode='c')
+    result = func(value, *args, **kwargs)
+    if isinstance(result, (xr.Dataset, xr.DataArray)):
+        return share(result, directory)
+    return result
+
+
+def _remove(paths: typing.Iterable[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:  # pragma: no cover
+            # e.g. files that are still mapped cannot be removed on Windows
+            pass
+
+
+def map_shared_memory(func, mapping, args, kwargs, max_workers):
+    """Apply ``func`` to each value of a mapping in worker processes, through shared memory.
+
+    The numpy arrays of the datasets are copied once to memory-mapped files,
+    in ``/dev/shm`` when it exists and has room for them, so that they are in
+    memory, and in the temporary directory otherwise. The workers map
+    the files and rebuild the datasets as views, without copying or pickling
+    the arrays, and the results come back the same way. The result files are
+    unlinked once mapped by the parent process, so their memory is released
+    when the result arrays are garbage collected.
+
+    At most twice as many values as workers are shared at once, so the extra
+    memory used does not grow with the size of the mapping. A value or result
+    that does not fit in the remaining space fails with an OSError instead of
+    crashing the process.
+
+    Returns
+    -------
+    dict
+        A ``(succeeded, result_or_exception)`` pair for each key, see
+        :py:func:`~xcollection.parallel.map_values`.
+    """
+    from .parallel import _try_apply
+
+    # the default number of workers of ProcessPoolExecutor
+    window = 2 * (max_workers or os.cpu_count() or 1)
+    # the largest values in flight at once, and results of the same size
+    needed = 2 * sum(heapq.nlargest(window, map(_shared_nbytes, mapping.values())))
+    base = None
+    if os.path.isdir(_SHM_DIR) and _free_space(_SHM_DIR) >= needed:
+        base = _SHM_DIR
+    directory = tempfile.mkdtemp(prefix='xcollection-', dir=base)
+    outcomes, pending = {}, {}
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+
+            def _collect(done):
+                for future in done:
+                    key, inputs = pending.pop(future)
+                    ok, result = future.result()
+                    if ok and isinstance(result, SharedDataset):
+                        output = result
+                        result = rebuild(output, mode='r+')
+                        _remove(output.paths)
+                    _remove(inputs)
+                    outcomes[key] = (ok, result)
+
+            for key, value in mapping.items():
+                if len(pending) >= window:
+                    done, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    _collect(done)
+                if isinstance(value, (xr.Dataset, xr.DataArray)):
+                    try:
+                        value = share(value, directory)
+                    except OSError as err:
+                        outcomes[key] = (False, err)
+                        continue
+                inputs = value.paths if isinstance(value, SharedDataset) else []
+                future = pool.submit(
+                    _try_apply, _apply_shared, value, (func, directory, args, kwargs), {}
+                )
+                pending[future] = (key, inputs)
+            _collect(concurrent.futures.wait(pending).done)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {key: outcomes[key] for key in mapping}
@@ -0,0 +1,319 @@
+import collections
+import threading
+import typing
+from collections.abc import MutableMapping
+
+import xarray as xr
+
+from .coords import SHARED_COORDS_KEY, SHARED_GROUP, SharedCoordsReader
+
+MANIFEST_KEY = 'xcollection'
+MANIFEST_VERSION = 1
+
+
+def _variable_manifest(variable: xr.Variable) -> typing.Dict[str, typing.Any]:
+    return {
+        'dims': list(variable.dims),
+        'shape': [int(size) for size in variable.shape],
+        'dtype': str(variable.dtype),
+    }
+
+
+def dataset_manifest(dataset: xr.Dataset) -> typing.Dict[str, typing.Any]:
+    """Summarize the structure of a dataset as a JSON-serializable dictionary."""
+    return {
+        'dims': {str(dim): int(size) for dim, size in dataset.dims.items()},
+        'data_vars': {
+            str(name): _variable_manifest(var.variable) for name, var in dataset.data_vars.items()
+        },
+        'coords': {
+            str(name): _variable_manifest(var.variable) for name, var in dataset.coords.items()
+        },
+    }
+
+
+def dataset_record(dataset: xr.Dataset) -> typing.Dict[str, typing.Any]:
+    """Summarize the structure and attributes of a dataset as a dictionary.
+
+    The record contains the sizes of the dimensions, the dims, shape and dtype of
+    every data variable and coordinate, and the attributes of the dataset.
+    """
+    return {**dataset_manifest(dataset), 'attrs': dict(dataset.attrs)}
+
+
+def write_collection_metadata(
+    store,
+    datasets: typing.Mapping[str, xr.Dataset],
+    merge: bool = False,
+    fingerprints: typing.Mapping[str, str] = None,
+    from_store: bool = False,
+) -> typing.Dict[str, typing.Any]:
+    """Write the collection manifest and consolidate the metadata of all groups at the root of a store.
+
+    Parameters
+    ----------
+    store : MutableMapping
+        The Zarr store the groups of the collection have been written to.
+    datasets : dict
+        The datasets that have been written, keyed by group name.
+    merge : bool, optional
+        If True, entries of an existing manifest for groups that are still
+        present in the store are kept.
+    fingerprints : dict, optional
+        Content fingerprints of the datasets (see
+        :py:func:`~xcollection.fingerprint.fingerprints`), recorded in their entries.
+    from_store : bool, optional
+        If True, the entries of the datasets are built from their groups in the
+        store instead of from the datasets, which only hold part of the group
+        after an append or a region write.
+
+    Returns
+    -------
+    dict
+        The manifest written to the root attributes of the store.
+    """
+    import zarr
+
+    root = zarr.open_group(store, mode='a')
+    entries = {}
+    if merge and MANIFEST_KEY in root.attrs:
+        # the attributes are stored with sorted keys, so the order comes from the list of keys
+        previous = root.attrs[MANIFEST_KEY]
+        groups = set(root.group_keys())
+        entries = {key: previous['datasets'][key] for key in previous['keys'] if key in groups}
+    shared_coords = SharedCoordsReader(root)
+    for key, value in datasets.items():
+        if from_store:
+            # only the metadata and the index coordinates are read
+            value = xr.open_dataset(store, group=key, engine='zarr', consolidated=False)
+            value = shared_coords.restore(value)
+        entries[key] = dataset_manifest(value)
+        if fingerprints is not None and key in fingerprints:
+            entries[key]['fingerprint'] = fingerprints[key]
+    manifest = {'version': MANIFEST_VERSION, 'keys': list(entries), 'datasets': entries}
+    root.attrs[MANIFEST_KEY] = manifest
+    zarr.consolidate_metadata(store)
+    return manifest
+
+
+class StoreReader:
+    """Read the groups of a collection stored in a Zarr store.
+
+    The root of the store is opened once and shared by all groups. If the store
+    has consolidated metadata at its root, the metadata of every group is read
+    in a single request and served from memory afterwards.
+
+    Parameters
+    ----------
+    store : str, pathlib.Path or MutableMapping
+         Store or path to directory in local or remote file system.
+    storage_options : dict, optional
+        Any additional parameters for the storage backend.
+    """
+
+    def __init__(self, store, storage_options: typing.Dict[str, typing.Any] = None):
+        import zarr
+
+        self.store = zarr.storage.normalize_store_arg(
+            store, storage_options=storage_options, mode='r'
+        )
+        try:
+            self.metadata_store = zarr.storage.ConsolidatedMetadataStore(self.store)
+        except KeyError:
+            self.metadata_store = None
+        self.root = zarr.open_group(
+            self.metadata_store if self.consolidated else self.store,
+            mode='r',
+            chunk_store=self.store,
+        )
+        self.manifest = self.root.attrs.get(MANIFEST_KEY)
+        self.shared_coords = SharedCoordsReader(self.root)
+
+    @property
+    def consolidated(self) -> bool:
+        """Whether the store has consolidated metadata at its root."""
+        return self.metadata_store is not None
+
+    def keys(self) -> typing.List[str]:
+        """Return the names of the groups in the store.
+
+        If the store has a collection manifest, the keys are returned in the
+        order in which they were written.
+        """
+        groups = [key for key in self.root.group_keys() if key != SHARED_GROUP]
+        if self.manifest is None:
+            return groups
+        existing = set(groups)
+        keys = [key for key in self.manifest['keys'] if key in existing]
+        ordered = set(keys)
+        return keys + [key for key in groups if key not in ordered]
+
+    def open_dataset(self, key: str, **kwargs) -> xr.Dataset:
+        """Open the group ``key`` as a dataset.
+
+        Parameters
+        ----------
+        key : str
+            The name of the group to open.
+        kwargs
+            Additional keyword arguments to pass to :py:func:`~xarray.open_dataset` function.
+        """
+        if self.consolidated:
+            # the consolidated metadata has already been read: any `consolidated`
+            # argument would apply to the in-memory metadata store, which has none
+            kwargs = {'chunk_store': self.store, **kwargs, 'consolidated': False}
+            dataset = xr.open_dataset(self.metadata_store, group=key, engine='zarr', **kwargs)
+        else:
+            dataset = xr.open_dataset(self.store, group=key, engine='zarr', **kwargs)
+        return self.shared_coords.restore(dataset)
+
+
+class LazyDatasets(MutableMapping):
+    """A mapping of keys to datasets that are only opened from a store on first access.
+
+    Listing, counting and membership tests never open a dataset. Datasets that
+    are assigned to the mapping are kept in memory, while datasets opened from
+    the store are optionally kept in a least-recently-used cache.
+
+    Parameters
+    ----------
+    reader : StoreReader
+        The reader used to open the datasets.
+    keys : iterable of str
+        The keys of the datasets available in the store.
+    cache_size : int, optional
+        The maximum number of datasets opened from the store to keep open at once.
+        When exceeded, the least recently used dataset is closed and evicted. By
+        default, opened datasets are never evicted.
+    open_kwargs : dict, optional
+        Additional keyword arguments to pass to :py:func:`~xarray.open_dataset` function.
+    """
+
+    def __init__(
+        self,
+        reader: StoreReader,
+        keys: typing.Iterable[str],
+        cache_size: int = None,
+        open_kwargs: typing.Dict[str, typing.Any] = None,
+    ):
+        if cache_size is not None and cache_size < 1:
+            raise ValueError(f'cache_size must be a positive integer, got {cache_size}')
+        self.reader = reader
+        self.cache_size = cache_size
+        self.open_kwargs = open_kwargs or {}
+        self._keys = dict.fromkeys(keys)
+        self._assigned = {}
+        self._opened = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, key: str) -> xr.Dataset:
+        """Open the dataset for ``key`` from the store, bypassing the cache."""
+        return self.reader.open_dataset(key, **self.open_kwargs)
+
+    def is_open(self, key: str) -> bool:
+        """Return whether the dataset for ``key`` is held in memory."""
+        return key in self._assigned or key in self._opened
+
+    def __getitem__(self, key: str) -> xr.Dataset:
+        if key in self._assigned:
+            return self._assigned[key]
+        if key not in self._keys:
+            raise KeyError(key)
+        with self._lock:
+            if key in self._opened:
+                self._opened.move_to_end(key)
+                return self._opened[key]
+        dataset = self.open(key)
+        with self._lock:
+            if key in self._opened:
+                # another thread opened the same dataset in the meantime
+                dataset.close()
+                return self._opened[key]
+            self._opened[key] = dataset
+            if self.cache_size is not None:
+                while len(self._opened) > self.cache_size:
+                    _, evicted = self._opened.popitem(last=False)
+                    evicted.close()
+        return dataset
+
+    def __setitem__(self, key: str, value: xr.Dataset) -> None:
+        with self._lock:
+            self._keys[key] = None
+            self._assigned[key] = value
+            opened = self._opened.pop(key, None)
+        if opened is not None:
+            opened.close()
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            del self._keys[key]
+            self._assigned.pop(key, None)
+            opened = self._opened.pop(key, None)
+        if opened is not None:
+            opened.close()
+
+    def subset(self, keys: typing.Iterable[str]) -> 'LazyDatasets':
+        """Return a mapping of ``keys`` only, reading from the same store, without opening any dataset.
+
+        The datasets assigned to this mapping are shared with the subset, while
+        the datasets read from the store are opened again by the subset on first
+        access, so that closing them in one mapping does not affect the other.
+        """
+        subset = type(self)(
+            self.reader, (), cache_size=self.cache_size, open_kwargs=self.open_kwargs
+        )
+        with self._lock:
+            for key in keys:
+                if key not in self._keys:
+                    raise KeyError(key)
+                subset._keys[key] = None
+                if key in self._assigned:
+                    subset._assigned[key] = self._assigned[key]
+        return subset
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def variable_names(self, key: str) -> typing.List[str]:
+        """Return the names of the variables of the dataset ``key``.
+
+        If the dataset has not been opened yet, the names are read from the
+        collection manifest or from the Zarr metadata instead of opening it.
+        """
+        if self.is_open(key):
+            return list(self[key].variables)
+        if key not in self._keys:
+            raise KeyError(key)
+        manifest = self.reader.manifest
+        if manifest is not None and key in manifest['datasets']:
+            entry = manifest['datasets'][key]
+            names = [*entry['data_vars'], *entry['coords']]
+        else:
+            names = list(self.reader.root[key].array_keys())
+        dropped = self.open_kwargs.get('drop_variables') or ()
+        dropped = {dropped} if isinstance(dropped, str) else set(dropped)
+        return [name for name in names if name not in dropped]
+
+    def metadata(self, key: str) -> typing.Dict[str, typing.Any]:
+        """Return the record of the dataset ``key`` (see :py:func:`dataset_record`).
+
+        If the dataset has not been opened yet, the record is built from the
+        collection manifest and the group attributes instead of opening it.
+        """
+        entries = (self.reader.manifest or {}).get('datasets', {})
+        if self.is_open(key) or key not in entries or self.open_kwargs.get('drop_variables'):
+            return dataset_record(self[key])
+        manifest = {name: entries[key][name] for name in ('dims', 'data_vars', 'coords')}
+        # the references to the shared coordinates are removed when the dataset is opened
+        attrs = {
+            name: value
+            for name, value in self.reader.root[key].attrs.asdict().items()
+            if name != SHARED_COORDS_KEY
+        }
+        return {**manifest, 'attrs': attrs}